@@ -57,6 +57,7 @@ area_urls = [
         "<uuid:area_id>/", views.SpatialAreaDetail.as_view(), name="spatialarea_detail"
     ),
     path("types/", views.AreaTypeList.as_view(), name="spatialarea_types"),
+    path("tree/", views.area_tree, name="spatialarea_tree"),
 ]
 
 context_urls = [
@@ -81,6 +82,16 @@ context_urls = [
         views.context_list_numbers,
         name="context_list_numbers",
     ),
+    path(
+        (
+            "reserve/<hem:utm_hemisphere>/"
+            "<int:utm_zone>/"
+            "<int:area_utm_easting_meters>/"
+            "<int:area_utm_northing_meters>/"
+        ),
+        views.reserve_context_numbers,
+        name="reserve_context_numbers",
+    ),
     path(
         "<uuid:context_id>/",
         views.SpatialContextDetail.as_view(),
@@ -102,6 +113,7 @@ context_urls = [
 find_urls = [
     path("", views.ObjectFindList.as_view(), name="objectfind_list"),
     path("mc/", views.MCList.as_view(), name="materialcategory_list"),
+    path("bulk/", views.bulk_create_finds, name="objectfind_bulk_create"),
     path(
         (
             "<hem:utm_hemisphere>/"
@@ -124,6 +136,17 @@ find_urls = [
         views.find_list_by_context,
         name="contextfind_list",
     ),
+    path(
+        (
+            "reserve/<hem:utm_hemisphere>/"
+            "<int:utm_zone>/"
+            "<int:area_utm_easting_meters>/"
+            "<int:area_utm_northing_meters>/"
+            "<int:context_number>/"
+        ),
+        views.reserve_find_numbers,
+        name="reserve_find_numbers",
+    ),
     path(
         (
             "<hem:utm_hemisphere>/"
@@ -165,6 +188,16 @@ model_urls = [
         views.model_origin,
         name="model_origin",
     ),
+    path(
+        (
+            "<hem:utm_hemisphere>/"
+            "<int:utm_zone>/"
+            "<int:area_utm_easting_meters>/"
+            "<int:area_utm_northing_meters>/"
+        ),
+        views.model_area_info,
+        name="model_area_info",
+    ),
     path(
         (
             "<hem:utm_hemisphere>/"
@@ -190,10 +223,26 @@ model_urls = [
     ),
 ]
 
+upload_urls = [
+    path("", views.PhotoUploadStart.as_view(), name="photoupload_start"),
+    path("<uuid:upload_id>/", views.PhotoUploadDetail.as_view(), name="photoupload_detail"),
+    path(
+        "<uuid:upload_id>/<int:number>/",
+        views.PhotoUploadChunk.as_view(),
+        name="photoupload_chunk",
+    ),
+    path(
+        "<uuid:upload_id>/finish/",
+        views.PhotoUploadFinish.as_view(),
+        name="photoupload_finish",
+    ),
+]
+
 urlpatterns = [
     path("area/", include(area_urls)),
     path("context/", include(context_urls)),
     path("find/", include(find_urls)),
     path("path/", include(path_urls)),
     path("model/", include(model_urls)),
+    path("upload/", include(upload_urls)),
 ] + router.urls
@@ -1,5 +1,5 @@
 unmanaged = ["spatialarea", "areatype", "spatialcontext", "contexttype",
-             "objectfind", "materialcategory",  ]
+             "objectfind", "materialcategory", "numbercounter", ]
 
 class DefaultRouter:
     def db_for_read(self, model, **hints):
@@ -321,4 +321,46 @@ DATA_UPLOAD_MAX_NUMBER_FIELDS = None
 CELERY_BROKER_URL = env("aslcv2_be_CELERY_BROKER_URL")
 CELERY_RESULT_BACKEND = CELERY_BROKER_URL
 FILE_UPLOAD_PERMISSIONS = 0o644
+# Serve prebuilt 3D model zips and GLBs through nginx (X-Accel-Redirect to
+# MEDIA_URL) instead of streaming them from the app server.
+MODEL_ZIP_X_ACCEL_REDIRECT = env.bool("MODEL_ZIP_X_ACCEL_REDIRECT", default=False)
+# Deflate level for .obj/.mtl files in 3D model zips: 1 is fastest, 9 smallest.
+# Textures are always stored uncompressed.
+MODEL_ZIP_COMPRESSLEVEL = env.int("MODEL_ZIP_COMPRESSLEVEL", default=6)
+# Requests that find a model artifact missing queue the task that makes it at
+# most once per artifact in this many seconds (per process with the local
+# memory cache).
+TASK_ENQUEUE_DEDUPE_SECONDS = env.int("TASK_ENQUEUE_DEDUPE_SECONDS", default=60)
+# Seconds each process caches the site origins table before reloading it.
+SITE_ORIGIN_CACHE_TTL = env.int("SITE_ORIGIN_CACHE_TTL", default=300)
+# Seconds each process trusts its cache of existing areas and contexts when
+# saving finds. Deletions made through the app clear it in every process at once.
+KNOWN_PARENTS_CACHE_TTL = env.int("KNOWN_PARENTS_CACHE_TTL", default=300)
+# Seconds each process keeps the tree of areas used by the site browser and
+# area/tree/ before rebuilding it. Changes made through the app rebuild it at once.
+AREA_HIERARCHY_CACHE_TTL = env.int("AREA_HIERARCHY_CACHE_TTL", default=300)
+# Longest side in pixels of each thumbnail made for context and bag photos, and
+# of each find photo preview. The smallest is the context or bag photo's
+# thumbnail field; see main/thumbnails.py and main/previews.py.
+THUMBNAIL_SIZES = env.list("THUMBNAIL_SIZES", cast=int, default=[100, 400, 1600])
+# ActionLog entries are queued in memory and written in batches of this size,
+# at least every ACTION_LOG_FLUSH_INTERVAL seconds (0 writes full batches in the
+# request thread, with no background thread). See main/audit.py.
+ACTION_LOG_BATCH_SIZE = env.int("ACTION_LOG_BATCH_SIZE", default=100)
+ACTION_LOG_FLUSH_INTERVAL = env.float("ACTION_LOG_FLUSH_INTERVAL", default=5.0)
+# Hand batches to a Celery worker to write, falling back to writing them in
+# the web process when the broker can't be reached.
+ACTION_LOG_USE_CELERY = env.bool("ACTION_LOG_USE_CELERY", default=True)
+# A batch that fails to write this many times in a row is written one entry at a
+# time, and entries that still fail are logged and dropped. At most
+# ACTION_LOG_QUEUE_MAX entries are held; the oldest are dropped beyond that.
+ACTION_LOG_MAX_ATTEMPTS = env.int("ACTION_LOG_MAX_ATTEMPTS", default=5)
+ACTION_LOG_QUEUE_MAX = env.int("ACTION_LOG_QUEUE_MAX", default=100000)
+# Resumable photo uploads are sent in chunks of this many bytes and assembled in
+# PHOTO_UPLOAD_DIR (by default .uploads in MEDIA_ROOT), which must be on the same
+# filesystem as MEDIA_ROOT so finished photos are moved into place, not copied.
+# purge_photo_uploads removes uploads older than PHOTO_UPLOAD_EXPIRY_HOURS.
+PHOTO_UPLOAD_CHUNK_SIZE = env.int("PHOTO_UPLOAD_CHUNK_SIZE", default=1024 * 1024)
+PHOTO_UPLOAD_DIR = env("PHOTO_UPLOAD_DIR", default="")
+PHOTO_UPLOAD_EXPIRY_HOURS = env.int("PHOTO_UPLOAD_EXPIRY_HOURS", default=48)
 DEFAULT_AUTO_FIELD = "django.db.models.AutoField"
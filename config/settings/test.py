@@ -2,6 +2,8 @@
 With these settings, tests run faster.
 """
 
+import tempfile
+
 from .base import *  # noqa
 from .base import env
 
@@ -49,3 +51,8 @@ EMAIL_BACKEND = "django.core.mail.backends.locmem.EmailBackend"
 
 # Your stuff...
 # ------------------------------------------------------------------------------
+# files written by tests, like the cache stamp files, stay out of the media folder
+MEDIA_ROOT = tempfile.mkdtemp(prefix="aslcv2_be-test-media-")
+# write ActionLog batches synchronously, without a background thread or Celery
+ACTION_LOG_FLUSH_INTERVAL = 0
+ACTION_LOG_USE_CELERY = False
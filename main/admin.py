@@ -13,6 +13,7 @@ from main.models import (
     FindPhoto,
     SurveyPath,
     SurveyPoint,
+    SiteOrigin,
 )
 
 
@@ -162,3 +163,18 @@ class SurveyPointInline(admin.TabularInline):
 class SurveyPathAdmin(admin.ModelAdmin):
     list_display = ["id", "user"]
     inlines = [SurveyPointInline]
+
+
+@admin.register(SiteOrigin)
+class SiteOriginAdmin(admin.ModelAdmin):
+    list_display = [
+        "utm_hemisphere",
+        "utm_zone",
+        "area_utm_easting_meters",
+        "area_utm_northing_meters",
+        "origin_x",
+        "origin_y",
+        "origin_z",
+        "source",
+    ]
+    list_filter = ["utm_hemisphere", "utm_zone", "source"]
@@ -0,0 +1,187 @@
+"""Buffered writer for the ActionLog audit trail.
+
+Views record actions with :func:`log_action` instead of inserting an
+ActionLog row inside the request. Entries are queued in memory once the
+request's transaction commits, and written with ``bulk_create`` in batches:
+when ``ACTION_LOG_BATCH_SIZE`` entries are waiting, and at least every
+``ACTION_LOG_FLUSH_INTERVAL`` seconds. With ``ACTION_LOG_USE_CELERY`` a batch
+is handed to a Celery worker to write, falling back to writing it here if the
+broker can't be reached.
+
+Queued entries are flushed when the process exits normally (including
+gunicorn and Celery worker shutdown), and a batch that fails to write is put
+back in the queue. After ``ACTION_LOG_MAX_ATTEMPTS`` failures in a row the
+batch is written one entry at a time, so a single bad entry can't hold up the
+queue; entries that still fail are logged and dropped. The queue holds at most
+``ACTION_LOG_QUEUE_MAX`` entries, dropping the oldest if writes fall that far
+behind.
+
+With ``ACTION_LOG_FLUSH_INTERVAL = 0`` no background thread is started and
+batches are written in the request thread once they are full.
+"""
+
+import atexit
+import logging
+import os
+import threading
+from collections import deque
+
+from celery.signals import worker_process_shutdown, worker_shutdown
+from django.conf import settings
+from django.db import connections, transaction
+
+from main.models import ActionLog, utc_now
+
+logger = logging.getLogger(__name__)
+
+_queue = deque(maxlen=settings.ACTION_LOG_QUEUE_MAX)
+_lock = threading.Lock()
+# consecutive failed writes of the batch at the head of the queue
+_failures = {"count": 0}
+_wake = threading.Event()
+_flusher = {"thread": None, "pid": None}
+
+
+def log_action(user, model_name, action, object_id):
+    """Queue an ActionLog entry, to be written once the current transaction commits."""
+    entry = ActionLog(
+        user=user,
+        model_name=model_name,
+        action=action,
+        object_id=object_id,
+        timestamp=utc_now(),
+    )
+    transaction.on_commit(lambda: _enqueue(entry))
+
+
+def _enqueue(entry):
+    if len(_queue) == _queue.maxlen:
+        logger.error("Action log queue full, dropping %s", serialize_entry(_queue[0]))
+    _queue.append(entry)
+    if len(_queue) < settings.ACTION_LOG_BATCH_SIZE:
+        _start_flusher()
+    elif settings.ACTION_LOG_FLUSH_INTERVAL > 0:
+        _start_flusher()
+        _wake.set()
+    else:
+        flush()
+
+
+def pending():
+    """Number of entries waiting to be written."""
+    return len(_queue)
+
+
+def _take_batch():
+    batch = []
+    while _queue and len(batch) < settings.ACTION_LOG_BATCH_SIZE:
+        batch.append(_queue.popleft())
+    return batch
+
+
+def flush():
+    """Write every queued entry, one batch at a time. Returns the number written."""
+    written = 0
+    with _lock:
+        while _queue:
+            batch = _take_batch()
+            try:
+                _write(batch)
+            except Exception:
+                _failures["count"] += 1
+                if _failures["count"] < settings.ACTION_LOG_MAX_ATTEMPTS:
+                    logger.exception("Failed to write %d action log entries", len(batch))
+                    _requeue(batch)
+                    break
+                logger.exception(
+                    "Failed to write %d action log entries %d times, writing them one at a time",
+                    len(batch),
+                    _failures["count"],
+                )
+                written += _write_each(batch)
+            else:
+                written += len(batch)
+            _failures["count"] = 0
+    return written
+
+
+def _requeue(batch):
+    # entries queued since the batch was taken would be pushed out of a full queue
+    room = _queue.maxlen - len(_queue)
+    for entry in batch[room:]:
+        logger.error("Action log queue full, dropping %s", serialize_entry(entry))
+    _queue.extendleft(reversed(batch[:room]))
+
+
+def _write_each(batch):
+    written = 0
+    for entry in batch:
+        try:
+            with transaction.atomic():
+                ActionLog.objects.bulk_create([entry])
+        except Exception:
+            logger.exception("Dropping action log entry %s", serialize_entry(entry))
+        else:
+            written += 1
+    return written
+
+
+def _write(batch):
+    if settings.ACTION_LOG_USE_CELERY:
+        from main.tasks import write_action_logs
+
+        try:
+            write_action_logs.delay([serialize_entry(entry) for entry in batch])
+            return
+        except Exception:
+            logger.warning("Celery unavailable, writing action log entries directly")
+    ActionLog.objects.bulk_create(batch)
+
+
+def serialize_entry(entry):
+    """Convert a queued entry to JSON-serializable data for a Celery task."""
+    return {
+        "id": str(entry.id),
+        "user_id": entry.user_id,
+        "model_name": entry.model_name,
+        "action": entry.action,
+        "object_id": str(entry.object_id),
+        "timestamp": entry.timestamp.isoformat(),
+    }
+
+
+def _run_flusher():
+    while True:
+        _wake.wait(settings.ACTION_LOG_FLUSH_INTERVAL)
+        _wake.clear()
+        try:
+            flush()
+        finally:
+            # this thread's connections would otherwise stay open until exit
+            connections.close_all()
+
+
+def _start_flusher():
+    if settings.ACTION_LOG_FLUSH_INTERVAL <= 0:
+        return
+    # threads don't survive a fork, so each worker process starts its own
+    if _flusher["pid"] == os.getpid() and _flusher["thread"].is_alive():
+        return
+    with _lock:
+        if _flusher["pid"] == os.getpid() and _flusher["thread"].is_alive():
+            return
+        thread = threading.Thread(
+            target=_run_flusher, name="action-log-flusher", daemon=True
+        )
+        thread.start()
+        _flusher.update(thread=thread, pid=os.getpid())
+
+
+def _flush_on_shutdown(**kwargs):
+    if _queue:
+        flush()
+
+
+atexit.register(_flush_on_shutdown)
+worker_process_shutdown.connect(_flush_on_shutdown, weak=False)
+worker_shutdown.connect(_flush_on_shutdown, weak=False)
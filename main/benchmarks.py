@@ -0,0 +1,144 @@
+"""
+Benchmarks for the slow paths in the backend.
+
+Import and call from the shell, e.g.
+
+    from main import benchmarks
+    benchmarks.benchmark_obj_bbox()
+
+Each benchmark prints its timings and returns them as a dict.
+"""
+
+import io
+import pathlib
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+
+import main.model3d as model3d
+from main.models import ObjectFind, known_parents
+
+
+def write_synthetic_obj(path: pathlib.Path, n_vertices: int, seed: int = 0):
+    """Write an ``.obj`` with ``n_vertices`` random vertices plus texture
+    coordinates and faces, roughly matching a photogrammetry export."""
+    rng = np.random.default_rng(seed)
+    batch = 500_000
+    with path.open("w") as fh:
+        fh.write("# synthetic benchmark mesh\nmtllib model.mtl\n")
+        for start in range(0, n_vertices, batch):
+            n = min(batch, n_vertices - start)
+            vertices = rng.uniform(-50, 50, (n, 3)) + [478130.0, 4419430.0, 1000.0]
+            np.savetxt(fh, vertices, fmt="v %.6f %.6f %.6f")
+            np.savetxt(fh, rng.uniform(0, 1, (n, 2)), fmt="vt %.6f %.6f")
+        faces = rng.integers(1, n_vertices + 1, (n_vertices // 2, 3))
+        np.savetxt(fh, faces, fmt="f %d %d %d")
+    return path
+
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def benchmark_obj_bbox(n_vertices: int = 5_000_000):
+    """Compare the line-by-line and vectorized ``.obj`` bounding-box readers."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        obj_path = write_synthetic_obj(pathlib.Path(tmpdir) / "model.obj", n_vertices)
+        size_mb = obj_path.stat().st_size / 1024 / 1024
+        lines_center, lines_time = _timed(model3d.obj_bbox_center_lines, obj_path)
+        vector_center, vector_time = _timed(model3d.obj_bbox_center, obj_path)
+
+    assert lines_center == vector_center
+    print(f"{n_vertices} vertices, {size_mb:.1f} MB")
+    print(f"line by line: {lines_time:.2f}s")
+    print(f"vectorized:   {vector_time:.2f}s ({lines_time / vector_time:.1f}x)")
+    return {
+        "n_vertices": n_vertices,
+        "size_mb": size_mb,
+        "lines_seconds": lines_time,
+        "vectorized_seconds": vector_time,
+    }
+
+
+def write_synthetic_model_set(folder: pathlib.Path, n_vertices: int, texture_px: int):
+    """Write an ``.obj``/``.mtl``/``.jpg`` model set like a photogrammetry export.
+
+    The texture is a noisy gradient saved as a JPEG, so it is about as
+    incompressible as a real photo texture.
+    """
+    obj_path = write_synthetic_obj(folder / "model.obj", n_vertices)
+    (folder / "model.mtl").write_text(
+        "newmtl material0\nKa 1 1 1\nKd 1 1 1\nmap_Kd model.jpg\n"
+    )
+    rng = np.random.default_rng(0)
+    gradient = np.linspace(0, 200, texture_px, dtype=np.float32)
+    pixels = gradient[None, :, None] + rng.normal(0, 25, (texture_px, texture_px, 3))
+    Image.fromarray(pixels.clip(0, 255).astype(np.uint8)).save(
+        folder / "model.jpg", quality=90
+    )
+    return obj_path
+
+
+def benchmark_model_zip_compression(n_vertices: int = 1_000_000, texture_px: int = 8192):
+    """Compare CPU time and zip size of the model zip compression policies."""
+    policies = {
+        "deflate everything": lambda f: (zipfile.ZIP_DEFLATED, None),
+        "store textures, level 6": lambda f: model3d.zip_entry_compression(f, 6),
+        "store textures, level 1": lambda f: model3d.zip_entry_compression(f, 1),
+    }
+    results = {}
+    with tempfile.TemporaryDirectory() as tmpdir:
+        obj_path = write_synthetic_model_set(pathlib.Path(tmpdir), n_vertices, texture_px)
+        files = model3d.companion_files(obj_path)
+        raw_mb = sum(f.stat().st_size for f in files) / 1024 / 1024
+        print(f"model set: {raw_mb:.1f} MB ({', '.join(f.name for f in files)})")
+        for name, policy in policies.items():
+            buffer = io.BytesIO()
+            start = time.process_time()
+            model3d._write_model_zip(buffer, files, compression=policy)
+            cpu = time.process_time() - start
+            zip_mb = buffer.tell() / 1024 / 1024
+            results[name] = {"cpu_seconds": cpu, "zip_mb": zip_mb}
+            print(f"{name:<25} cpu: {cpu:6.2f}s  zip: {zip_mb:7.1f} MB")
+    return results
+
+
+def benchmark_find_update(n_finds: int = 200, rounds: int = 3):
+    """Compare find saves with and without the cache of known areas and contexts.
+
+    Re-saves up to ``n_finds`` existing finds unchanged, like repeated
+    ``ObjectFindDetail.put`` calls. The uncached run empties the cache before
+    every save, so each one checks its area and context as before.
+    """
+    finds = list(ObjectFind.objects.all()[:n_finds])
+    if not finds:
+        raise ValueError("No finds to save")
+
+    def save_all(cached):
+        for find in finds:
+            if not cached:
+                known_parents().clear()
+            find.save()
+
+    results = {}
+    for name, cached in (("uncached", False), ("cached", True)):
+        save_all(cached)  # warm up
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            _, seconds = _timed(lambda: [save_all(cached) for _ in range(rounds)])
+        saves = len(finds) * rounds
+        results[name] = {
+            "saves_per_second": saves / seconds,
+            "queries_per_save": len(queries) / saves,
+        }
+        print(
+            f"{name:<9} {saves / seconds:8.1f} saves/s  "
+            f"{len(queries) / saves:.1f} queries/save"
+        )
+    return results
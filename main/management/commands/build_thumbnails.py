@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+import main.previews as previews
+import main.thumbnails as thumbnails
+from main.models import BagPhoto, ContextPhoto, FindPhoto
+
+
+class Command(BaseCommand):
+    help = (
+        "Make the thumbnails of context and bag photos, and the previews of find "
+        "photos, that are missing any of the THUMBNAIL_SIZES, e.g. after adding "
+        "a size."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            help="Remake the thumbnails of every photo",
+        )
+
+    def handle(self, *args, **kwargs):
+        made = failed = 0
+        for model in (ContextPhoto, BagPhoto):
+            for photo in model.objects.exclude(photo="").iterator():
+                if thumbnails.thumbnails_complete(photo) and not kwargs["all"]:
+                    continue
+                try:
+                    thumbnails.create_thumbnails(photo)
+                except (OSError, ValueError) as e:
+                    self.stderr.write(f"{photo.photo.name}: {e}")
+                    failed += 1
+                    continue
+                made += 1
+        for photo in FindPhoto.objects.exclude(photo="").iterator():
+            name = photo.photo.name
+            if previews.previews_complete(photo) and not kwargs["all"]:
+                continue
+            try:
+                names = previews.create_previews(name)
+            except (OSError, ValueError, previews.NoDecoder) as e:
+                self.stderr.write(f"{name}: {e}")
+                failed += 1
+                continue
+            FindPhoto.objects.filter(id=photo.id).update(preview_sizes=list(names))
+            made += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Made thumbnails for {made} photos, {failed} failed")
+        )
@@ -0,0 +1,31 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+import main.uploads as uploads
+from main.models import PhotoUpload, utc_now
+
+
+class Command(BaseCommand):
+    help = (
+        "Remove resumable photo uploads started more than "
+        "PHOTO_UPLOAD_EXPIRY_HOURS ago, with the chunks received for them."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--hours",
+            type=int,
+            default=settings.PHOTO_UPLOAD_EXPIRY_HOURS,
+            help="Age in hours of the uploads to remove",
+        )
+
+    def handle(self, *args, **kwargs):
+        cutoff = utc_now() - datetime.timedelta(hours=kwargs["hours"])
+        removed = 0
+        for upload in PhotoUpload.objects.filter(created__lt=cutoff).iterator():
+            uploads.discard(upload)
+            upload.delete()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"{removed} uploads removed"))
@@ -0,0 +1,47 @@
+import pathlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.models import PhotoNumber
+from main.utils import largest_photo_number
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the photo number counters from the files on disk, e.g. after "
+        "photos were added or removed outside the app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "folders",
+            nargs="*",
+            help="Only these folders, relative to MEDIA_ROOT",
+        )
+
+    def handle(self, *args, **kwargs):
+        counters = PhotoNumber.objects.order_by("folder", "extension")
+        if kwargs["folders"]:
+            counters = counters.filter(
+                folder__in=[f.strip("/") for f in kwargs["folders"]]
+            )
+        updated = removed = 0
+        for counter in counters:
+            folder = pathlib.Path(settings.MEDIA_ROOT) / counter.folder
+            if not folder.is_dir():
+                # the next upload starts the folder over from 1
+                counter.delete()
+                removed += 1
+                continue
+            largest = largest_photo_number(folder, counter.extension)
+            if largest != counter.last_number:
+                self.stdout.write(f"{counter}: now {largest}")
+                counter.last_number = largest
+                counter.save(update_fields=["last_number"])
+                updated += 1
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{updated} counters updated, {removed} removed for missing folders"
+            )
+        )
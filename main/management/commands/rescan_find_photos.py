@@ -0,0 +1,71 @@
+import datetime
+import pathlib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from main.models import ObjectFind, FindPhoto
+
+
+class Command(BaseCommand):
+    help = (
+        "Bring the FindPhoto table, which find photo listings are served from, "
+        "in step with the find photo folders: add rows for photos copied in "
+        "outside the app and remove rows whose file is gone. Dotfiles are "
+        "skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--dry-run",
+            action="store_true",
+            help="Only report what would change",
+        )
+
+    def handle(self, *args, **kwargs):
+        media_root = pathlib.Path(settings.MEDIA_ROOT)
+        added = removed = 0
+        for object_find in ObjectFind.objects.all().iterator():
+            folder = object_find.absolute_findphoto_folder
+            on_disk = {}
+            if folder.is_dir():
+                on_disk = {
+                    f"{object_find.findphoto_folder}/{f.name}": f
+                    for f in folder.iterdir()
+                    # dotfiles include temp files left by an interrupted atomic_write
+                    if f.is_file() and not f.name.startswith(".")
+                }
+            rows = list(object_find.findphoto_set())
+            indexed = {row.photo.name for row in rows}
+            new_rows = [
+                FindPhoto(
+                    utm_hemisphere=object_find.utm_hemisphere,
+                    utm_zone=object_find.utm_zone,
+                    area_utm_easting_meters=object_find.area_utm_easting_meters,
+                    area_utm_northing_meters=object_find.area_utm_northing_meters,
+                    context_number=object_find.context_number,
+                    find_number=object_find.find_number,
+                    photo=name,
+                    created=datetime.datetime.fromtimestamp(
+                        path.stat().st_mtime, tz=datetime.timezone.utc
+                    ),
+                )
+                for name, path in sorted(on_disk.items())
+                if name not in indexed
+            ]
+            # rows may point outside the find's folder, so check the file itself
+            gone = [
+                row for row in rows if not (media_root / row.photo.name).is_file()
+            ]
+            for row in new_rows:
+                self.stdout.write(f"{object_find}: adding {row.photo.name}")
+            for row in gone:
+                self.stdout.write(f"{object_find}: removing {row.photo.name}")
+            if not kwargs["dry_run"]:
+                FindPhoto.objects.bulk_create(new_rows)
+                FindPhoto.objects.filter(id__in=[row.id for row in gone]).delete()
+            added += len(new_rows)
+            removed += len(gone)
+        self.stdout.write(
+            self.style.SUCCESS(f"{added} photos added, {removed} removed")
+        )
@@ -0,0 +1,386 @@
+"""Read, simplify and write Wavefront ``.obj`` meshes, and convert them to GLB.
+
+Used to generate the lightweight level-of-detail (LOD) and binary glTF (GLB)
+versions of the 3D models described in :mod:`main.model3d`. Only what the
+photogrammetry exports use is supported: vertices, texture coordinates,
+polygonal faces (which are triangulated), ``mtllib`` and ``usemtl``. Normals
+are dropped; viewers recompute them.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+GLB_MAGIC = b"glTF"
+GLB_VERSION = 2
+_GLB_JSON_CHUNK = 0x4E4F534A
+_GLB_BIN_CHUNK = 0x004E4942
+
+# glTF enums
+_FLOAT = 5126
+_UNSIGNED_INT = 5125
+_ARRAY_BUFFER = 34962
+_ELEMENT_ARRAY_BUFFER = 34963
+
+IMAGE_MIME_TYPES = {".jpg": "image/jpeg", ".jpeg": "image/jpeg", ".png": "image/png"}
+
+
+class Mesh:
+    """A triangle mesh held in numpy arrays.
+
+    ``faces`` and ``face_texcoords`` are ``(n, 3)`` arrays of 0-based indices
+    into ``vertices`` and ``texcoords``. ``face_materials`` indexes
+    ``materials`` (-1 for faces before any ``usemtl``).
+    """
+
+    def __init__(
+        self,
+        vertices,
+        texcoords,
+        faces,
+        face_texcoords,
+        face_materials,
+        materials,
+        mtllibs,
+    ):
+        self.vertices = vertices
+        self.texcoords = texcoords
+        self.faces = faces
+        self.face_texcoords = face_texcoords
+        self.face_materials = face_materials
+        self.materials = materials
+        self.mtllibs = mtllibs
+
+    @property
+    def has_texcoords(self):
+        return len(self.texcoords) > 0 and bool((self.face_texcoords >= 0).all())
+
+
+def _obj_index(token, count):
+    # obj indices are 1-based, negative indices count back from the end
+    i = int(token)
+    return i - 1 if i > 0 else count + i
+
+
+def read_obj(path):
+    """Read an ``.obj`` into a :class:`Mesh`, skipping lines that don't parse."""
+    vertices = []
+    texcoords = []
+    faces = []
+    face_texcoords = []
+    face_materials = []
+    materials = []
+    mtllibs = []
+    material = -1
+
+    with path.open("r", errors="ignore") as fh:
+        for line in fh:
+            parts = line.split()
+            if not parts:
+                continue
+            try:
+                if parts[0] == "v":
+                    vertices.append(
+                        (float(parts[1]), float(parts[2]), float(parts[3]))
+                    )
+                elif parts[0] == "vt":
+                    texcoords.append(
+                        (float(parts[1]), float(parts[2]) if len(parts) > 2 else 0.0)
+                    )
+                elif parts[0] == "f" and len(parts) >= 4:
+                    corners = []
+                    for corner in parts[1:]:
+                        refs = corner.split("/")
+                        v = _obj_index(refs[0], len(vertices))
+                        vt = (
+                            _obj_index(refs[1], len(texcoords))
+                            if len(refs) > 1 and refs[1]
+                            else -1
+                        )
+                        corners.append((v, vt))
+                    # fan triangulation
+                    for k in range(1, len(corners) - 1):
+                        tri = (corners[0], corners[k], corners[k + 1])
+                        faces.append(tuple(c[0] for c in tri))
+                        face_texcoords.append(tuple(c[1] for c in tri))
+                        face_materials.append(material)
+                elif parts[0] == "usemtl" and len(parts) > 1:
+                    name = line.split(maxsplit=1)[1].strip()
+                    if name not in materials:
+                        materials.append(name)
+                    material = materials.index(name)
+                elif parts[0] == "mtllib":
+                    mtllibs.append(line.strip())
+            except (ValueError, IndexError):
+                continue
+
+    faces = np.array(faces, dtype=np.int64).reshape(-1, 3)
+    face_texcoords = np.array(face_texcoords, dtype=np.int64).reshape(-1, 3)
+    face_materials = np.array(face_materials, dtype=np.int64)
+    valid = ((faces >= 0) & (faces < len(vertices))).all(axis=1)
+    face_texcoords[(face_texcoords >= len(texcoords)) | (face_texcoords < 0)] = -1
+    return Mesh(
+        vertices=np.array(vertices, dtype=np.float64).reshape(-1, 3),
+        texcoords=np.array(texcoords, dtype=np.float64).reshape(-1, 2),
+        faces=faces[valid],
+        face_texcoords=face_texcoords[valid],
+        face_materials=face_materials[valid],
+        materials=materials,
+        mtllibs=mtllibs,
+    )
+
+
+def _compact(indices, values):
+    """Drop values no index refers to and renumber the indices to match."""
+    used, inverse = np.unique(indices.ravel(), return_inverse=True)
+    return inverse.reshape(indices.shape), values[used]
+
+
+def cluster_vertices(mesh, cell_size):
+    """Simplify the mesh by merging all vertices within each grid cell.
+
+    Merged vertices are placed at the mean of the originals. Faces that
+    collapse to a line or point are dropped; the rest keep their original
+    texture coordinates, so the texture still maps onto the simplified mesh.
+    """
+    origin = mesh.vertices.min(axis=0)
+    cells = np.floor((mesh.vertices - origin) / cell_size).astype(np.int64)
+    key = np.ravel_multi_index(cells.T, cells.max(axis=0) + 1)
+    _, cluster = np.unique(key, return_inverse=True)
+    counts = np.bincount(cluster)
+    vertices = np.stack(
+        [np.bincount(cluster, weights=mesh.vertices[:, i]) for i in range(3)],
+        axis=1,
+    ) / counts[:, None]
+
+    faces = cluster.ravel()[mesh.faces]
+    keep = (
+        (faces[:, 0] != faces[:, 1])
+        & (faces[:, 1] != faces[:, 2])
+        & (faces[:, 0] != faces[:, 2])
+    )
+    faces, vertices = _compact(faces[keep], vertices)
+    face_texcoords = mesh.face_texcoords[keep]
+    texcoords = mesh.texcoords
+    if mesh.has_texcoords and len(face_texcoords):
+        face_texcoords, texcoords = _compact(face_texcoords, texcoords)
+
+    return Mesh(
+        vertices=vertices,
+        texcoords=texcoords,
+        faces=faces,
+        face_texcoords=face_texcoords,
+        face_materials=mesh.face_materials[keep],
+        materials=mesh.materials,
+        mtllibs=mesh.mtllibs,
+    )
+
+
+def decimate(mesh, target_faces, iterations=16):
+    """Simplify the mesh to at most ``target_faces`` faces (as close as found).
+
+    Searches for the vertex clustering cell size that gives the face count
+    closest to the target without going over it.
+    """
+    if target_faces >= len(mesh.faces) or not len(mesh.faces):
+        return mesh
+    extent = float(np.linalg.norm(np.ptp(mesh.vertices, axis=0))) or 1.0
+    # the finest cell keeps the grid index within int64
+    low, high = extent / 2**20, extent
+    best = None
+    for _ in range(iterations):
+        cell_size = (low * high) ** 0.5
+        candidate = cluster_vertices(mesh, cell_size)
+        if len(candidate.faces) > target_faces:
+            low = cell_size
+        else:
+            high = cell_size
+            best = candidate
+            if len(candidate.faces) >= 0.95 * target_faces:
+                break
+    return best if best is not None else cluster_vertices(mesh, high)
+
+
+def write_obj(mesh, fh, header=""):
+    """Write the mesh as ``.obj`` text to an open file."""
+    if header:
+        fh.write(f"# {header}\n")
+    for mtllib in mesh.mtllibs:
+        fh.write(f"{mtllib}\n")
+    np.savetxt(fh, mesh.vertices, fmt="v %.6f %.6f %.6f")
+    with_texcoords = mesh.has_texcoords
+    if with_texcoords:
+        np.savetxt(fh, mesh.texcoords, fmt="vt %.6f %.6f")
+
+    order = np.argsort(mesh.face_materials, kind="stable")
+    groups = np.split(
+        order, np.flatnonzero(np.diff(mesh.face_materials[order])) + 1
+    )
+    for group in groups:
+        if not len(group):
+            continue
+        material = mesh.face_materials[group[0]]
+        if material >= 0:
+            fh.write(f"usemtl {mesh.materials[material]}\n")
+        faces = mesh.faces[group] + 1
+        if with_texcoords:
+            corners = np.empty((len(group), 6), dtype=np.int64)
+            corners[:, 0::2] = faces
+            corners[:, 1::2] = mesh.face_texcoords[group] + 1
+            np.savetxt(fh, corners, fmt="f %d/%d %d/%d %d/%d")
+        else:
+            np.savetxt(fh, faces, fmt="f %d %d %d")
+
+
+def read_mtl_textures(path):
+    """Map each material in an ``.mtl`` to the file name of its ``map_Kd`` texture."""
+    textures = {}
+    material = None
+    with path.open("r", errors="ignore") as fh:
+        for line in fh:
+            parts = line.split()
+            if len(parts) < 2:
+                continue
+            if parts[0] == "newmtl":
+                material = line.split(maxsplit=1)[1].strip()
+            elif parts[0] == "map_Kd" and material is not None:
+                # options such as -s or -o come before the file name
+                textures[material] = parts[-1]
+    return textures
+
+
+def _pad(data, fill=b"\0"):
+    return data + fill * (-len(data) % 4)
+
+
+def write_glb(mesh, fh, images=None):
+    """Write the mesh as binary glTF (GLB) to an open binary file.
+
+    ``images`` maps material names to ``(data, mime_type)`` textures, which
+    are embedded in the GLB. Positions are written relative to the center of
+    the bounding box, which becomes the node translation, so large projected
+    coordinates keep their precision as 32-bit floats.
+    """
+    images = images or {}
+    with_texcoords = mesh.has_texcoords
+    if with_texcoords:
+        # glTF attributes are per vertex, so every distinct (vertex, texcoord)
+        # pair used by a face corner becomes a vertex
+        n_texcoords = len(mesh.texcoords)
+        corners = mesh.faces.ravel() * n_texcoords + mesh.face_texcoords.ravel()
+        pairs, indices = np.unique(corners, return_inverse=True)
+        positions = mesh.vertices[pairs // n_texcoords]
+        texcoords = mesh.texcoords[pairs % n_texcoords].astype(np.float32)
+        texcoords[:, 1] = 1 - texcoords[:, 1]  # glTF puts the uv origin top left
+        indices = indices.reshape(-1, 3)
+    else:
+        positions = mesh.vertices
+        indices = mesh.faces
+
+    if len(positions):
+        mins, maxs = positions.min(axis=0), positions.max(axis=0)
+    else:
+        mins = maxs = np.zeros(3)
+    center = (mins + maxs) / 2
+    positions = (positions - center).astype(np.float32)
+
+    gltf = {
+        "asset": {"version": "2.0", "generator": "aslcv2"},
+        "scene": 0,
+        "scenes": [{"nodes": [0]}],
+        "nodes": [{"mesh": 0, "translation": [float(x) for x in center]}],
+        "buffers": [],
+        "bufferViews": [],
+        "accessors": [],
+    }
+    blobs = []
+    offset = 0
+
+    def add_view(data, target=None):
+        nonlocal offset
+        view = {"buffer": 0, "byteOffset": offset, "byteLength": len(data)}
+        if target is not None:
+            view["target"] = target
+        gltf["bufferViews"].append(view)
+        padded = _pad(data)
+        blobs.append(padded)
+        offset += len(padded)
+        return len(gltf["bufferViews"]) - 1
+
+    def add_accessor(accessor):
+        gltf["accessors"].append(accessor)
+        return len(gltf["accessors"]) - 1
+
+    attributes = {
+        "POSITION": add_accessor(
+            {
+                "bufferView": add_view(positions.tobytes(), _ARRAY_BUFFER),
+                "componentType": _FLOAT,
+                "count": len(positions),
+                "type": "VEC3",
+                "min": [float(x) for x in mins - center],
+                "max": [float(x) for x in maxs - center],
+            }
+        )
+    }
+    if with_texcoords:
+        attributes["TEXCOORD_0"] = add_accessor(
+            {
+                "bufferView": add_view(texcoords.tobytes(), _ARRAY_BUFFER),
+                "componentType": _FLOAT,
+                "count": len(texcoords),
+                "type": "VEC2",
+            }
+        )
+
+    # one primitive per material, all indexing the same vertex attributes
+    order = np.argsort(mesh.face_materials, kind="stable")
+    grouped = indices[order].astype(np.uint32)
+    indices_view = add_view(grouped.tobytes(), _ELEMENT_ARRAY_BUFFER)
+    materials = []
+    primitives = []
+    for material in np.unique(mesh.face_materials):
+        rows = np.flatnonzero(mesh.face_materials[order] == material)
+        primitive = {
+            "attributes": attributes,
+            "indices": add_accessor(
+                {
+                    "bufferView": indices_view,
+                    "byteOffset": int(rows[0]) * 3 * 4,
+                    "componentType": _UNSIGNED_INT,
+                    "count": len(rows) * 3,
+                    "type": "SCALAR",
+                }
+            ),
+        }
+        if material >= 0:
+            primitive["material"] = len(materials)
+            materials.append(mesh.materials[material])
+        primitives.append(primitive)
+    gltf["meshes"] = [{"primitives": primitives}]
+
+    if materials:
+        gltf["materials"] = []
+        for name in materials:
+            pbr = {"metallicFactor": 0.0, "roughnessFactor": 1.0}
+            if with_texcoords and name in images:
+                data, mime_type = images[name]
+                gltf.setdefault("images", []).append(
+                    {"bufferView": add_view(data), "mimeType": mime_type}
+                )
+                gltf.setdefault("textures", []).append(
+                    {"source": len(gltf["images"]) - 1}
+                )
+                pbr["baseColorTexture"] = {"index": len(gltf["textures"]) - 1}
+            gltf["materials"].append({"name": name, "pbrMetallicRoughness": pbr})
+
+    gltf["buffers"].append({"byteLength": offset})
+    json_chunk = _pad(json.dumps(gltf, separators=(",", ":")).encode(), b" ")
+    length = 12 + 8 + len(json_chunk) + 8 + offset
+    fh.write(struct.pack("<4sII", GLB_MAGIC, GLB_VERSION, length))
+    fh.write(struct.pack("<II", len(json_chunk), _GLB_JSON_CHUNK))
+    fh.write(json_chunk)
+    fh.write(struct.pack("<II", offset, _GLB_BIN_CHUNK))
+    for blob in blobs:
+        fh.write(blob)
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:41
+
+from django.db import migrations, models
+
+
+def add_top_trench_origin(apps, schema_editor):
+    # previously hard-coded in main.model3d.SITE_ORIGINS
+    SiteOrigin = apps.get_model("main", "SiteOrigin")
+    SiteOrigin.objects.get_or_create(
+        utm_hemisphere="N",
+        utm_zone=38,
+        area_utm_easting_meters=478130,
+        area_utm_northing_meters=4419430,
+        defaults={"origin_x": 129.4, "origin_y": -1066.24, "origin_z": 429.592},
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_alter_findphoto_photo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SiteOrigin',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('utm_hemisphere', models.CharField(choices=[('N', 'North'), ('S', 'South')], max_length=1, verbose_name='UTM Hemisphere')),
+                ('utm_zone', models.IntegerField(verbose_name='UTM Zone')),
+                ('area_utm_easting_meters', models.IntegerField(verbose_name='Easting (meters)')),
+                ('area_utm_northing_meters', models.IntegerField(verbose_name='Northing (meters)')),
+                ('origin_x', models.FloatField(verbose_name='Origin X')),
+                ('origin_y', models.FloatField(verbose_name='Origin Y')),
+                ('origin_z', models.FloatField(verbose_name='Origin Z')),
+                ('source', models.CharField(choices=[('M', 'Manual'), ('C', 'Computed from models')], default='M', max_length=1, verbose_name='Source')),
+                ('updated', models.DateTimeField(auto_now=True, verbose_name='Updated')),
+            ],
+            options={
+                'db_table': 'site_origins',
+                'ordering': ['utm_hemisphere', 'utm_zone', 'area_utm_easting_meters', 'area_utm_northing_meters'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='siteorigin',
+            constraint=models.UniqueConstraint(fields=('utm_hemisphere', 'utm_zone', 'area_utm_easting_meters', 'area_utm_northing_meters'), name='unique_site_origin'),
+        ),
+        migrations.RunPython(add_top_trench_origin, migrations.RunPython.noop),
+    ]
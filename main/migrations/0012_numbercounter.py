@@ -0,0 +1,30 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_siteorigin'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NumberCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=16, verbose_name='Kind')),
+                ('utm_hemisphere', models.CharField(choices=[('N', 'North'), ('S', 'South')], max_length=1, verbose_name='UTM Hemisphere')),
+                ('utm_zone', models.IntegerField(verbose_name='UTM Zone')),
+                ('area_utm_easting_meters', models.IntegerField(verbose_name='Easting (meters)')),
+                ('area_utm_northing_meters', models.IntegerField(verbose_name='Northing (meters)')),
+                ('context_number', models.IntegerField(default=0, verbose_name='Context Number')),
+                ('last_number', models.IntegerField(verbose_name='Last Number')),
+            ],
+            options={
+                'db_table': 'number_counters',
+                'managed': False,
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_numbercounter'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoNumber',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('folder', models.CharField(max_length=255, verbose_name='Folder')),
+                ('extension', models.CharField(blank=True, default='', max_length=8, verbose_name='Extension')),
+                ('last_number', models.IntegerField(verbose_name='Last Number')),
+            ],
+            options={
+                'db_table': 'photo_numbers',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='photonumber',
+            constraint=models.UniqueConstraint(fields=('folder', 'extension'), name='unique_photo_number'),
+        ),
+    ]
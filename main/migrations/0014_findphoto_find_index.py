@@ -0,0 +1,17 @@
+# Generated by Django 4.2.13 on 2026-10-18 15:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_photonumber'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='findphoto',
+            index=models.Index(fields=['utm_hemisphere', 'utm_zone', 'area_utm_easting_meters', 'area_utm_northing_meters', 'context_number', 'find_number'], name='find_photos_find_idx'),
+        ),
+    ]
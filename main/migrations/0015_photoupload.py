@@ -0,0 +1,40 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:05
+
+from django.conf import settings
+import django.core.serializers.json
+from django.db import migrations, models
+import django.db.models.deletion
+import main.models
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('main', '0014_findphoto_find_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PhotoUpload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('context', 'Context Photo'), ('bag', 'Bag Photo'), ('find', 'Find Photo')], max_length=7, verbose_name='Kind')),
+                ('target_id', models.UUIDField(verbose_name='Context or Find ID')),
+                ('source', models.CharField(choices=[('F', 'In Field'), ('D', 'Drying')], default='F', max_length=1, verbose_name='Location where taken')),
+                ('filename', models.CharField(max_length=255, verbose_name='Filename')),
+                ('size', models.BigIntegerField(verbose_name='Size (bytes)')),
+                ('chunk_size', models.IntegerField(verbose_name='Chunk size (bytes)')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Received (bytes)')),
+                ('created', models.DateTimeField(default=main.models.utc_now, verbose_name='Created')),
+                ('result', models.JSONField(blank=True, encoder=django.core.serializers.json.DjangoJSONEncoder, null=True, verbose_name='Result')),
+                ('user', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Photo Upload',
+                'verbose_name_plural': 'Photo Uploads',
+                'db_table': 'photo_uploads',
+            },
+        ),
+    ]
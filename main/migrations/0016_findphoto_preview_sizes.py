@@ -0,0 +1,18 @@
+# Generated by Django 4.2.13 on 2026-10-18 16:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_photoupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='findphoto',
+            name='preview_sizes',
+            field=models.JSONField(blank=True, default=list, verbose_name='Preview sizes'),
+        ),
+    ]
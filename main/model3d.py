@@ -4,24 +4,86 @@
 ``MEDIA_ROOT/{H}/{Z}/{E}/{N}/{C}/bottom/exports/obj`` and consist of sets of
 three same-named files: a ``.obj`` mesh, a ``.mtl`` material, and a ``.jpg``
 texture. This module resolves that folder, selects a model set, computes the
-bounding-box center of the mesh, and packages the set into an in-memory zip.
+bounding-box center of the mesh, and packages the set into a zip, either in
+memory or streamed chunk by chunk for large exports.
+
+Lightweight level-of-detail (LOD) versions of each mesh, and binary glTF
+(GLB) conversions, are generated in the background with :mod:`main.mesh` and
+served alongside the original.
+
+Derived data (the model manifest, prebuilt zips, LOD meshes and GLBs) is cached under
+``MEDIA_ROOT/.model_cache`` in a tree mirroring the model folders, so writing
+it never touches the export folders themselves.
 """
 
+import contextlib
+import fcntl
+import hashlib
 import io
+import json
+import os
 import pathlib
+import shutil
+import threading
+import time
+import uuid
+import warnings
 import zipfile
 
+import numpy as np
 from django.conf import settings
 
+import main.mesh as mesh
+from main.models import SiteOrigin
+from main.utils import atomic_write
+
 MODEL_SUBFOLDER = "bottom/exports/obj"
 
+MODEL_CACHE_SUBFOLDER = ".model_cache"
+
+MANIFEST_FILENAME = "manifest.json"
+
+# Bump when the manifest layout changes so stale manifests are rebuilt.
+MANIFEST_VERSION = 2
+
+# Per-area index of the manifests of every context in the area.
+AREA_INDEX_FILENAME = "models.json"
+AREA_INDEX_VERSION = 1
+
+LOD_SUBFOLDER = "lod"
+GLB_SUBFOLDER = "glb"
+
+# Decimated levels of detail generated for each model, as a percentage of the
+# original face count. FULL_LOD is the original model.
+MODEL_LODS = (10, 25)
+FULL_LOD = 100
+
+# Download formats: the obj/mtl/texture set as a zip, or a binary glTF with
+# the texture embedded.
+MODEL_FORMATS = ("zip", "glb")
+
+# Seconds after which a lock left by a crashed background build is ignored.
+BUILD_LOCK_TIMEOUT = 60 * 60
+
 TEXTURE_EXTENSIONS = (".jpg", ".jpeg", ".png")
 
-# Hard-coded site origins keyed by (easting, northing). Models will later be
-# organized with respect to these origins. Sites not listed here return "NA".
-SITE_ORIGINS = {
-    (478130, 4419430): [129.4, -1066.24, 429.592],
-}
+# Size of the blocks read from disk when streaming a model zip. Memory used per
+# download stays proportional to this rather than to the size of the model.
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Size of the blocks scanned at once when reading vertices from an ``.obj``.
+OBJ_READ_CHUNK_SIZE = 8 * 1024 * 1024
+
+_NEWLINE, _SPACE, _V = ord("\n"), ord(" "), ord("v")
+
+# Bytes the vectorized vertex reader parses exactly like ``float()``. Vertex
+# lines with anything else are left to the per-line reader.
+_FAST_BYTES = b"0123456789+-.eE \t\n\x0b\x0cinfatyINFATY"
+
+# Site origins loaded from the SiteOrigin table, keyed by (hemisphere, zone,
+# easting, northing) and reloaded every SITE_ORIGIN_CACHE_TTL seconds.
+_site_origin_cache = {"expires": 0.0, "origins": {}}
+_site_origin_lock = threading.Lock()
 
 
 def context_subroot(
@@ -41,6 +103,22 @@ def context_subroot(
     )
 
 
+def area_folder(
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+):
+    """Return the absolute path to the ``{H}/{Z}/{E}/{N}`` folder of an area."""
+    return (
+        pathlib.Path(settings.MEDIA_ROOT)
+        / f"{utm_hemisphere}"
+        / f"{utm_zone}"
+        / f"{area_utm_easting_meters}"
+        / f"{area_utm_northing_meters}"
+    )
+
+
 def model_obj_folder(
     utm_hemisphere,
     utm_zone,
@@ -59,6 +137,12 @@ def model_obj_folder(
     return pathlib.Path(settings.MEDIA_ROOT) / subroot / MODEL_SUBFOLDER
 
 
+def model_cache_folder(folder: pathlib.Path):
+    """Return the cache folder that mirrors a model folder under MEDIA_ROOT."""
+    media_root = pathlib.Path(settings.MEDIA_ROOT)
+    return media_root / MODEL_CACHE_SUBFOLDER / folder.relative_to(media_root)
+
+
 def list_obj_files(folder: pathlib.Path):
     """Return all ``.obj`` files in the folder (case-insensitive)."""
     if not folder.exists():
@@ -117,40 +201,162 @@ def companion_files(obj_path: pathlib.Path):
     return files
 
 
-def obj_bbox_center(obj_path: pathlib.Path, ndigits: int = 4):
-    """Compute the bounding-box center of the mesh from the ``.obj`` vertices.
+def _bbox_center(bounds, ndigits):
+    if bounds is None:
+        return None
+    mins, maxs = bounds
+    return [round((lo + hi) / 2, ndigits) for lo, hi in zip(mins, maxs)]
 
-    Returns ``[cx, cy, cz]`` (midpoint of min/max on each axis) or ``None`` if
-    the file contains no vertices.
+
+def _vertex_bounds_lines(lines):
+    """Reference per-line vertex scan.
+
+    Returns ``(mins, maxs)`` as lists of floats, or ``None`` if no vertex
+    lines were found.
     """
     min_x = min_y = min_z = float("inf")
     max_x = max_y = max_z = float("-inf")
     found = False
 
+    for line in lines:
+        if not line.startswith("v "):
+            continue
+        parts = line.split()
+        if len(parts) < 4:
+            continue
+        try:
+            x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
+        except ValueError:
+            continue
+        found = True
+        min_x, max_x = min(min_x, x), max(max_x, x)
+        min_y, max_y = min(min_y, y), max(max_y, y)
+        min_z, max_z = min(min_z, z), max(max_z, z)
+
+    if not found:
+        return None
+    return [min_x, min_y, min_z], [max_x, max_y, max_z]
+
+
+def obj_bbox_center_lines(obj_path: pathlib.Path, ndigits: int = 4):
+    """Line-by-line version of :func:`obj_bbox_center`.
+
+    Kept as the reference implementation the vectorized reader is checked and
+    benchmarked against.
+    """
     with obj_path.open("r", errors="ignore") as fh:
-        for line in fh:
-            if not line.startswith("v "):
-                continue
-            parts = line.split()
-            if len(parts) < 4:
-                continue
-            try:
-                x, y, z = float(parts[1]), float(parts[2]), float(parts[3])
-            except ValueError:
-                continue
-            found = True
-            min_x, max_x = min(min_x, x), max(max_x, x)
-            min_y, max_y = min(min_y, y), max(max_y, y)
-            min_z, max_z = min(min_z, z), max(max_z, z)
+        return _bbox_center(_vertex_bounds_lines(fh), ndigits)
+
+
+def _vertex_bounds_block(block):
+    """Vectorized vertex scan of a block of whole lines.
+
+    Handles the common case where every ``v`` line in the block is plain ASCII
+    with the same number of numeric fields. Returns ``(mins, maxs)`` as numpy
+    arrays, ``None`` if the block has no vertex lines, or ``False`` if the
+    block has to be parsed line by line instead.
+    """
+    buf = np.frombuffer(block, dtype=np.uint8)
+    newlines = np.flatnonzero(buf == _NEWLINE)
+    starts = np.concatenate(([0], newlines + 1))
+    stops = np.minimum(np.concatenate((newlines, [len(buf)])) + 1, len(buf))
+    is_vertex = np.zeros(len(starts), dtype=bool)
+    long_enough = stops - starts >= 2
+    heads = starts[long_enough]
+    is_vertex[long_enough] = (buf[heads] == _V) & (buf[heads + 1] == _SPACE)
+    if not is_vertex.any():
+        return None
+
+    # vertex lines come in long contiguous runs, so copy them out run by run
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], is_vertex, [0]))))
+    runs = zip(starts[edges[::2]], stops[edges[1::2] - 1])
+    selected = np.frombuffer(
+        bytearray(b"".join(block[first:stop] for first, stop in runs)),
+        dtype=np.uint8,
+    )
+    line_lengths = stops[is_vertex] - starts[is_vertex]
+    line_starts = np.concatenate(([0], np.cumsum(line_lengths)[:-1]))
+    selected[line_starts] = _SPACE
+    text = selected.tobytes()
+    if text.translate(None, _FAST_BYTES):
+        return False
+
+    # only whitespace is below "+" among the allowed bytes
+    is_space = selected < ord("+")
+    token_starts = ~is_space
+    token_starts[1:] &= is_space[:-1]
+    tokens = np.flatnonzero(token_starts)
+    ncols, extra = divmod(len(tokens), len(line_starts))
+    if ncols < 3 or extra:
+        return False
+    # every line holds exactly ncols tokens when the first and last token of
+    # each group of ncols fall inside that line
+    line_ends = np.append(line_starts[1:], len(selected))
+    firsts = tokens[::ncols]
+    lasts = tokens[ncols - 1 :: ncols]
+    if not ((firsts >= line_starts) & (lasts < line_ends)).all():
+        return False
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error", DeprecationWarning)
+        try:
+            values = np.fromstring(text, sep=" ")
+        except (DeprecationWarning, ValueError):
+            return False
+    if values.size != len(line_starts) * ncols:
+        return False
+    xyz = values.reshape(-1, ncols)[:, :3]
+    return np.fmin.reduce(xyz, axis=0), np.fmax.reduce(xyz, axis=0)
+
+
+def obj_vertex_bounds(obj_path: pathlib.Path, chunk_size: int = OBJ_READ_CHUNK_SIZE):
+    """Return the per-axis ``(mins, maxs)`` of the ``.obj`` vertices, or ``None``.
+
+    The file is read in large blocks cut at line boundaries. Each block is
+    scanned with numpy; blocks the vectorized reader cannot handle exactly are
+    passed to the per-line scan so the result always matches
+    :func:`obj_bbox_center_lines`.
+    """
+    mins = np.full(3, np.inf)
+    maxs = np.full(3, -np.inf)
+    found = False
+    leftover = b""
+
+    with obj_path.open("rb") as fh:
+        while True:
+            data = fh.read(chunk_size)
+            if b"\r" in data:
+                data = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+            if data:
+                data = leftover + data
+                cut = data.rfind(b"\n") + 1
+                block, leftover = data[:cut], data[cut:]
+            else:
+                block, leftover = leftover, b""
+            if block:
+                bounds = _vertex_bounds_block(block)
+                if bounds is False:
+                    text = block.decode("utf-8", errors="ignore")
+                    bounds = _vertex_bounds_lines(text.split("\n"))
+                if bounds is not None:
+                    found = True
+                    mins = np.fmin(mins, bounds[0])
+                    maxs = np.fmax(maxs, bounds[1])
+            if not data:
+                break
 
     if not found:
         return None
+    return [float(v) for v in mins], [float(v) for v in maxs]
 
-    return [
-        round((min_x + max_x) / 2, ndigits),
-        round((min_y + max_y) / 2, ndigits),
-        round((min_z + max_z) / 2, ndigits),
-    ]
+
+def obj_bbox_center(obj_path: pathlib.Path, ndigits: int = 4):
+    """Compute the bounding-box center of the mesh from the ``.obj`` vertices.
+
+    Returns ``[cx, cy, cz]`` (midpoint of min/max on each axis) or ``None`` if
+    the file contains no vertices.
+    """
+    return _bbox_center(obj_vertex_bounds(obj_path), ndigits)
 
 
 def model_zip_name(obj_path: pathlib.Path):
@@ -158,21 +364,679 @@ def model_zip_name(obj_path: pathlib.Path):
     return f"{obj_path.stem}.zip"
 
 
+def zip_entry_compression(path: pathlib.Path, compresslevel=None):
+    """Return the ``(compress_type, compresslevel)`` used for a file in a model zip.
+
+    Textures are already compressed images, so they are stored as-is. Meshes
+    and materials are deflated at ``compresslevel``, which defaults to the
+    ``MODEL_ZIP_COMPRESSLEVEL`` setting (1 is fastest, 9 is smallest).
+    """
+    if path.suffix.lower() in TEXTURE_EXTENSIONS:
+        return zipfile.ZIP_STORED, None
+    if compresslevel is None:
+        compresslevel = settings.MODEL_ZIP_COMPRESSLEVEL
+    return zipfile.ZIP_DEFLATED, compresslevel
+
+
 def build_model_zip(obj_path: pathlib.Path):
     """Package the model set into an in-memory zip.
 
     Returns a tuple of ``(zip_bytes, zip_filename)``.
     """
-    files = companion_files(obj_path)
     buffer = io.BytesIO()
-    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for f in files:
-            zf.write(f, arcname=f.name)
+    _write_model_zip(buffer, companion_files(obj_path))
     buffer.seek(0)
     return buffer.getvalue(), model_zip_name(obj_path)
 
 
-def get_site_origin(area_utm_easting_meters, area_utm_northing_meters):
-    """Return the hard-coded origin for a site, or ``"NA"`` if not configured."""
-    key = (int(area_utm_easting_meters), int(area_utm_northing_meters))
-    return SITE_ORIGINS.get(key, "NA")
+def _write_model_zip(fp, files, compression=zip_entry_compression):
+    with zipfile.ZipFile(fp, "w") as zf:
+        for f in files:
+            compress_type, compresslevel = compression(f)
+            zf.write(
+                f,
+                arcname=f.name,
+                compress_type=compress_type,
+                compresslevel=compresslevel,
+            )
+
+
+class _ZipChunkSink:
+    """Write-only file-like object that collects zip output until drained.
+
+    ``zipfile`` detects that it cannot ``tell``/``seek`` and falls back to
+    writing data descriptors, so entries can be emitted without knowing their
+    compressed size up front.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _set_zinfo_compresslevel(zinfo, compresslevel):
+    """Set the deflate level ``ZipFile.open(zinfo, "w")`` compresses an entry at.
+
+    ZipFile.open has no compresslevel argument and takes the level from the
+    ZipInfo, in an attribute that isn't public: ``compress_level`` from Python
+    3.13 and ``_compresslevel`` before it. StreamingModelZipTest checks that
+    the level is applied, so a rename in a later Python fails there.
+    """
+    if hasattr(zinfo, "compress_level"):
+        zinfo.compress_level = compresslevel
+    else:
+        zinfo._compresslevel = compresslevel
+
+
+def iter_zip_files(files, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Stream the files as a zip, yielding bytes as entries are read from disk.
+
+    Each file is read ``chunk_size`` bytes at a time and the compressed output
+    is yielded immediately, so memory use does not grow with the file sizes.
+    """
+    sink = _ZipChunkSink()
+    with zipfile.ZipFile(sink, "w") as zf:
+        for f in files:
+            zinfo = zipfile.ZipInfo.from_file(f, arcname=f.name)
+            zinfo.compress_type, compresslevel = zip_entry_compression(f)
+            _set_zinfo_compresslevel(zinfo, compresslevel)
+            with f.open("rb") as src, zf.open(zinfo, "w") as dest:
+                while True:
+                    block = src.read(chunk_size)
+                    if not block:
+                        break
+                    dest.write(block)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def iter_model_zip(obj_path: pathlib.Path, chunk_size: int = STREAM_CHUNK_SIZE):
+    """Stream the model set for the ``.obj`` as a zip (see :func:`iter_zip_files`)."""
+    return iter_zip_files(companion_files(obj_path), chunk_size)
+
+
+def _file_entry(path: pathlib.Path):
+    st = path.stat()
+    return {"name": path.name, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def build_model_manifest(folder: pathlib.Path):
+    """Compute the manifest describing the model set served for a folder.
+
+    The manifest records the selected ``.obj``, the files that go into the zip
+    and the bounding-box center, along with the size and mtime of every file
+    the result depends on so it can be validated later without re-parsing.
+    Returns ``None`` if the folder has no ``.obj``.
+    """
+    folder_mtime_ns = folder.stat().st_mtime_ns if folder.exists() else None
+    objs = list_obj_files(folder)
+    if not objs:
+        return None
+    obj_path = min(objs, key=lambda p: p.stat().st_size)
+    bounds = obj_vertex_bounds(obj_path)
+    return {
+        "version": MANIFEST_VERSION,
+        "folder_mtime_ns": folder_mtime_ns,
+        "obj_filename": obj_path.name,
+        "zip_filename": model_zip_name(obj_path),
+        "center": _bbox_center(bounds, 4),
+        "bounds": None if bounds is None else [np.asarray(b).tolist() for b in bounds],
+        "objs": [_file_entry(f) for f in objs],
+        "files": [_file_entry(f) for f in companion_files(obj_path)],
+    }
+
+
+def manifest_is_current(folder: pathlib.Path, manifest):
+    """Check a manifest against the folder using only ``stat`` calls.
+
+    Adding, removing or renaming files changes the folder's mtime; rewriting a
+    file in place changes that file's size or mtime.
+    """
+    if manifest.get("version") != MANIFEST_VERSION:
+        return False
+    try:
+        if folder.stat().st_mtime_ns != manifest["folder_mtime_ns"]:
+            return False
+        for entry in manifest["objs"] + manifest["files"]:
+            if _file_entry(folder / entry["name"]) != entry:
+                return False
+    except (OSError, KeyError):
+        return False
+    return True
+
+
+def load_model_manifest(folder: pathlib.Path):
+    """Return the cached manifest for the folder, or ``None`` if missing or stale."""
+    manifest_path = model_cache_folder(folder) / MANIFEST_FILENAME
+    try:
+        manifest = json.loads(manifest_path.read_text())
+    except (OSError, ValueError):
+        return None
+    if not manifest_is_current(folder, manifest):
+        return None
+    return manifest
+
+
+def save_model_manifest(folder: pathlib.Path, manifest):
+    """Atomically write the manifest to the folder's cache location."""
+    with atomic_write(model_cache_folder(folder) / MANIFEST_FILENAME, "w") as fh:
+        json.dump(manifest, fh)
+
+
+def get_model_manifest(folder: pathlib.Path):
+    """Return an up to date manifest for the folder, rebuilding it if needed.
+
+    Returns ``None`` if the folder has no ``.obj``.
+    """
+    manifest = load_model_manifest(folder)
+    if manifest is None:
+        manifest = build_model_manifest(folder)
+        if manifest is not None:
+            save_model_manifest(folder, manifest)
+    return manifest
+
+
+def _fingerprint(data):
+    key = json.dumps(data, sort_keys=True).encode()
+    return hashlib.sha1(key).hexdigest()[:16]
+
+
+def model_fingerprint(manifest):
+    """Fingerprint the files of a model set from the names, sizes and mtimes
+    recorded in its manifest, plus the compression level used to zip them."""
+    return _fingerprint(
+        {"files": manifest["files"], "compresslevel": settings.MODEL_ZIP_COMPRESSLEVEL}
+    )
+
+
+def model_zip_artifact(folder: pathlib.Path, manifest):
+    """Path of the prebuilt zip for the model set described by the manifest."""
+    return model_cache_folder(folder) / f"{model_fingerprint(manifest)}.zip"
+
+
+def build_model_zip_artifact(folder: pathlib.Path):
+    """Build the zip for the folder's model set into the cache, if not already built.
+
+    Artifacts for older versions of the model set are removed. Returns the
+    path of the artifact, or ``None`` if the folder has no ``.obj``.
+    """
+    manifest = get_model_manifest(folder)
+    if manifest is None:
+        return None
+    artifact = model_zip_artifact(folder, manifest)
+    if artifact.exists():
+        return artifact
+
+    files = [folder / entry["name"] for entry in manifest["files"]]
+    with atomic_write(artifact) as fh:
+        _write_model_zip(fh, files)
+    for old in artifact.parent.glob("*.zip"):
+        if old != artifact:
+            old.unlink(missing_ok=True)
+    return artifact
+
+
+def model_lod_obj(folder: pathlib.Path, manifest, lod: int):
+    """Path of the decimated ``.obj`` for a LOD of the manifest's model set.
+
+    The ``.obj`` keeps the original name so the ``mtllib`` reference and the
+    texture still match when it is zipped with the original companions.
+    """
+    version = _fingerprint(manifest["files"])
+    return (
+        model_cache_folder(folder)
+        / LOD_SUBFOLDER
+        / f"{version}-{lod}"
+        / manifest["obj_filename"]
+    )
+
+
+def _lod_lock(folder: pathlib.Path, manifest):
+    version = _fingerprint(manifest["files"])
+    return model_cache_folder(folder) / LOD_SUBFOLDER / f"{version}.lock"
+
+
+def _is_locked(lock: pathlib.Path):
+    """True if a worker holds the lock file and has not timed out."""
+    try:
+        return time.time() - lock.stat().st_mtime <= BUILD_LOCK_TIMEOUT
+    except FileNotFoundError:
+        return False
+
+
+@contextlib.contextmanager
+def _build_lock(lock: pathlib.Path):
+    """Take a lock file for a background build.
+
+    Yields ``False`` without taking the lock if another worker holds it, so
+    the same artifact is never built twice at once. Locks older than
+    ``BUILD_LOCK_TIMEOUT`` are taken over.
+    """
+    lock.parent.mkdir(parents=True, exist_ok=True)
+    token = uuid.uuid4().hex
+    if not (_create_lock(lock, token) or _take_over_lock(lock, token)):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        _release_lock(lock, token)
+
+
+def _create_lock(lock: pathlib.Path, token: str):
+    try:
+        fd = os.open(lock, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+    except FileExistsError:
+        return False
+    with os.fdopen(fd, "w") as fh:
+        fh.write(token)
+    return True
+
+
+def _take_over_lock(lock: pathlib.Path, token: str):
+    """Replace a timed out lock with ours.
+
+    Takeovers of a lock are made one at a time under an flock, and the new
+    lock is renamed over the old one, so the lock never goes missing and only
+    the first worker to find it timed out gets it.
+    """
+    with open(lock.with_name(f"{lock.name}.takeover"), "a") as guard:
+        fcntl.flock(guard, fcntl.LOCK_EX)
+        if _create_lock(lock, token):
+            # released while we waited
+            return True
+        if _is_locked(lock):
+            return False
+        with atomic_write(lock, "w") as fh:
+            fh.write(token)
+    return True
+
+
+def _release_lock(lock: pathlib.Path, token: str):
+    try:
+        # a build that timed out may have had its lock taken over
+        if lock.read_text() == token:
+            lock.unlink()
+    except FileNotFoundError:
+        pass
+
+
+def available_lods(folder: pathlib.Path, manifest):
+    """LOD percentages that can be served now, always including ``FULL_LOD``."""
+    lods = [lod for lod in MODEL_LODS if model_lod_obj(folder, manifest, lod).exists()]
+    return lods + [FULL_LOD]
+
+
+def lods_pending(folder: pathlib.Path, manifest):
+    """True if LODs are missing and no worker is currently generating them."""
+    if len(available_lods(folder, manifest)) > len(MODEL_LODS):
+        return False
+    return not _is_locked(_lod_lock(folder, manifest))
+
+
+def model_lod_files(folder: pathlib.Path, manifest, lod: int):
+    """Files to zip for a LOD, or ``None`` if it has not been generated yet."""
+    if lod == FULL_LOD:
+        return [folder / entry["name"] for entry in manifest["files"]]
+    lod_obj = model_lod_obj(folder, manifest, lod)
+    if not lod_obj.exists():
+        return None
+    companions = [
+        folder / entry["name"]
+        for entry in manifest["files"]
+        if entry["name"] != manifest["obj_filename"]
+    ]
+    return [lod_obj] + companions
+
+
+def model_lod_zip_name(manifest, lod: int):
+    """LOD zips are named after the full zip, e.g. ``context1_lod10.zip``."""
+    if lod == FULL_LOD:
+        return manifest["zip_filename"]
+    return f"{pathlib.Path(manifest['obj_filename']).stem}_lod{lod}.zip"
+
+
+def build_model_lods(folder: pathlib.Path):
+    """Generate the decimated LOD meshes for the folder's model set.
+
+    A lock file keeps concurrent workers from decimating the same model set
+    twice. LODs for older versions of the model set are removed. Returns the
+    paths of the LOD ``.obj`` files that exist afterwards.
+    """
+    manifest = get_model_manifest(folder)
+    if manifest is None:
+        return []
+    with _build_lock(_lod_lock(folder, manifest)) as locked:
+        if locked:
+            _build_model_lods(folder, manifest)
+    lod_objs = [model_lod_obj(folder, manifest, lod) for lod in MODEL_LODS]
+    return [lod_obj for lod_obj in lod_objs if lod_obj.exists()]
+
+
+def _build_model_lods(folder: pathlib.Path, manifest):
+    full = None
+    for lod in MODEL_LODS:
+        lod_obj = model_lod_obj(folder, manifest, lod)
+        if lod_obj.exists():
+            continue
+        if full is None:
+            full = mesh.read_obj(folder / manifest["obj_filename"])
+        simplified = mesh.decimate(full, len(full.faces) * lod // 100)
+        with atomic_write(lod_obj, "w") as fh:
+            mesh.write_obj(simplified, fh, header=f"{lod}% LOD")
+    current = {model_lod_obj(folder, manifest, lod).parent for lod in MODEL_LODS}
+    for old in (model_cache_folder(folder) / LOD_SUBFOLDER).iterdir():
+        if old.is_dir() and old not in current:
+            shutil.rmtree(old, ignore_errors=True)
+
+
+def model_glb_artifact(folder: pathlib.Path, manifest, lod: int = FULL_LOD):
+    """Path of the cached GLB for a LOD of the manifest's model set."""
+    version = _fingerprint(manifest["files"])
+    return model_cache_folder(folder) / GLB_SUBFOLDER / f"{version}-{lod}.glb"
+
+
+def model_glb_name(manifest, lod: int = FULL_LOD):
+    """GLBs are named after the zip, e.g. ``context1.glb`` or ``context1_lod10.glb``."""
+    return str(pathlib.Path(model_lod_zip_name(manifest, lod)).with_suffix(".glb"))
+
+
+def available_formats(folder: pathlib.Path, manifest, lod: int = FULL_LOD):
+    """Download formats that can be served now for a LOD."""
+    formats = ["zip"]
+    if model_glb_artifact(folder, manifest, lod).exists():
+        formats.append("glb")
+    return formats
+
+
+def glb_pending(folder: pathlib.Path, manifest, lod: int = FULL_LOD):
+    """True if the GLB for a generated LOD is missing and nobody is building it."""
+    if model_glb_artifact(folder, manifest, lod).exists():
+        return False
+    if lod not in available_lods(folder, manifest):
+        return False
+    lock = model_glb_artifact(folder, manifest, lod).with_suffix(".lock")
+    return not _is_locked(lock)
+
+
+def model_textures(folder: pathlib.Path, obj_mesh):
+    """Read the textures of the mesh's materials for embedding in a GLB.
+
+    Material files are looked up in the model folder, so this also works for
+    the LOD meshes, which keep the original ``mtllib`` references.
+    """
+    images = {}
+    for mtllib in obj_mesh.mtllibs:
+        mtl_path = folder / mtllib.split(maxsplit=1)[1]
+        if not mtl_path.is_file():
+            continue
+        for material, texture in mesh.read_mtl_textures(mtl_path).items():
+            texture_path = folder / texture
+            mime_type = mesh.IMAGE_MIME_TYPES.get(texture_path.suffix.lower())
+            if mime_type and texture_path.is_file():
+                images[material] = (texture_path.read_bytes(), mime_type)
+    return images
+
+
+def build_model_glb(folder: pathlib.Path, lod: int = FULL_LOD):
+    """Convert a LOD of the folder's model set to GLB in the cache.
+
+    GLBs for older versions of the model set are removed. Returns the path of
+    the GLB, or ``None`` if there is no model or the LOD has not been
+    generated yet.
+    """
+    manifest = get_model_manifest(folder)
+    if manifest is None:
+        return None
+    artifact = model_glb_artifact(folder, manifest, lod)
+    if lod == FULL_LOD:
+        source = folder / manifest["obj_filename"]
+    else:
+        source = model_lod_obj(folder, manifest, lod)
+    if artifact.exists() or not source.exists():
+        return artifact if artifact.exists() else None
+
+    with _build_lock(artifact.with_suffix(".lock")) as locked:
+        if not locked:
+            return None
+        obj_mesh = mesh.read_obj(source)
+        with atomic_write(artifact) as fh:
+            mesh.write_glb(obj_mesh, fh, model_textures(folder, obj_mesh))
+    version = artifact.name.split("-")[0]
+    for old in artifact.parent.glob("*.glb"):
+        if not old.name.startswith(f"{version}-"):
+            old.unlink(missing_ok=True)
+    return artifact
+
+
+def _watched_folder(context_folder: pathlib.Path):
+    """The deepest existing folder on the way to a context's model folder.
+
+    Creating the next folder down, or adding files to the model folder,
+    changes its mtime, so it is enough to watch this one folder to notice a
+    model appearing in a context that had none.
+    """
+    folder = context_folder / MODEL_SUBFOLDER
+    while folder != context_folder and not folder.is_dir():
+        folder = folder.parent
+    return folder
+
+
+def _area_index_entry(context_folder: pathlib.Path, build=True):
+    """Index a context, or return ``None`` if its manifest isn't built and ``build`` is False."""
+    model_folder = context_folder / MODEL_SUBFOLDER
+    if build:
+        manifest = get_model_manifest(model_folder)
+    else:
+        manifest = load_model_manifest(model_folder)
+        if manifest is None and list_obj_files(model_folder):
+            return None
+    watched = _watched_folder(context_folder)
+    return {
+        "manifest": manifest,
+        "watched": watched.relative_to(context_folder).as_posix(),
+        "watched_mtime_ns": watched.stat().st_mtime_ns,
+    }
+
+
+def _area_index_entry_is_current(context_folder: pathlib.Path, entry):
+    if entry["manifest"] is not None:
+        return manifest_is_current(context_folder / MODEL_SUBFOLDER, entry["manifest"])
+    try:
+        watched = context_folder / entry["watched"]
+        return watched.stat().st_mtime_ns == entry["watched_mtime_ns"]
+    except OSError:
+        return False
+
+
+def get_area_model_index(folder: pathlib.Path):
+    """Return the manifests of every context in an area, keyed by context number.
+
+    The index is cached next to the manifests and checked with ``stat`` calls
+    only: the area folder's mtime for added or removed contexts, then each
+    context's manifest, or the folder a model would appear in for contexts
+    without one. Only the contexts that changed are rescanned. Contexts
+    without a model map to ``None``.
+    """
+    index, _ = _area_model_index(folder, build=True)
+    return index
+
+
+def read_area_model_index(folder: pathlib.Path):
+    """Like :func:`get_area_model_index`, without reading any model.
+
+    Requests use this: a context whose manifest has not been built is left out
+    and reported as pending, for ``index_area_models`` to build in a worker.
+
+    Returns:
+        tuple: the index, and a list of the pending context numbers
+    """
+    return _area_model_index(folder, build=False)
+
+
+def _area_model_index(folder: pathlib.Path, build):
+    index_path = model_cache_folder(folder) / AREA_INDEX_FILENAME
+    try:
+        index = json.loads(index_path.read_text())
+        if index.get("version") != AREA_INDEX_VERSION:
+            index = None
+    except (OSError, ValueError):
+        index = None
+
+    try:
+        folder_mtime_ns = folder.stat().st_mtime_ns
+    except FileNotFoundError:
+        return {}, []
+    contexts = index["contexts"] if index else {}
+    if index is None or index["folder_mtime_ns"] != folder_mtime_ns:
+        numbers = [f.name for f in folder.iterdir() if f.is_dir() and f.name.isdigit()]
+        contexts = {number: contexts.get(number) for number in numbers}
+
+    changed = index is None or index["folder_mtime_ns"] != folder_mtime_ns
+    pending = []
+    for number, entry in contexts.items():
+        context_folder = folder / number
+        if entry is None or not _area_index_entry_is_current(context_folder, entry):
+            # pending contexts are kept as None so the next read tries them again
+            contexts[number] = _area_index_entry(context_folder, build)
+            changed = changed or contexts[number] != entry
+            if contexts[number] is None:
+                pending.append(int(number))
+    if changed:
+        index = {
+            "version": AREA_INDEX_VERSION,
+            "folder_mtime_ns": folder_mtime_ns,
+            "contexts": contexts,
+        }
+        with atomic_write(index_path, "w") as fh:
+            json.dump(index, fh)
+
+    return (
+        {
+            int(number): entry["manifest"]
+            for number, entry in sorted(contexts.items(), key=lambda item: int(item[0]))
+            if entry is not None
+        },
+        sorted(pending),
+    )
+
+
+def _site_origins():
+    now = time.monotonic()
+    if now >= _site_origin_cache["expires"]:
+        with _site_origin_lock:
+            if now >= _site_origin_cache["expires"]:
+                origins = {
+                    (
+                        o.utm_hemisphere,
+                        o.utm_zone,
+                        o.area_utm_easting_meters,
+                        o.area_utm_northing_meters,
+                    ): o.origin
+                    for o in SiteOrigin.objects.all()
+                }
+                _site_origin_cache.update(
+                    origins=origins,
+                    expires=now + settings.SITE_ORIGIN_CACHE_TTL,
+                )
+    return _site_origin_cache["origins"]
+
+
+def clear_site_origin_cache():
+    """Reload the site origins on the next lookup in this process."""
+    _site_origin_cache["expires"] = 0.0
+
+
+def get_site_origin(
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+):
+    """Return the origin for a site, or ``"NA"`` if it has none yet.
+
+    Origins come from a per-process cache of the SiteOrigin table, so lookups
+    don't hit the database. Changes made in other processes show up within
+    ``SITE_ORIGIN_CACHE_TTL`` seconds.
+    """
+    key = (
+        utm_hemisphere,
+        int(utm_zone),
+        int(area_utm_easting_meters),
+        int(area_utm_northing_meters),
+    )
+    return _site_origins().get(key, "NA")
+
+
+def area_model_bounds(folder: pathlib.Path):
+    """Union bounding box ``(mins, maxs)`` of every model in an area, or ``None``."""
+    bounds = [
+        manifest["bounds"]
+        for manifest in get_area_model_index(folder).values()
+        if manifest is not None and manifest["bounds"] is not None
+    ]
+    if not bounds:
+        return None
+    mins = np.min([b[0] for b in bounds], axis=0)
+    maxs = np.max([b[1] for b in bounds], axis=0)
+    return mins.tolist(), maxs.tolist()
+
+
+def compute_site_origin(
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+):
+    """Store the center of the union bounding box of a site's models as its origin.
+
+    Origins entered by hand are left alone. Returns the site's origin, or
+    ``None`` if it has none and no models to compute one from.
+    """
+    site = {
+        "utm_hemisphere": utm_hemisphere,
+        "utm_zone": utm_zone,
+        "area_utm_easting_meters": area_utm_easting_meters,
+        "area_utm_northing_meters": area_utm_northing_meters,
+    }
+    manual = SiteOrigin.objects.filter(source=SiteOrigin.MANUAL, **site).first()
+    if manual is not None:
+        return manual.origin
+    folder = area_folder(
+        utm_hemisphere,
+        utm_zone,
+        area_utm_easting_meters,
+        area_utm_northing_meters,
+    )
+    bounds = area_model_bounds(folder)
+    if bounds is None:
+        return None
+    x, y, z = _bbox_center(bounds, 4)
+    site_origin, _ = SiteOrigin.objects.update_or_create(
+        defaults={
+            "origin_x": x,
+            "origin_y": y,
+            "origin_z": z,
+            "source": SiteOrigin.COMPUTED,
+        },
+        **site,
+    )
+    return site_origin.origin
@@ -1,13 +1,19 @@
 import datetime
+import hashlib
+import json
 import pathlib
+import threading
+import time
 import uuid
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, models, router, transaction
 from django.urls import reverse
 
-from main.utils import PHOTO_EXTENSIONS, get_next_photo_number
+import main.previews as previews
+from main.utils import largest_photo_number
 
 User = get_user_model()
 
@@ -16,6 +22,183 @@ def utc_now():
     return datetime.datetime.now(tz=datetime.timezone.utc)
 
 
+# Fields that identify an area, and a context within it, across the tables of
+# both databases, which are not linked by foreign keys.
+AREA_KEY_FIELDS = (
+    "utm_hemisphere",
+    "utm_zone",
+    "area_utm_easting_meters",
+    "area_utm_northing_meters",
+)
+CONTEXT_KEY_FIELDS = AREA_KEY_FIELDS + ("context_number",)
+
+
+def composite_key(obj, key_fields):
+    return tuple(getattr(obj, field) for field in key_fields)
+
+
+def composite_key_dict(obj, key_fields):
+    return {field: getattr(obj, field) for field in key_fields}
+
+
+def attach_related(instances, attr, queryset, key_fields):
+    """Load the related rows for many instances in one query.
+
+    Rows of ``queryset`` are matched to instances on ``key_fields`` and stored
+    as the instance's ``attr`` in the prefetch cache, which the composite-key
+    properties (e.g. ``SpatialArea.spatialcontext_set``) return instead of
+    running their own query. The related model may live in another database.
+
+    Args:
+        instances (list): model instances to attach the rows to
+        attr (str): name of the property the rows are attached as
+        queryset (QuerySet): the related rows, in the order they should be listed
+        key_fields (tuple): field names shared by both models, e.g. AREA_KEY_FIELDS
+
+    Returns:
+        list: the instances
+    """
+    instances = list(instances)
+    groups = {composite_key(instance, key_fields): [] for instance in instances}
+    if groups:
+        # filter on each field separately and drop the extra combinations below;
+        # the key combinations can't be expressed as one IN clause
+        filters = {
+            f"{field}__in": sorted({key[i] for key in groups})
+            for i, field in enumerate(key_fields)
+        }
+        for obj in queryset.all().filter(**filters):
+            group = groups.get(composite_key(obj, key_fields))
+            if group is not None:
+                group.append(obj)
+    for instance in instances:
+        cache = instance.__dict__.setdefault("_prefetched_objects_cache", {})
+        cache[attr] = groups[composite_key(instance, key_fields)]
+    return instances
+
+
+def get_prefetched(instance, attr):
+    """Return the rows attached by :func:`attach_related`, or ``None``."""
+    return getattr(instance, "_prefetched_objects_cache", {}).get(attr)
+
+
+def _stamp(name):
+    """The mtime of a stamp file in MEDIA_ROOT, or ``None`` if there isn't one.
+
+    Stamp files tell every process sharing MEDIA_ROOT (gunicorn workers and
+    Celery) that one of their per-process caches is stale. Checking one is a
+    ``stat`` rather than a query.
+    """
+    try:
+        return (pathlib.Path(settings.MEDIA_ROOT) / f".{name}").stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _touch_stamp(name):
+    path = pathlib.Path(settings.MEDIA_ROOT) / f".{name}"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(uuid.uuid4().hex)
+
+
+# Areas and contexts this process has seen in the database, so saving a find
+# doesn't have to check that its area and context exist every time.
+_known_parents = {"keys": set(), "stamp": None, "expires": 0.0}
+_known_parents_lock = threading.Lock()
+
+
+def known_parents():
+    """The set of area and context keys known to exist.
+
+    The set is emptied when :func:`forget_known_parents` is called in any
+    process, and at least every ``KNOWN_PARENTS_CACHE_TTL`` seconds, to pick
+    up rows deleted outside the app.
+    """
+    now = time.monotonic()
+    stamp = _stamp("known_parents")
+    if now >= _known_parents["expires"] or stamp != _known_parents["stamp"]:
+        with _known_parents_lock:
+            if now >= _known_parents["expires"] or stamp != _known_parents["stamp"]:
+                _known_parents.update(
+                    keys=set(),
+                    stamp=stamp,
+                    expires=now + settings.KNOWN_PARENTS_CACHE_TTL,
+                )
+    return _known_parents["keys"]
+
+
+def forget_known_parents():
+    """Empty the known area and context keys in every process.
+
+    Called when an area or context is deleted or changes its key.
+    """
+    _touch_stamp("known_parents")
+    _known_parents["expires"] = 0.0
+
+
+# The hemisphere -> zone -> easting -> northing tree of areas browsed by the
+# select views, built once per process and rebuilt when areas change.
+_area_hierarchy = {"tree": None, "version": None, "stamp": None, "expires": 0.0}
+_area_hierarchy_lock = threading.Lock()
+
+
+def area_hierarchy():
+    """Return the tree of areas and its version.
+
+    The tree is nested dicts, ``{hemisphere: {zone: {easting: [northings]}}}``,
+    sorted at every level, and must not be modified. It is built with one
+    query, and rebuilt after :func:`forget_area_hierarchy` is called in any
+    process or ``AREA_HIERARCHY_CACHE_TTL`` seconds have passed. The version
+    is a hash of the tree, for use as an ETag.
+
+    Returns:
+        tuple: (tree, version)
+    """
+    now = time.monotonic()
+    stamp = _stamp("area_hierarchy")
+    if now >= _area_hierarchy["expires"] or stamp != _area_hierarchy["stamp"]:
+        with _area_hierarchy_lock:
+            if now >= _area_hierarchy["expires"] or stamp != _area_hierarchy["stamp"]:
+                tree = {}
+                keys = SpatialArea.objects.order_by(*AREA_KEY_FIELDS).values_list(
+                    *AREA_KEY_FIELDS
+                )
+                for h, z, e, n in keys.distinct():
+                    tree.setdefault(h, {}).setdefault(z, {}).setdefault(e, []).append(n)
+                version = hashlib.sha1(
+                    json.dumps(tree, sort_keys=True).encode()
+                ).hexdigest()
+                _area_hierarchy.update(
+                    tree=tree,
+                    version=version,
+                    stamp=stamp,
+                    expires=now + settings.AREA_HIERARCHY_CACHE_TTL,
+                )
+    return _area_hierarchy["tree"], _area_hierarchy["version"]
+
+
+def forget_area_hierarchy():
+    """Rebuild the area tree in every process on its next use."""
+    _touch_stamp("area_hierarchy")
+    _area_hierarchy["expires"] = 0.0
+
+
+def ensure_exists(model, key):
+    """``get_or_create`` an area or context, unless it is already known to exist.
+
+    Args:
+        model (Model): SpatialArea or SpatialContext
+        key (dict): the area fields, plus context_number for contexts
+    """
+    known = known_parents()
+    cache_key = (model._meta.db_table,) + tuple(str(value) for value in key.values())
+    if cache_key in known:
+        return
+    model.objects.get_or_create(**key)
+    # don't remember a row that a rollback could still remove
+    transaction.on_commit(lambda: known.add(cache_key), using=router.db_for_write(model))
+
+
 def build_findphoto_path(find_obj):
     """Build the path to the subfolder where photos associated with a find are stored
 
@@ -42,6 +225,79 @@ def build_findphoto_path(find_obj):
     return f"{sub_root}/finds/individual/{find_obj.find_number}/photos"
 
 
+class NumberCounterManager(models.Manager):
+    def allocate(self, model, number_field, key, count=1):
+        """Reserve ``count`` consecutive numbers for a context or find.
+
+        The counter row for ``key`` is incremented with a single UPDATE, which
+        holds the row lock only for its own short transaction, so concurrent
+        requests always get different numbers. The first allocation for a key
+        starts the counter from the highest number already used.
+
+        Args:
+            model (Model): SpatialContext or ObjectFind
+            number_field (str): "context_number" or "find_number"
+            key (dict): the area fields, plus context_number for finds
+            count (int): how many numbers to reserve
+
+        Returns:
+            range: the reserved numbers
+        """
+        counter_key = {"kind": model._meta.db_table, "context_number": 0, **key}
+        db = router.db_for_write(NumberCounter)
+        with transaction.atomic(using=db):
+            counters = self.using(db).filter(**counter_key)
+            if not counters.update(last_number=models.F("last_number") + count):
+                used = model.objects.filter(**key).aggregate(models.Max(number_field))
+                try:
+                    with transaction.atomic(using=db):
+                        self.using(db).create(
+                            last_number=(used[f"{number_field}__max"] or 0) + count,
+                            **counter_key,
+                        )
+                except IntegrityError:
+                    # another request created the counter first
+                    counters.update(last_number=models.F("last_number") + count)
+            last = counters.values_list("last_number", flat=True).get()
+        return range(last - count + 1, last + 1)
+
+    def observe(self, model, key, number):
+        """Move the counter past a number that was assigned by the client."""
+        counter_key = {"kind": model._meta.db_table, "context_number": 0, **key}
+        self.filter(last_number__lt=number, **counter_key).update(last_number=number)
+
+
+class NumberCounter(models.Model):
+    """The last context number used in an area, or find number in a context."""
+
+    kind = models.CharField("Kind", max_length=16)
+    utm_hemisphere = models.CharField(
+        "UTM Hemisphere", max_length=1, choices=[("N", "North"), ("S", "South")]
+    )
+    utm_zone = models.IntegerField("UTM Zone")
+    area_utm_easting_meters = models.IntegerField("Easting (meters)")
+    area_utm_northing_meters = models.IntegerField("Northing (meters)")
+    # 0 for context counters, which are per area
+    context_number = models.IntegerField("Context Number", default=0)
+    last_number = models.IntegerField("Last Number")
+
+    objects = NumberCounterManager()
+
+    class Meta:
+        db_table = "number_counters"
+        managed = False
+        unique_together = [
+            (
+                "kind",
+                "utm_hemisphere",
+                "utm_zone",
+                "area_utm_easting_meters",
+                "area_utm_northing_meters",
+                "context_number",
+            )
+        ]
+
+
 class SpatialArea(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     utm_hemisphere = models.CharField(
@@ -83,6 +339,9 @@ class SpatialArea(models.Model):
 
     @property
     def spatialcontext_set(self):
+        prefetched = get_prefetched(self, "spatialcontext_set")
+        if prefetched is not None:
+            return prefetched
         return SpatialContext.objects.filter(
             utm_hemisphere=self.utm_hemisphere,
             utm_zone=self.utm_zone,
@@ -178,15 +437,14 @@ class SpatialContext(models.Model):
         )
 
     def save(self, *args, **kwargs):
-        # increment to next context_number
+        area_key = composite_key_dict(self, AREA_KEY_FIELDS)
         if not self.context_number:
-            nc = self.__class__.objects.filter(
-                utm_hemisphere=self.utm_hemisphere,
-                utm_zone=self.utm_zone,
-                area_utm_easting_meters=self.area_utm_easting_meters,
-                area_utm_northing_meters=self.area_utm_northing_meters,
-            ).aggregate(models.Max("context_number"))["context_number__max"]
-            self.context_number = nc + 1 if nc else 1
+            # allocate the next context_number
+            self.context_number = NumberCounter.objects.allocate(
+                SpatialContext, "context_number", area_key
+            )[0]
+        elif self._state.adding:
+            NumberCounter.objects.observe(SpatialContext, area_key, self.context_number)
         super().save(*args, **kwargs)
 
     def hzenc_list(self):
@@ -218,6 +476,9 @@ class SpatialContext(models.Model):
 
     @property
     def contextphoto_set(self):
+        prefetched = get_prefetched(self, "contextphoto_set")
+        if prefetched is not None:
+            return prefetched
         return ContextPhoto.objects.filter(
             utm_hemisphere=self.utm_hemisphere,
             utm_zone=self.utm_zone,
@@ -228,6 +489,9 @@ class SpatialContext(models.Model):
 
     @property
     def bagphoto_set(self):
+        prefetched = get_prefetched(self, "bagphoto_set")
+        if prefetched is not None:
+            return prefetched
         return BagPhoto.objects.filter(
             utm_hemisphere=self.utm_hemisphere,
             utm_zone=self.utm_zone,
@@ -252,6 +516,78 @@ class ContextType(models.Model):
         return self.type
 
 
+class ObjectFindManager(models.Manager):
+    def existing_numbers(self, finds):
+        """Return the ``(context key, find_number)`` pairs of the finds that are taken.
+
+        One query checks every numbered find; unnumbered finds are skipped.
+
+        Args:
+            finds (list): unsaved ObjectFind instances
+
+        Returns:
+            set: ``(context key tuple, find_number)`` pairs that already exist
+        """
+        by_context = {}
+        for find in finds:
+            if find.find_number:
+                key = composite_key(find, CONTEXT_KEY_FIELDS)
+                by_context.setdefault(key, set()).add(find.find_number)
+        if not by_context:
+            return set()
+        condition = models.Q()
+        for key, numbers in by_context.items():
+            condition |= models.Q(**dict(zip(CONTEXT_KEY_FIELDS, key)), find_number__in=numbers)
+        return {
+            (tuple(row[:-1]), row[-1])
+            for row in self.filter(condition).values_list(*CONTEXT_KEY_FIELDS, "find_number")
+        }
+
+    def create_many(self, finds):
+        """Insert many new finds at once, doing what ``ObjectFind.save`` does.
+
+        Areas and contexts that don't exist yet are created, and finds without
+        a find_number get one from a single block allocated per context.
+
+        Args:
+            finds (list): unsaved ObjectFind instances
+
+        Returns:
+            list: the finds, with their find numbers
+        """
+        for key in {composite_key(find, AREA_KEY_FIELDS) for find in finds}:
+            ensure_exists(SpatialArea, dict(zip(AREA_KEY_FIELDS, key)))
+        for key in {composite_key(find, CONTEXT_KEY_FIELDS) for find in finds}:
+            ensure_exists(SpatialContext, dict(zip(CONTEXT_KEY_FIELDS, key)))
+        numbered = [find for find in finds if find.find_number]
+        unnumbered = [find for find in finds if not find.find_number]
+        with transaction.atomic(using=router.db_for_write(ObjectFind)):
+            # insert the client's numbers first, so a new counter starts after them
+            self.bulk_create(numbered)
+            by_context = {}
+            for find in numbered:
+                key = composite_key(find, CONTEXT_KEY_FIELDS)
+                by_context[key] = max(by_context.get(key, 0), find.find_number)
+            for key, number in by_context.items():
+                NumberCounter.objects.observe(
+                    ObjectFind, dict(zip(CONTEXT_KEY_FIELDS, key)), number
+                )
+            by_context = {}
+            for find in unnumbered:
+                by_context.setdefault(composite_key(find, CONTEXT_KEY_FIELDS), []).append(find)
+            for key, context_finds in by_context.items():
+                numbers = NumberCounter.objects.allocate(
+                    ObjectFind,
+                    "find_number",
+                    dict(zip(CONTEXT_KEY_FIELDS, key)),
+                    count=len(context_finds),
+                )
+                for find, number in zip(context_finds, numbers):
+                    find.find_number = number
+            self.bulk_create(unnumbered)
+        return finds
+
+
 class ObjectFind(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     utm_hemisphere = models.CharField(
@@ -286,6 +622,8 @@ class ObjectFind(models.Model):
         blank=True,
     )
 
+    objects = ObjectFindManager()
+
     class Meta:
         db_table = "finds"
         managed = False
@@ -302,19 +640,8 @@ class ObjectFind(models.Model):
 
     def save(self, *args, **kwargs):
         # ensure area and context exist
-        _ = SpatialArea.objects.get_or_create(
-            utm_hemisphere=self.utm_hemisphere,
-            utm_zone=self.utm_zone,
-            area_utm_easting_meters=self.area_utm_easting_meters,
-            area_utm_northing_meters=self.area_utm_northing_meters,
-        )
-        _ = SpatialContext.objects.get_or_create(
-            utm_hemisphere=self.utm_hemisphere,
-            utm_zone=self.utm_zone,
-            area_utm_easting_meters=self.area_utm_easting_meters,
-            area_utm_northing_meters=self.area_utm_northing_meters,
-            context_number=self.context_number,
-        )
+        ensure_exists(SpatialArea, composite_key_dict(self, AREA_KEY_FIELDS))
+        ensure_exists(SpatialContext, composite_key_dict(self, CONTEXT_KEY_FIELDS))
 
         # increment to next find number in same context on creation
         if not self.find_number and all(
@@ -326,14 +653,13 @@ class ObjectFind(models.Model):
                 self.context_number,
             ]
         ):
-            nf = self.__class__.objects.filter(
-                utm_hemisphere=self.utm_hemisphere,
-                utm_zone=self.utm_zone,
-                area_utm_easting_meters=self.area_utm_easting_meters,
-                area_utm_northing_meters=self.area_utm_northing_meters,
-                context_number=self.context_number,
-            ).aggregate(models.Max("find_number"))["find_number__max"]
-            self.find_number = nf + 1 if nf else 1
+            self.find_number = NumberCounter.objects.allocate(
+                ObjectFind, "find_number", composite_key_dict(self, CONTEXT_KEY_FIELDS)
+            )[0]
+        elif self._state.adding and self.find_number:
+            NumberCounter.objects.observe(
+                ObjectFind, composite_key_dict(self, CONTEXT_KEY_FIELDS), self.find_number
+            )
         super().save(*args, **kwargs)
 
     def __str__(self):
@@ -403,18 +729,19 @@ class ObjectFind(models.Model):
         return pathlib.Path(settings.MEDIA_ROOT) / self.findphoto_folder
 
     def list_files_photo_folder(self, extension=None):
-        """List all photos associated with this find from the filesystem
+        """List all photos associated with this find
         optionally filtered by extension such as ".jpg".
         Filtering is case-insensitive and must include the leading period.
 
+        Photos are listed from the FindPhoto table, not the folder, which
+        ``manage.py rescan_find_photos`` keeps in step with the files on disk.
+
         Returns:
             list: A list of pathlib.Path objects
         """
-        folder = pathlib.Path(settings.MEDIA_ROOT) / self.findphoto_folder
-        if not folder.exists():
-            return []
+        names = self.findphoto_set().values_list("photo", flat=True)
         files = sorted(
-            list([f for f in folder.iterdir() if not f.is_dir()]),
+            {pathlib.Path(settings.MEDIA_ROOT) / name for name in names},
             key=lambda f: (f.suffix, f.stem),
         )
         if extension:
@@ -423,10 +750,33 @@ class ObjectFind(models.Model):
 
     def list_file_urls_from_photo_folder(self):
         files = self.list_files_photo_folder()
-        folder = self.findphoto_folder
-        urls = [f"{settings.MEDIA_URL}{folder}/{f.name}" for f in files]
+        media_root = pathlib.Path(settings.MEDIA_ROOT)
+        urls = [f"{settings.MEDIA_URL}{f.relative_to(media_root).as_posix()}" for f in files]
         return urls
 
+    def list_photo_previews(self):
+        """The photos of ``list_file_urls_from_photo_folder`` with their previews.
+
+        Returns:
+            list: a dict for each photo with its ``photo_url``, the smallest JPEG
+            preview as ``thumbnail_url`` and every preview as ``previews``, which
+            are empty until the previews are made
+        """
+        sizes = dict(self.findphoto_set().values_list("photo", "preview_sizes"))
+        photos = []
+        for name in sorted(
+            sizes, key=lambda name: (pathlib.PurePath(name).suffix, pathlib.PurePath(name).stem)
+        ):
+            urls = previews.preview_urls(name, sizes[name])
+            photos.append(
+                {
+                    "photo_url": f"{settings.MEDIA_URL}{name}",
+                    "thumbnail_url": urls[min(urls, key=int)]["jpg"] if urls else "",
+                    "previews": urls,
+                }
+            )
+        return photos
+
 
 class MaterialCategory(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -443,18 +793,77 @@ class MaterialCategory(models.Model):
         return f"{self.material} - {self.category}"
 
 
+class PhotoNumberManager(models.Manager):
+    def next_filename(self, subfolder, extension, per_extension=False):
+        """Allocate the next numbered filename, e.g. "12.jpg", in a photo folder.
+
+        Context and bag photos are numbered across all extensions in their
+        folder, find photos separately for each extension (``per_extension``).
+        The number comes from the folder's counter row, which is locked until
+        the upload's transaction ends, so concurrent uploads never get the same
+        name. The folder is only read the first time it is used.
+
+        Args:
+            subfolder (str): the folder under MEDIA_ROOT
+            extension (str): the extension of the new file, without the dot
+            per_extension (bool): keep a separate sequence for this extension
+
+        Returns:
+            str: the filename
+        """
+        folder = pathlib.Path(settings.MEDIA_ROOT) / subfolder
+        counter_key = {"folder": subfolder, "extension": extension if per_extension else ""}
+        db = router.db_for_write(PhotoNumber)
+        while True:
+            with transaction.atomic(using=db):
+                counters = self.using(db).filter(**counter_key)
+                if not counters.update(last_number=models.F("last_number") + 1):
+                    largest = largest_photo_number(folder, counter_key["extension"])
+                    try:
+                        with transaction.atomic(using=db):
+                            self.using(db).create(last_number=largest + 1, **counter_key)
+                    except IntegrityError:
+                        # another upload created the counter first
+                        counters.update(last_number=models.F("last_number") + 1)
+                number = counters.values_list("last_number", flat=True).get()
+            filename = f"{number}.{extension}"
+            # the file is already there if an upload that used this number
+            # was rolled back after writing it, or the counter is behind
+            if not (folder / filename).exists():
+                return filename
+
+
+class PhotoNumber(models.Model):
+    """The last photo number used in a photo folder under MEDIA_ROOT.
+
+    Rebuilt from the files on disk by ``manage.py reconcile_photo_numbers``.
+    """
+
+    folder = models.CharField("Folder", max_length=255)
+    # blank when the folder has one sequence for all extensions
+    extension = models.CharField("Extension", max_length=8, blank=True, default="")
+    last_number = models.IntegerField("Last Number")
+
+    objects = PhotoNumberManager()
+
+    class Meta:
+        db_table = "photo_numbers"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["folder", "extension"], name="unique_photo_number"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.folder} {self.extension}: {self.last_number}"
+
+
 def get_photo_filename(subfolder, extension):
     """
     Name photos by sequential numbers according to extension
     e.g. 1.jpg, 2.jpg, 3.jpg, etc.
     """
-    full_path = pathlib.Path(settings.MEDIA_ROOT) / subfolder
-    photos = full_path.glob(f"*.{extension}")
-    existing = [int(p.stem) for p in photos if p.stem.isnumeric()]
-    if existing:
-        return f"{max(existing) + 1}.{extension}"
-    else:
-        return f"1.{extension}"
+    return PhotoNumber.objects.next_filename(subfolder, extension, per_extension=True)
 
 
 def get_context_folder(instance, filename):
@@ -466,9 +875,9 @@ def get_context_folder(instance, filename):
     extension = filename.rsplit(".", maxsplit=1)[-1]
     folder_path = pathlib.Path(settings.MEDIA_ROOT) / subfolder
     folder_path.mkdir(parents=True, exist_ok=True)
-    new_filename = get_next_photo_number(folder_path)
+    new_filename = PhotoNumber.objects.next_filename(subfolder, extension)
 
-    return f"{subfolder}/{new_filename}.{extension}"
+    return f"{subfolder}/{new_filename}"
 
 
 def get_context_folder_tn(instance, filename):
@@ -618,11 +1027,26 @@ class FindPhoto(models.Model):
     photo = models.FileField(upload_to=get_findphoto_folder)
     user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
     created = models.DateTimeField("Created", default=utc_now)
+    # sizes of the previews made by main.tasks.fp_previews; see main/previews.py
+    preview_sizes = models.JSONField("Preview sizes", default=list, blank=True)
 
     class Meta:
         db_table = "find_photos"
         verbose_name = "Find Photo"
         verbose_name_plural = "Find Photos"
+        indexes = [
+            models.Index(
+                fields=[
+                    "utm_hemisphere",
+                    "utm_zone",
+                    "area_utm_easting_meters",
+                    "area_utm_northing_meters",
+                    "context_number",
+                    "find_number",
+                ],
+                name="find_photos_find_idx",
+            )
+        ]
 
     def __str__(self):
         return self.photo.name
@@ -647,6 +1071,44 @@ class FindPhoto(models.Model):
         )
 
 
+class PhotoUpload(models.Model):
+    """A context, bag or find photo being uploaded in numbered chunks.
+
+    ``received`` counts the bytes written so far, always whole chunks from the
+    start, so an upload that drops can carry on from there. ``result`` keeps
+    the response of finishing it, for clients that retry. See main/uploads.py.
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
+    kind = models.CharField(
+        "Kind",
+        max_length=7,
+        choices=(("context", "Context Photo"), ("bag", "Bag Photo"), ("find", "Find Photo")),
+    )
+    target_id = models.UUIDField("Context or Find ID")
+    source = models.CharField(
+        "Location where taken",
+        max_length=1,
+        choices=(("F", "In Field"), ("D", "Drying")),
+        default="F",
+    )
+    filename = models.CharField("Filename", max_length=255)
+    size = models.BigIntegerField("Size (bytes)")
+    chunk_size = models.IntegerField("Chunk size (bytes)")
+    received = models.BigIntegerField("Received (bytes)", default=0)
+    created = models.DateTimeField("Created", default=utc_now)
+    result = models.JSONField("Result", null=True, blank=True, encoder=DjangoJSONEncoder)
+
+    class Meta:
+        db_table = "photo_uploads"
+        verbose_name = "Photo Upload"
+        verbose_name_plural = "Photo Uploads"
+
+    def __str__(self):
+        return f"{self.filename} {self.received}/{self.size}"
+
+
 class ActionLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     user = models.ForeignKey(User, null=True, on_delete=models.SET_NULL)
@@ -720,3 +1182,62 @@ class SurveyPoint(models.Model):
 
     class Meta:
         ordering = ["survey_path", "timestamp"]
+
+
+class SiteOrigin(models.Model):
+    """The point a site's 3D models are organized around.
+
+    Origins are entered by hand, or computed from the union bounding box of
+    the site's models by ``main.tasks.compute_site_origin``. A computed origin
+    never replaces one entered by hand.
+    """
+
+    MANUAL = "M"
+    COMPUTED = "C"
+
+    utm_hemisphere = models.CharField(
+        "UTM Hemisphere", max_length=1, choices=[("N", "North"), ("S", "South")]
+    )
+    utm_zone = models.IntegerField("UTM Zone")
+    area_utm_easting_meters = models.IntegerField("Easting (meters)")
+    area_utm_northing_meters = models.IntegerField("Northing (meters)")
+    origin_x = models.FloatField("Origin X")
+    origin_y = models.FloatField("Origin Y")
+    origin_z = models.FloatField("Origin Z")
+    source = models.CharField(
+        "Source",
+        max_length=1,
+        choices=[(MANUAL, "Manual"), (COMPUTED, "Computed from models")],
+        default=MANUAL,
+    )
+    updated = models.DateTimeField("Updated", auto_now=True)
+
+    class Meta:
+        db_table = "site_origins"
+        ordering = [
+            "utm_hemisphere",
+            "utm_zone",
+            "area_utm_easting_meters",
+            "area_utm_northing_meters",
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=[
+                    "utm_hemisphere",
+                    "utm_zone",
+                    "area_utm_easting_meters",
+                    "area_utm_northing_meters",
+                ],
+                name="unique_site_origin",
+            )
+        ]
+
+    @property
+    def origin(self):
+        return [self.origin_x, self.origin_y, self.origin_z]
+
+    def __str__(self):
+        return (
+            f"{self.utm_hemisphere}-{self.utm_zone}-"
+            f"{self.area_utm_easting_meters}-{self.area_utm_northing_meters}"
+        )
@@ -0,0 +1,137 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Paginate a list in the order of its model's ``Meta.ordering``.
+
+    For areas, contexts and finds that is the composite UTM key: hemisphere,
+    zone, easting, northing, then context and find number, with the primary
+    key breaking ties. A page is selected with a WHERE on the key of the row
+    next to it rather than an OFFSET, and there is no COUNT query, so every
+    page costs the same. ``next`` and ``previous`` are links carrying an
+    opaque ``cursor``.
+    """
+
+    cursor_query_param = "cursor"
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.model = queryset.model
+        self.fields = list(queryset.model._meta.ordering) + ["pk"]
+        position, reverse = self.decode_cursor(request)
+
+        if reverse:
+            queryset = queryset.order_by(*[f"-{field}" for field in self.fields])
+        else:
+            queryset = queryset.order_by(*self.fields)
+        if position is not None:
+            queryset = queryset.filter(self.beyond(position, reverse))
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_position = self.previous_position = None
+        if rows:
+            if has_more or reverse:
+                self.next_position = self.row_key(rows[-1])
+            if (has_more and reverse) or (position is not None and not reverse):
+                self.previous_position = self.row_key(rows[0])
+        return rows
+
+    def beyond(self, position, reverse):
+        """Rows after ``position`` in key order, or before it if ``reverse``."""
+        lookup = "lt" if reverse else "gt"
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            equal = {f: value for f, value in zip(self.fields[:i], position)}
+            condition |= Q(**equal, **{f"{field}__{lookup}": position[i]})
+        return condition
+
+    def row_key(self, row):
+        return [
+            str(row.pk) if field == "pk" else getattr(row, field) for field in self.fields
+        ]
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return api_settings.PAGE_SIZE
+        return min(max(page_size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            position, reverse = cursor["p"], bool(cursor["r"])
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            position = [
+                self.field_value(field, value) for field, value in zip(self.fields, position)
+            ]
+        except ValidationError:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def field_value(self, field, value):
+        """Convert a cursor value to the field's type, raising ValidationError if it isn't one."""
+        if value is None or isinstance(value, (list, dict)):
+            raise ValidationError("Not a key value")
+        model_field = self.model._meta.pk if field == "pk" else self.model._meta.get_field(field)
+        return model_field.to_python(value)
+
+    def encode_cursor(self, position, reverse):
+        cursor = json.dumps({"p": position, "r": int(reverse)}, separators=(",", ":"))
+        encoded = base64.urlsafe_b64encode(cursor.encode("ascii")).decode("ascii")
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if self.next_position is None:
+            return None
+        return self.encode_cursor(self.next_position, reverse=False)
+
+    def get_previous_link(self):
+        if self.previous_position is None:
+            return None
+        return self.encode_cursor(self.previous_position, reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
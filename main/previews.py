@@ -0,0 +1,193 @@
+"""
+Viewable previews of find photos.
+
+Find photos may be RAW (``.cr3``, ``.raw``) or HEIC files that browsers can't
+show, so each one gets a JPEG and a WebP preview for every size in
+``THUMBNAIL_SIZES``. They are written to a ``derived`` folder next to the
+photo, e.g. ``derived/tn400_2.cr3.jpg`` and ``derived/tn400_2.cr3.webp`` for
+``2.cr3``, which keeps them out of the photo listings and numbering. The sizes
+made are recorded in the FindPhoto's ``preview_sizes``, so listing a find's
+previews doesn't touch the disk.
+
+RAW files are not decoded if they have a JPEG preview embedded in them, as
+cameras write one at or near full size. Files without one are decoded with
+``rawpy``, and HEIC files with ``pillow-heif``, when those are installed.
+"""
+
+import io
+import mmap
+import pathlib
+
+from django.conf import settings
+from PIL import Image
+
+import main.thumbnails as thumbnails
+from main.utils import atomic_write
+
+RAW_EXTENSIONS = {".cr3", ".raw"}
+FORMATS = {
+    "jpg": ("JPEG", {"quality": thumbnails.JPEG_QUALITY}),
+    "webp": ("WEBP", {"quality": 80}),
+}
+
+JPEG_START = b"\xff\xd8\xff"
+JPEG_END = b"\xff\xd9"
+START_OF_SCAN = 0xDA
+# start of frame markers, which hold the image size
+START_OF_FRAME = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+class NoDecoder(Exception):
+    pass
+
+
+def preview_names(photo_name, sizes=None):
+    """Storage names of a find photo's previews, as {size: {format: name}}.
+
+    ``sizes`` defaults to the configured ``THUMBNAIL_SIZES``.
+    """
+    path = pathlib.PurePosixPath(photo_name)
+    folder = path.parent / "derived"
+    if sizes is None:
+        sizes = thumbnails.thumbnail_sizes()
+    return {
+        size: {fmt: str(folder / f"tn{size}_{path.name}.{fmt}") for fmt in FORMATS}
+        for size in sorted(sizes)
+    }
+
+
+def _preview_paths(photo_name):
+    media_root = pathlib.Path(settings.MEDIA_ROOT)
+    return [
+        media_root / name
+        for names in preview_names(photo_name).values()
+        for name in names.values()
+    ]
+
+
+def previews_complete(photo):
+    """Whether the FindPhoto has previews in every configured size."""
+    return set(thumbnails.thumbnail_sizes()) <= set(photo.preview_sizes)
+
+
+def delete_previews(photo_name):
+    for path in _preview_paths(photo_name):
+        path.unlink(missing_ok=True)
+
+
+def preview_urls(photo_name, sizes):
+    """URLs of a find photo's previews as {size: {format: url}}.
+
+    Args:
+        photo_name (str): the FindPhoto's photo name
+        sizes (list): the sizes made, from its ``preview_sizes``; ``{}`` is
+            returned until they are made
+    """
+    return {
+        str(size): {fmt: f"{settings.MEDIA_URL}{name}" for fmt, name in names.items()}
+        for size, names in preview_names(photo_name, sizes).items()
+    }
+
+
+def _jpeg_at(data, start):
+    """The end and pixel count of a JPEG starting at ``start``, or None if there isn't one.
+
+    Only the headers are read: the image data runs from the start of scan to
+    the end of image marker, which can't occur inside it.
+    """
+    pos = start + 2
+    pixels = 0
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # fill byte
+            pos += 1
+            continue
+        length = int.from_bytes(data[pos + 2 : pos + 4], "big")
+        if length < 2:
+            return None
+        if marker in START_OF_FRAME and pos + 9 <= len(data):
+            height = int.from_bytes(data[pos + 5 : pos + 7], "big")
+            width = int.from_bytes(data[pos + 7 : pos + 9], "big")
+            pixels = width * height
+        if marker == START_OF_SCAN:
+            end = data.find(JPEG_END, pos + 2 + length)
+            if end < 0 or not pixels:
+                return None
+            return end + len(JPEG_END), pixels
+        pos += 2 + length
+    return None
+
+
+def embedded_jpeg(data):
+    """The largest JPEG embedded in a RAW file's bytes, or None.
+
+    Args:
+        data (bytes or mmap.mmap): the whole file
+
+    Returns:
+        bytes: the JPEG
+    """
+    largest = None
+    pos = data.find(JPEG_START)
+    while pos >= 0:
+        found = _jpeg_at(data, pos)
+        if found:
+            end, pixels = found
+            if largest is None or pixels > largest[2]:
+                largest = (pos, end, pixels)
+            pos = data.find(JPEG_START, end)
+        else:
+            pos = data.find(JPEG_START, pos + 1)
+    if largest is None:
+        return None
+    return bytes(data[largest[0] : largest[1]])
+
+
+def open_photo(path):
+    """Open a find photo as an image that downscales cheaply where possible.
+
+    Raises:
+        NoDecoder: the photo has no embedded preview and its decoder isn't installed
+    """
+    suffix = path.suffix.lower()
+    if suffix in RAW_EXTENSIONS:
+        with open(path, "rb") as fh, mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            preview = embedded_jpeg(data)
+        if preview:
+            return Image.open(io.BytesIO(preview))
+        try:
+            import rawpy
+        except ImportError:
+            raise NoDecoder(f"{path.name} has no embedded preview and rawpy isn't installed")
+        with rawpy.imread(str(path)) as raw:
+            return Image.fromarray(raw.postprocess(use_camera_wb=True, half_size=True))
+    if suffix == ".heic":
+        try:
+            from pillow_heif import register_heif_opener
+        except ImportError:
+            raise NoDecoder(f"{path.name} can't be opened as pillow-heif isn't installed")
+        register_heif_opener()
+    return Image.open(path)
+
+
+def create_previews(photo_name):
+    """Make every preview of a find photo from a single decode.
+
+    Args:
+        photo_name (str): the FindPhoto's photo name, relative to MEDIA_ROOT
+
+    Returns:
+        dict: the names written, as {size: {format: name}}
+    """
+    media_root = pathlib.Path(settings.MEDIA_ROOT)
+    names = preview_names(photo_name)
+    with open_photo(media_root / photo_name) as img:
+        for size, preview in thumbnails.downscale(img, list(names)):
+            for fmt, name in names[size].items():
+                image_format, options = FORMATS[fmt]
+                with atomic_write(media_root / name) as fh:
+                    preview.save(fh, format=image_format, **options)
+    return names
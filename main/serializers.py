@@ -1,9 +1,13 @@
 import datetime
+import pathlib
 
 from dateutil.tz import gettz
 from django.contrib.auth import get_user_model
+from django.db import models
 from rest_framework import serializers
 from main.models import (
+    AREA_KEY_FIELDS,
+    CONTEXT_KEY_FIELDS,
     FindPhoto,
     SpatialArea,
     SpatialContext,
@@ -13,13 +17,34 @@ from main.models import (
     ContextPhoto,
     BagPhoto,
     MaterialCategory,
+    PhotoUpload,
     SurveyPath,
     SurveyPoint,
+    attach_related,
 )
+import main.thumbnails as thumbnails
+import main.uploads as uploads
+from main.utils import PHOTO_EXTENSIONS
 
 User = get_user_model()
 
 
+class CompositeKeyPrefetchListSerializer(serializers.ListSerializer):
+    """
+    Attach the related rows of all the listed instances with one query per
+    relation before serializing them, instead of one query per instance.
+    The child serializer lists the relations in ``composite_prefetch`` as
+    (attribute, queryset, key fields) tuples.
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.manager.BaseManager) else data
+        instances = list(iterable)
+        for attr, queryset, key_fields in self.child.composite_prefetch:
+            attach_related(instances, attr, queryset, key_fields)
+        return super().to_representation(instances)
+
+
 class ContextListingField(serializers.RelatedField):
     """
     List only context numbers. Used to retrieve menu options once
@@ -33,8 +58,13 @@ class ContextListingField(serializers.RelatedField):
 class SpatialAreaSerializer(serializers.ModelSerializer):
     spatialcontext_set = ContextListingField(many=True, read_only=True)
 
+    composite_prefetch = [
+        ("spatialcontext_set", SpatialContext.objects.all(), AREA_KEY_FIELDS),
+    ]
+
     class Meta:
         model = SpatialArea
+        list_serializer_class = CompositeKeyPrefetchListSerializer
         fields = [
             "id",
             "utm_hemisphere",
@@ -65,6 +95,9 @@ class ContextPhotoField(serializers.RelatedField):
     def to_representation(self, value):
         return {
             "thumbnail_url": value.thumbnail.url if value.thumbnail else "",
+            "thumbnail_urls": {
+                str(size): url for size, url in thumbnails.thumbnail_urls(value).items()
+            },
             "photo_url": value.photo.url if value.photo else "",
         }
 
@@ -73,8 +106,15 @@ class SpatialContextSerializer(serializers.ModelSerializer):
     contextphoto_set = ContextPhotoField(many=True, read_only=True)
     bagphoto_set = ContextPhotoField(many=True, read_only=True)
 
+    # the photos are in the default database, so prefetch_related can't join them
+    composite_prefetch = [
+        ("contextphoto_set", ContextPhoto.objects.all(), CONTEXT_KEY_FIELDS),
+        ("bagphoto_set", BagPhoto.objects.order_by("source"), CONTEXT_KEY_FIELDS),
+    ]
+
     class Meta:
         model = SpatialContext
+        list_serializer_class = CompositeKeyPrefetchListSerializer
         fields = [
             "id",
             "utm_hemisphere",
@@ -241,6 +281,44 @@ class FindPhotoSerializer(serializers.ModelSerializer):
         ]
 
 
+class PhotoUploadSerializer(serializers.ModelSerializer):
+    next_chunk = serializers.SerializerMethodField()
+
+    class Meta:
+        model = PhotoUpload
+        fields = [
+            "id",
+            "kind",
+            "target_id",
+            "source",
+            "filename",
+            "size",
+            "chunk_size",
+            "received",
+            "next_chunk",
+        ]
+        read_only_fields = ["id", "chunk_size", "received"]
+
+    def get_next_chunk(self, obj):
+        return uploads.next_chunk(obj)
+
+    def validate_filename(self, value):
+        if pathlib.PurePath(value).suffix.lower() not in PHOTO_EXTENSIONS:
+            raise serializers.ValidationError("Not a photo file")
+        return value
+
+    def validate_size(self, value):
+        if value < 1:
+            raise serializers.ValidationError("Must be at least 1 byte")
+        return value
+
+    def validate(self, data):
+        model = ObjectFind if data["kind"] == "find" else SpatialContext
+        if not model.objects.filter(id=data["target_id"]).exists():
+            raise serializers.ValidationError({"target_id": f"{model._meta.verbose_name} not found"})
+        return data
+
+
 class MCSerializer(serializers.ModelSerializer):
     class Meta:
         model = MaterialCategory
@@ -1,29 +1,84 @@
-from pathlib import Path
+import functools
 
-from django.db.models.signals import post_save
+from django.db import router, transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
-from main.models import ContextPhoto, BagPhoto
-from main.tasks import cp_thumbnail, bp_thumbnail
+import main.model3d as model3d
+import main.previews as previews
+import main.thumbnails as thumbnails
+from main.models import (
+    ContextPhoto,
+    BagPhoto,
+    FindPhoto,
+    SiteOrigin,
+    SpatialArea,
+    SpatialContext,
+    forget_area_hierarchy,
+    forget_known_parents,
+)
+from main.tasks import cp_thumbnail, bp_thumbnail, fp_previews
 
-def tn_is_same(cp):
-    """
-    Filename for thumbnails should be "tn_" followed by the 
-    filename for the full-size photo
+
+def queue_photo_task(task, photo):
+    """Run ``task`` for the photo once the current transaction commits.
+
+    A photo saved more than once in a transaction is queued each time; the
+    tasks return without redoing the work once the photo's images are made.
     """
-    photo_stem = Path(cp.photo.file.name).stem
-    tn_stem = Path(cp.thumbnail.file.name).stem
-    return tn_stem.startswith(f"tn_{photo_stem}")
+    transaction.on_commit(
+        functools.partial(task.delay, photo.pk), using=router.db_for_write(type(photo))
+    )
+
 
 @receiver(post_save, sender=ContextPhoto)
 def start_cp_thumbnail(sender, **kwargs):
     cp = kwargs["instance"]
-    if not cp.thumbnail or (not tn_is_same(cp)):
-        cp_thumbnail.delay(cp.id)
-        
+    if not thumbnails.thumbnail_matches(cp):
+        queue_photo_task(cp_thumbnail, cp)
+
 
 @receiver(post_save, sender=BagPhoto)
 def start_bp_thumbnail(sender, **kwargs):
     bp = kwargs["instance"]
-    if not bp.thumbnail or (not tn_is_same(bp)):
-        bp_thumbnail.delay(bp.id)        
\ No newline at end of file
+    if not thumbnails.thumbnail_matches(bp):
+        queue_photo_task(bp_thumbnail, bp)
+
+
+@receiver(post_save, sender=FindPhoto)
+def start_fp_previews(sender, **kwargs):
+    fp = kwargs["instance"]
+    if not previews.previews_complete(fp):
+        queue_photo_task(fp_previews, fp)
+
+
+@receiver(post_delete, sender=FindPhoto)
+def delete_fp_previews(sender, **kwargs):
+    previews.delete_previews(kwargs["instance"].photo.name)
+
+
+@receiver(post_save, sender=SiteOrigin)
+@receiver(post_delete, sender=SiteOrigin)
+def reload_site_origins(sender, **kwargs):
+    # other processes pick up the change when their cache expires
+    model3d.clear_site_origin_cache()
+
+
+@receiver(post_delete, sender=SpatialArea)
+@receiver(post_delete, sender=SpatialContext)
+def forget_deleted_parent(sender, **kwargs):
+    forget_known_parents()
+
+
+@receiver(post_save, sender=SpatialArea)
+@receiver(post_save, sender=SpatialContext)
+def forget_edited_parent(sender, **kwargs):
+    # an edit may have changed the area or context number
+    if not kwargs["created"]:
+        forget_known_parents()
+
+
+@receiver(post_save, sender=SpatialArea)
+@receiver(post_delete, sender=SpatialArea)
+def rebuild_area_hierarchy(sender, **kwargs):
+    forget_area_hierarchy()
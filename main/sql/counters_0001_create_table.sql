@@ -0,0 +1,12 @@
+-- Next find/context numbers, handed out by main.models.NumberCounter.objects.allocate
+CREATE TABLE IF NOT EXISTS spatial.number_counters (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(16) NOT NULL,
+    utm_hemisphere VARCHAR(1) NOT NULL,
+    utm_zone INTEGER NOT NULL,
+    area_utm_easting_meters INTEGER NOT NULL,
+    area_utm_northing_meters INTEGER NOT NULL,
+    context_number INTEGER NOT NULL DEFAULT 0,
+    last_number INTEGER NOT NULL,
+    UNIQUE (kind, utm_hemisphere, utm_zone, area_utm_easting_meters, area_utm_northing_meters, context_number)
+);
@@ -1,49 +1,128 @@
-import PIL
-import pathlib
-import time
-
-from io import BytesIO
+import logging
 
 from celery import shared_task
-from django.core.files.base import ContentFile
-from django.core.files.images import ImageFile
-from django.core.files.uploadedfile import InMemoryUploadedFile
-
-from main.models import ContextPhoto, BagPhoto
-
-THUMBNAIL_DIM = 100
-
-def create_thumbnail(photo_obj):
-    photo_path = pathlib.Path(photo_obj.photo.file.name)
-    tn_name = f"tn_{photo_path.name}"
-    img = PIL.Image.open(photo_path)
-    buffer = BytesIO()
-    img.thumbnail((THUMBNAIL_DIM,THUMBNAIL_DIM), 
-                  resample=PIL.Image.LANCZOS, 
-                  reducing_gap=3.0)
-    img.save(fp=buffer, format="JPEG", quality=95)                  
-    cf = ContentFile(buffer.getvalue())
-    photo_obj.thumbnail.save(tn_name,
-                             InMemoryUploadedFile(cf,
-                                                  None,
-                                                  tn_name,
-                                                  "image/jpeg",
-                                                  cf.tell,
-                                                  None))
-    return photo_obj.thumbnail.file.name
+from django.db import DatabaseError
+
+import main.model3d as model3d
+import main.previews as previews
+import main.thumbnails as thumbnails
+from main.models import ActionLog, ContextPhoto, BagPhoto, FindPhoto
+
+logger = logging.getLogger(__name__)
+
+
+def make_thumbnails(task, model, photo_id):
+    try:
+        photo = model.objects.get(id=photo_id)
+        if thumbnails.thumbnails_complete(photo):
+            # already made by an earlier task for the same photo
+            return photo.thumbnail.name
+        return thumbnails.create_thumbnails(photo)
+    except (model.DoesNotExist, FileNotFoundError) as e:
+        # the photo's row or file may not be visible to this worker yet
+        raise task.retry(exc=e)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=2)
+def cp_thumbnail(self, photo_id):
+    return make_thumbnails(self, ContextPhoto, photo_id)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=2)
+def bp_thumbnail(self, photo_id):
+    return make_thumbnails(self, BagPhoto, photo_id)
+
+
+@shared_task(bind=True, max_retries=5, default_retry_delay=2)
+def fp_previews(self, photo_id):
+    try:
+        photo = FindPhoto.objects.get(id=photo_id)
+        if previews.previews_complete(photo):
+            return None
+        names = previews.create_previews(photo.photo.name)
+        # update() rather than save(), which would queue this task again
+        FindPhoto.objects.filter(id=photo.id, photo=photo.photo.name).update(
+            preview_sizes=list(names))
+        return photo.photo.name
+    except (FindPhoto.DoesNotExist, FileNotFoundError) as e:
+        raise self.retry(exc=e)
+    except previews.NoDecoder as e:
+        # retrying won't install the decoder
+        logger.warning("No decoder for %s: %s", photo.photo.name, e)
+        return None
+
 
 @shared_task
-def cp_thumbnail(photo_id):
-    print(f"Received id {photo_id}")
-    time.sleep(1)
-    cp = ContextPhoto.objects.get(id=photo_id)
-    thumb_name = create_thumbnail(cp)
-    return thumb_name
+def prebuild_model_zip(utm_hemisphere,
+                       utm_zone,
+                       area_utm_easting_meters,
+                       area_utm_northing_meters,
+                       context_number):
+    folder = model3d.model_obj_folder(utm_hemisphere,
+                                      utm_zone,
+                                      area_utm_easting_meters,
+                                      area_utm_northing_meters,
+                                      context_number)
+    artifact = model3d.build_model_zip_artifact(folder)
+    return str(artifact) if artifact else None
+
+
+@shared_task
+def generate_model_lods(utm_hemisphere,
+                        utm_zone,
+                        area_utm_easting_meters,
+                        area_utm_northing_meters,
+                        context_number):
+    folder = model3d.model_obj_folder(utm_hemisphere,
+                                      utm_zone,
+                                      area_utm_easting_meters,
+                                      area_utm_northing_meters,
+                                      context_number)
+    return [str(lod_obj) for lod_obj in model3d.build_model_lods(folder)]
+
+
+@shared_task
+def convert_model_glb(utm_hemisphere,
+                      utm_zone,
+                      area_utm_easting_meters,
+                      area_utm_northing_meters,
+                      context_number,
+                      lod=model3d.FULL_LOD):
+    folder = model3d.model_obj_folder(utm_hemisphere,
+                                      utm_zone,
+                                      area_utm_easting_meters,
+                                      area_utm_northing_meters,
+                                      context_number)
+    artifact = model3d.build_model_glb(folder, lod)
+    return str(artifact) if artifact else None
+
+
+@shared_task
+def index_area_models(utm_hemisphere,
+                      utm_zone,
+                      area_utm_easting_meters,
+                      area_utm_northing_meters):
+    folder = model3d.area_folder(utm_hemisphere,
+                                 utm_zone,
+                                 area_utm_easting_meters,
+                                 area_utm_northing_meters)
+    return sorted(model3d.get_area_model_index(folder))
+
 
 @shared_task
-def bp_thumbnail(photo_id):
-    print(f"Received id {photo_id}")
-    time.sleep(1)
-    bp = BagPhoto.objects.get(id=photo_id)
-    thumb_name = create_thumbnail(bp)
-    return thumb_name
+def compute_site_origin(utm_hemisphere,
+                        utm_zone,
+                        area_utm_easting_meters,
+                        area_utm_northing_meters):
+    return model3d.compute_site_origin(utm_hemisphere,
+                                       utm_zone,
+                                       area_utm_easting_meters,
+                                       area_utm_northing_meters)
+
+
+@shared_task(autoretry_for=(DatabaseError,), max_retries=5, default_retry_delay=10)
+def write_action_logs(entries):
+    # entries queued by main.audit; ignore_conflicts makes a retried batch harmless
+    ActionLog.objects.bulk_create([ActionLog(**entry) for entry in entries],
+                                  ignore_conflicts=True)
+    return len(entries)
@@ -90,6 +90,15 @@ class TestClient:
         r = requests.get(url, headers=self.headers)
         return r
 
+    def all_results(self, r):
+        """Follow the ``next`` links of a paginated list response and return every item."""
+        data = r.json()
+        results = data["results"]
+        while data["next"]:
+            data = requests.get(data["next"], headers=self.headers).json()
+            results += data["results"]
+        return results
+
     def post(self, path, data=None, files={}):
         url = self.base_url + path
         r = requests.post(url, headers=self.headers, data=data, files=files)
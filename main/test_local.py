@@ -29,7 +29,6 @@ from main.models import (
     ContextPhoto,
     BagPhoto,
     FindPhoto,
-    get_next_photo_number,
 )
 import main.test_helpers as th
 
@@ -63,14 +62,14 @@ hzenc = hzen + [test_context_number]
 def test_area():
     r = client.get(reverse("api:spatialarea_list"))
     assert r.status_code == 200
-    assert SpatialArea.objects.count() == len(r.json())
+    assert SpatialArea.objects.count() == len(client.all_results(r))
     print("SpatialArea List OK")
 
     r = client.get(reverse("api:spatialarea_list_h", args=[test_utm_hemisphere]))
     assert r.status_code == 200
     assert SpatialArea.objects.filter(
         utm_hemisphere=test_utm_hemisphere
-    ).count() == len(r.json())
+    ).count() == len(client.all_results(r))
     print("SpatialArea List Hemisphere OK")
 
     url404 = reverse("api:spatialarea_list_h", args=[test_utm_hemisphere]).replace(
@@ -85,7 +84,7 @@ def test_area():
     )
     assert r.status_code == 200
     assert (
-        len(r.json())
+        len(client.all_results(r))
         == SpatialArea.objects.filter(
             utm_hemisphere=test_utm_hemisphere, utm_zone=test_utm_zone
         ).count()
@@ -100,7 +99,7 @@ def test_area():
     )
     assert r.status_code == 200
     assert (
-        len(r.json())
+        len(client.all_results(r))
         == SpatialArea.objects.filter(
             utm_hemisphere=test_utm_hemisphere,
             utm_zone=test_utm_zone,
@@ -122,7 +121,7 @@ def test_area():
     )
     assert r.status_code == 200
     assert (
-        len(r.json())
+        len(client.all_results(r))
         == SpatialArea.objects.filter(
             utm_hemisphere=test_utm_hemisphere,
             utm_zone=test_utm_zone,
@@ -143,7 +142,7 @@ def test_context():
     # test list all spatial contexts
     r = client.get(reverse("api:spatialcontext_list"))
     assert r.status_code == 200
-    assert SpatialContext.objects.count() == len(r.json())
+    assert SpatialContext.objects.count() == len(client.all_results(r))
     print("List all SpatialContext OK")
 
     # test filtered list of spatial context
@@ -161,7 +160,7 @@ def test_context():
 
     assert r.status_code == 200
     assert (
-        len(r.json())
+        len(client.all_results(r))
         == SpatialContext.objects.filter(
             utm_hemisphere=test_utm_hemisphere,
             utm_zone=test_utm_zone,
@@ -352,7 +351,7 @@ def test_objectfind():
     r = client.get(all_obj_url)
     assert r.status_code == 200
     data = r.json()
-    assert ObjectFind.objects.count() == data["count"]
+    assert ObjectFind.objects.count() == len(client.all_results(r))
     print("List all ObjectFinds OK")
 
     # test filter object finds by hzenc
@@ -361,10 +360,9 @@ def test_objectfind():
         args=hzenc,
     )
     r = client.get(hzenc_url)
-    received = r.json()
     assert r.status_code == 200
     assert (
-        received["count"]
+        len(client.all_results(r))
         == ObjectFind.objects.filter(
             utm_hemisphere=test_utm_hemisphere,
             utm_zone=test_utm_zone,
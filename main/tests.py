@@ -1,8 +1,58 @@
+import base64
+import datetime
+import io
+import json
+import os
+import pathlib
+import struct
+import tempfile
+import time
+import tracemalloc
+import uuid
+import zipfile
+from collections import deque
+from unittest import mock
+
+from celery.exceptions import Retry
 from django.contrib.auth import get_user_model
-from django.test import TestCase, Client
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connections
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.client import BOUNDARY, MULTIPART_CONTENT, encode_multipart
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
+from PIL.JpegImagePlugin import JpegImageFile
 
-from main.models import SpatialArea, SpatialContext
+import main.audit as audit
+import main.mesh as mesh
+import main.model3d as model3d
+import main.previews as previews
+import main.tasks as tasks
+import main.thumbnails as thumbnails
+import main.uploads as uploads
+from main import utils
+from main.models import (
+    ActionLog,
+    AreaType,
+    BagPhoto,
+    ContextPhoto,
+    ContextType,
+    FindPhoto,
+    NumberCounter,
+    ObjectFind,
+    PhotoNumber,
+    PhotoUpload,
+    SiteOrigin,
+    SpatialArea,
+    SpatialContext,
+    area_hierarchy,
+    forget_area_hierarchy,
+    forget_known_parents,
+)
+from main.serializers import ContextPhotoField
 
 User = get_user_model()
 
@@ -29,6 +79,1464 @@ class HomePageTest(TestCase):
         self.assertContains(response, "Sign Out")
 
 
+class ArchaeologyTablesMixin:
+    """
+    Create the tables of the unmanaged archaeology models, which migrations
+    don't, if the test database doesn't already have them.
+    """
+
+    databases = {"default", "archaeology"}
+    archaeology_models = [
+        AreaType,
+        ContextType,
+        SpatialArea,
+        SpatialContext,
+        ObjectFind,
+        NumberCounter,
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        # before TestCase opens its transactions; sqlite can't alter tables in one
+        connection = connections["archaeology"]
+        existing = connection.introspection.table_names()
+        cls.created_models = [
+            m for m in cls.archaeology_models if m._meta.db_table not in existing
+        ]
+        with connection.schema_editor() as editor:
+            for model in cls.created_models:
+                editor.create_model(model)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connections["archaeology"].schema_editor() as editor:
+            for model in reversed(cls.created_models):
+                editor.delete_model(model)
+
+
+class SpatialAreaListQueryTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="top_secret")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_areas(self, start, count):
+        for easting in range(start, start + count):
+            SpatialArea.objects.create(
+                utm_hemisphere="N",
+                utm_zone=38,
+                area_utm_easting_meters=easting,
+                area_utm_northing_meters=4419430,
+            )
+            for context_number in (1, 2):
+                SpatialContext.objects.create(
+                    utm_hemisphere="N",
+                    utm_zone=38,
+                    area_utm_easting_meters=easting,
+                    area_utm_northing_meters=4419430,
+                    context_number=context_number,
+                )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            response = self.client.get(reverse("api:spatialarea_list"))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()["results"]
+
+    def test_constant_queries(self):
+        self.add_areas(478130, 2)
+        few, data = self.count_queries()
+        self.assertEqual(len(data), 2)
+        self.add_areas(478200, 8)
+        many, data = self.count_queries()
+        self.assertEqual(len(data), 10)
+        self.assertEqual(few, many)
+        self.assertEqual(many, 2)
+
+    def test_contexts_attached(self):
+        self.add_areas(478130, 2)
+        # an area in another zone with the same easting/northing
+        SpatialArea.objects.create(
+            utm_hemisphere="N",
+            utm_zone=37,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+        )
+        _, data = self.count_queries()
+        numbers = {
+            (a["utm_zone"], a["area_utm_easting_meters"]): [c[1] for c in a["spatialcontext_set"]]
+            for a in data
+        }
+        self.assertEqual(
+            numbers, {(37, 478130): [], (38, 478130): [1, 2], (38, 478131): [1, 2]}
+        )
+
+
+class SpatialContextListQueryTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="top_secret")
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def add_contexts(self, start, count):
+        area = {
+            "utm_hemisphere": "N",
+            "utm_zone": 38,
+            "area_utm_easting_meters": 478130,
+            "area_utm_northing_meters": 4419430,
+        }
+        for context_number in range(start, start + count):
+            SpatialContext.objects.create(context_number=context_number, **area)
+            # bulk_create skips the thumbnail signals
+            ContextPhoto.objects.bulk_create(
+                ContextPhoto(context_number=context_number, photo=f"{context_number}/1.jpg", **area)
+                for _ in range(2)
+            )
+            BagPhoto.objects.bulk_create(
+                [
+                    BagPhoto(context_number=context_number, photo="d.jpg", source="D", **area),
+                    BagPhoto(context_number=context_number, photo="f.jpg", source="F", **area),
+                ]
+            )
+
+    def count_queries(self):
+        with CaptureQueriesContext(connections["default"]) as default_queries:
+            with CaptureQueriesContext(connections["archaeology"]) as archaeology_queries:
+                response = self.client.get(reverse("api:spatialcontext_list"))
+        self.assertEqual(response.status_code, 200)
+        return (len(default_queries), len(archaeology_queries)), response.json()["results"]
+
+    def test_constant_queries(self):
+        self.add_contexts(1, 2)
+        few, data = self.count_queries()
+        self.assertEqual(len(data), 2)
+        self.add_contexts(3, 8)
+        many, data = self.count_queries()
+        self.assertEqual(len(data), 10)
+        self.assertEqual(few, many)
+
+    def test_photos_attached(self):
+        self.add_contexts(1, 2)
+        _, data = self.count_queries()
+        for context in data:
+            number = context["context_number"]
+            self.assertEqual(len(context["contextphoto_set"]), 2)
+            self.assertTrue(
+                context["contextphoto_set"][0]["photo_url"].endswith(f"{number}/1.jpg")
+            )
+            self.assertEqual(
+                [p["photo_url"].rsplit("/", 1)[-1] for p in context["bagphoto_set"]],
+                ["d.jpg", "f.jpg"],
+            )
+
+
+class ActionLogWriterTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="test", password="top_secret")
+        audit._queue.clear()
+        self.addCleanup(audit._queue.clear)
+        settings_override = override_settings(
+            ACTION_LOG_BATCH_SIZE=3, ACTION_LOG_FLUSH_INTERVAL=0, ACTION_LOG_USE_CELERY=False
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def log(self, count):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(count):
+                audit.log_action(
+                    user=self.user, model_name="Object Find", action="R", object_id=uuid.uuid4()
+                )
+
+    def test_queued_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            audit.log_action(
+                user=self.user, model_name="Object Find", action="R", object_id=uuid.uuid4()
+            )
+        self.assertEqual(audit.pending(), 0)
+        callbacks[0]()
+        self.assertEqual(audit.pending(), 1)
+        self.assertEqual(ActionLog.objects.count(), 0)
+
+    def test_batches(self):
+        with self.assertNumQueries(1):
+            self.log(4)
+        self.assertEqual(ActionLog.objects.count(), 3)
+        self.assertEqual(audit.pending(), 1)
+        with self.assertNumQueries(1):
+            self.assertEqual(audit.flush(), 1)
+        self.assertEqual(ActionLog.objects.filter(user=self.user).count(), 4)
+
+    def test_failed_write_requeued(self):
+        self.log(2)
+        with mock.patch.object(ActionLog.objects, "bulk_create", side_effect=RuntimeError):
+            self.assertEqual(audit.flush(), 0)
+        self.assertEqual(audit.pending(), 2)
+        self.assertEqual(audit.flush(), 2)
+        self.assertEqual(ActionLog.objects.count(), 2)
+
+    @override_settings(ACTION_LOG_MAX_ATTEMPTS=2)
+    def test_bad_entry_dropped(self):
+        self.log(2)
+        bad = audit._queue[0]
+        bulk_create = ActionLog.objects.bulk_create
+
+        def fail_on_bad(entries):
+            if bad in entries:
+                raise RuntimeError
+            return bulk_create(entries)
+
+        with mock.patch.object(ActionLog.objects, "bulk_create", side_effect=fail_on_bad):
+            with self.assertLogs("main.audit", "ERROR"):
+                self.assertEqual(audit.flush(), 0)
+            self.assertEqual(audit.pending(), 2)
+            with self.assertLogs("main.audit", "ERROR") as logs:
+                self.assertEqual(audit.flush(), 1)
+        self.assertIn(f"Dropping action log entry {audit.serialize_entry(bad)}", logs.output[-1])
+        self.assertEqual(audit.pending(), 0)
+        self.assertFalse(ActionLog.objects.filter(pk=bad.pk).exists())
+        self.assertEqual(ActionLog.objects.count(), 1)
+
+    def test_queue_capped(self):
+        with mock.patch.object(audit, "_queue", deque(maxlen=2)):
+            self.log(2)
+            first = audit._queue[0]
+            with self.assertLogs("main.audit", "ERROR"):
+                self.log(1)
+            self.assertEqual(audit.pending(), 2)
+            self.assertNotIn(first, audit._queue)
+
+    @override_settings(ACTION_LOG_USE_CELERY=True)
+    def test_celery(self):
+        self.log(2)
+        with mock.patch("main.tasks.write_action_logs.delay") as delay:
+            audit.flush()
+        entries = delay.call_args[0][0]
+        self.assertEqual(len(entries), 2)
+        self.assertEqual(tasks.write_action_logs(entries), 2)
+        self.assertEqual(ActionLog.objects.count(), 2)
+
+        self.log(1)
+        with mock.patch("main.tasks.write_action_logs.delay", side_effect=OSError):
+            audit.flush()
+        self.assertEqual(ActionLog.objects.count(), 3)
+
+
+class NumberAllocationTest(ArchaeologyTablesMixin, TestCase):
+    area = {
+        "utm_hemisphere": "N",
+        "utm_zone": 38,
+        "area_utm_easting_meters": 478130,
+        "area_utm_northing_meters": 4419430,
+    }
+
+    def test_context_numbers(self):
+        # existing contexts numbered before the counter was used
+        SpatialContext.objects.create(context_number=5, **self.area)
+        self.assertEqual(SpatialContext.objects.create(**self.area).context_number, 6)
+        self.assertEqual(SpatialContext.objects.create(**self.area).context_number, 7)
+        other_area = dict(self.area, area_utm_easting_meters=478131)
+        self.assertEqual(SpatialContext.objects.create(**other_area).context_number, 1)
+
+    def test_find_numbers(self):
+        find = ObjectFind.objects.create(context_number=1, **self.area)
+        self.assertEqual(find.find_number, 1)
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            find = ObjectFind.objects.create(context_number=1, **self.area)
+        self.assertEqual(find.find_number, 2)
+        # the counter is updated in place instead of scanning the context's finds
+        self.assertFalse([q for q in queries if "MAX(" in q["sql"].upper()])
+        # a number chosen by the client moves the counter past it
+        ObjectFind.objects.create(context_number=1, find_number=10, **self.area)
+        self.assertEqual(ObjectFind.objects.create(context_number=1, **self.area).find_number, 11)
+        self.assertEqual(ObjectFind.objects.create(context_number=2, **self.area).find_number, 1)
+
+    def test_reserve_block(self):
+        ObjectFind.objects.create(context_number=1, **self.area)
+        key = dict(self.area, context_number=1)
+        self.assertEqual(
+            NumberCounter.objects.allocate(ObjectFind, "find_number", key, count=10),
+            range(2, 12),
+        )
+        self.assertEqual(ObjectFind.objects.create(**key).find_number, 12)
+
+    def test_reserve_endpoint(self):
+        client = Client()
+        client.force_login(User.objects.create_user(username="test", password="top_secret"))
+        url = reverse("api:reserve_find_numbers", args=["N", 38, 478130, 4419430, 1])
+        response = client.post(url, {"count": 3})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json(), {"find_numbers": [1, 2, 3]})
+        self.assertEqual(client.post(url, {"count": 0}).status_code, 400)
+        url = reverse("api:reserve_context_numbers", args=["N", 38, 478130, 4419430])
+        self.assertEqual(client.post(url).json(), {"context_numbers": [1]})
+
+
+class BulkFindCreateTest(ArchaeologyTablesMixin, TestCase):
+    context = {
+        "utm_hemisphere": "N",
+        "utm_zone": 38,
+        "area_utm_easting_meters": 478130,
+        "area_utm_northing_meters": 4419430,
+        "context_number": 1,
+    }
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username="test", password="top_secret"))
+        self.url = reverse("api:objectfind_bulk_create")
+
+    def post(self, items):
+        return self.client.post(self.url, items, content_type="application/json")
+
+    def test_bulk_create(self):
+        ObjectFind.objects.create(find_number=1, **self.context)
+        other_context = dict(self.context, context_number=2)
+        items = [
+            dict(self.context, material="bone"),
+            dict(self.context, find_number=5),
+            dict(self.context, utm_zone="not a zone"),
+            dict(other_context),
+            dict(self.context),
+        ]
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            response = self.post(items)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [201, 201, 400, 201, 201])
+        self.assertIn("utm_zone", results[2]["errors"])
+        numbers = [r["data"]["find_number"] for r in results if r["status"] == 201]
+        self.assertEqual(numbers, [6, 5, 1, 7])
+        self.assertEqual(results[0]["data"]["material"], "bone")
+        self.assertEqual(ObjectFind.objects.count(), 5)
+        self.assertTrue(SpatialContext.objects.filter(**other_context).exists())
+        inserts = [q for q in queries if q["sql"].startswith('INSERT INTO "finds"')]
+        self.assertEqual(len(inserts), 2)
+
+    def test_duplicate_find_numbers(self):
+        ObjectFind.objects.create(find_number=3, **self.context)
+        items = [
+            dict(self.context, find_number=3),
+            dict(self.context, find_number=4),
+            dict(self.context, find_number=4),
+            dict(self.context),
+        ]
+        response = self.post(items)
+        self.assertEqual(response.status_code, 207)
+        results = response.json()["results"]
+        self.assertEqual([r["status"] for r in results], [409, 201, 400, 201])
+        self.assertIn("find_number", results[0]["errors"])
+        self.assertIn("find_number", results[2]["errors"])
+        self.assertEqual(results[3]["data"]["find_number"], 5)
+        self.assertEqual(
+            sorted(ObjectFind.objects.values_list("find_number", flat=True)), [3, 4, 5]
+        )
+
+    def test_all_invalid(self):
+        self.assertEqual(self.post([{"utm_hemisphere": "N"}]).status_code, 400)
+        self.assertEqual(self.post({"utm_hemisphere": "N"}).status_code, 400)
+        self.assertEqual(self.post([self.context]).status_code, 201)
+
+
+class KeysetPaginationTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username="test", password="top_secret"))
+        for zone, easting in [(38, 478131), (37, 478130), (38, 478130)]:
+            for context_number in (2, 1):
+                for find_number in (1, 2, 10):
+                    ObjectFind.objects.create(
+                        utm_hemisphere="N",
+                        utm_zone=zone,
+                        area_utm_easting_meters=easting,
+                        area_utm_northing_meters=4419430,
+                        context_number=context_number,
+                        find_number=find_number,
+                    )
+        self.expected = [
+            (f.utm_zone, f.area_utm_easting_meters, f.context_number, f.find_number)
+            for f in ObjectFind.objects.all()
+        ]
+
+    def get_page(self, url):
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries if "COUNT(" in q["sql"].upper()])
+        data = response.json()
+        keys = [
+            (f["utm_zone"], f["area_utm_easting_meters"], f["context_number"], f["find_number"])
+            for f in data["results"]
+        ]
+        return keys, data["next"], data["previous"]
+
+    def test_walk_forward_and_back(self):
+        url = reverse("api:objectfind_list") + "?page_size=4"
+        pages = []
+        previous = None
+        while url:
+            keys, url, previous = self.get_page(url)
+            self.assertEqual(previous is None, not pages)
+            pages.append(keys)
+        self.assertEqual([k for page in pages for k in page], self.expected)
+        self.assertEqual([len(page) for page in pages], [4, 4, 4, 4, 2])
+
+        url = previous
+        for page in reversed(pages[:-1]):
+            keys, _, url = self.get_page(url)
+            self.assertEqual(keys, page)
+        self.assertIsNone(url)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("api:objectfind_list") + "?cursor=nonsense")
+        self.assertEqual(response.status_code, 404)
+
+    def test_cursor_with_wrong_types(self):
+        _, next_url, _ = self.get_page(reverse("api:objectfind_list") + "?page_size=4")
+        cursor = next_url.split("cursor=")[1].split("&")[0]
+        position = json.loads(base64.urlsafe_b64decode(cursor))["p"]
+        for i, value in [(1, "zone"), (4, None), (5, [1]), (6, "not-a-uuid")]:
+            tampered = list(position)
+            tampered[i] = value
+            cursor = base64.urlsafe_b64encode(json.dumps({"p": tampered, "r": 0}).encode())
+            response = self.client.get(
+                reverse("api:objectfind_list") + f"?cursor={cursor.decode()}"
+            )
+            self.assertEqual(response.status_code, 404, tampered)
+            self.assertEqual(response.json()["detail"], "Invalid cursor")
+
+
+class AreaHierarchyTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        self.settings_override.enable()
+        for h, z, e, n in [
+            ("N", 38, 478130, 4419430),
+            ("N", 38, 478130, 4419420),
+            ("N", 37, 478140, 4419430),
+            ("S", 38, 478130, 4419430),
+        ]:
+            SpatialArea.objects.create(
+                utm_hemisphere=h,
+                utm_zone=z,
+                area_utm_easting_meters=e,
+                area_utm_northing_meters=n,
+            )
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username="test", password="top_secret"))
+
+    def tearDown(self):
+        forget_area_hierarchy()
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_tree(self):
+        tree, _ = area_hierarchy()
+        self.assertEqual(
+            tree,
+            {
+                "N": {37: {478140: [4419430]}, 38: {478130: [4419420, 4419430]}},
+                "S": {38: {478130: [4419430]}},
+            },
+        )
+        with self.assertNumQueries(0, using="archaeology"):
+            area_hierarchy()
+
+    def test_browse_views_use_cached_tree(self):
+        area_hierarchy()
+        with self.assertNumQueries(0, using="archaeology"):
+            response = self.client.get(
+                reverse("main:northing_select", args=["N", 38, 478130])
+            )
+        self.assertEqual(response.context["northings"], [4419420, 4419430])
+        # a new area rebuilds the tree
+        SpatialArea.objects.create(
+            utm_hemisphere="N",
+            utm_zone=39,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+        )
+        response = self.client.get(reverse("main:zone_select", args=["N"]))
+        self.assertEqual(response.context["zones"], [37, 38, 39])
+
+    def test_tree_endpoint(self):
+        response = self.client.get(reverse("api:spatialarea_tree"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["N"]["38"], {"478130": [4419420, 4419430]})
+        response = self.client.get(
+            reverse("api:spatialarea_tree"), HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, 304)
+
+
+class KnownParentsTest(ArchaeologyTablesMixin, TestCase):
+    area = {
+        "utm_hemisphere": "N",
+        "utm_zone": 38,
+        "area_utm_easting_meters": 478130,
+        "area_utm_northing_meters": 4419430,
+    }
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        self.settings_override.enable()
+        forget_known_parents()
+
+    def tearDown(self):
+        forget_known_parents()
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def create_find(self):
+        with self.captureOnCommitCallbacks(using="archaeology", execute=True):
+            return ObjectFind.objects.create(context_number=1, **self.area)
+
+    def parent_queries(self, find):
+        with CaptureQueriesContext(connections["archaeology"]) as queries:
+            with self.captureOnCommitCallbacks(using="archaeology", execute=True):
+                find.save()
+        return [
+            q["sql"] for q in queries if '"areas"' in q["sql"] or '"contexts"' in q["sql"]
+        ]
+
+    def test_edit_skips_parent_queries(self):
+        find = self.create_find()
+        self.assertTrue(SpatialArea.objects.filter(**self.area).exists())
+        self.assertTrue(SpatialContext.objects.filter(context_number=1, **self.area).exists())
+        find.director_notes = "edited"
+        self.assertEqual(self.parent_queries(find), [])
+
+    def test_deleted_context_is_recreated(self):
+        find = self.create_find()
+        SpatialContext.objects.filter(context_number=1, **self.area).get().delete()
+        self.assertTrue(self.parent_queries(find))
+        self.assertTrue(SpatialContext.objects.filter(context_number=1, **self.area).exists())
+
+    def test_other_process_invalidates(self):
+        find = self.create_find()
+        # another process deleting a context rewrites the stamp file
+        stamp = pathlib.Path(self.tmpdir.name) / ".known_parents"
+        os.utime(stamp, ns=(0, stamp.stat().st_mtime_ns + 1))
+        self.assertTrue(self.parent_queries(find))
+
+
+class PhotoNumberTest(TestCase):
+    subfolder = "N/38/478130/4419430/1/finds/bagphotos"
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        self.settings_override.enable()
+        self.folder = pathlib.Path(self.tmpdir.name) / self.subfolder
+        self.folder.mkdir(parents=True)
+        for name in ["3.jpg", "7.PNG", "12.txt", "tn_20.jpg"]:
+            (self.folder / name).touch()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def test_numbers_shared_across_extensions(self):
+        self.assertEqual(PhotoNumber.objects.next_filename(self.subfolder, "jpg"), "8.jpg")
+        # the folder isn't read again once the counter exists
+        with mock.patch("main.models.largest_photo_number") as largest:
+            self.assertEqual(PhotoNumber.objects.next_filename(self.subfolder, "png"), "9.png")
+        largest.assert_not_called()
+
+    def test_numbers_per_extension(self):
+        next_filename = PhotoNumber.objects.next_filename
+        self.assertEqual(next_filename(self.subfolder, "jpg", per_extension=True), "4.jpg")
+        self.assertEqual(next_filename(self.subfolder, "cr3", per_extension=True), "1.cr3")
+        self.assertEqual(next_filename(self.subfolder, "jpg", per_extension=True), "5.jpg")
+
+    def test_skips_existing_files(self):
+        PhotoNumber.objects.next_filename(self.subfolder, "jpg")
+        (self.folder / "9.jpg").touch()
+        self.assertEqual(PhotoNumber.objects.next_filename(self.subfolder, "jpg"), "10.jpg")
+
+    def test_reconcile(self):
+        PhotoNumber.objects.next_filename(self.subfolder, "jpg")
+        PhotoNumber.objects.create(folder="N/38/1/1/1/gone", last_number=5)
+        (self.folder / "30.jpg").touch()
+        call_command("reconcile_photo_numbers", stdout=io.StringIO())
+        self.assertEqual(
+            PhotoNumber.objects.get(folder=self.subfolder).last_number, 30
+        )
+        self.assertFalse(PhotoNumber.objects.filter(folder="N/38/1/1/1/gone").exists())
+
+
+class FindPhotoIndexTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir.name, MEDIA_URL="/media/"
+        )
+        self.settings_override.enable()
+        self.find = ObjectFind.objects.create(
+            utm_hemisphere="N",
+            utm_zone=38,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+            context_number=1,
+            find_number=1,
+        )
+        self.folder = self.find.absolute_findphoto_folder
+        self.folder.mkdir(parents=True)
+        for name in ["1.jpg", "2.cr3", "3.jpg"]:
+            (self.folder / name).touch()
+        for name in ["1.jpg", "2.cr3", "4.jpg"]:
+            FindPhoto.objects.create(
+                photo=f"{self.find.findphoto_folder}/{name}",
+                **self.find.hzencf_dict(),
+            )
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def photo_names(self):
+        return [url.rsplit("/", 1)[-1] for url in self.find.list_file_urls_from_photo_folder()]
+
+    def test_listing_does_not_read_folder(self):
+        with mock.patch.object(pathlib.Path, "iterdir", side_effect=AssertionError):
+            self.assertEqual(self.photo_names(), ["2.cr3", "1.jpg", "4.jpg"])
+        self.assertEqual(
+            self.find.list_file_urls_from_photo_folder()[0],
+            "/media/N/38/478130/4419430/1/finds/individual/1/photos/2.cr3",
+        )
+        self.assertEqual(
+            self.find.list_files_photo_folder(extension=".JPG"),
+            [self.folder / "1.jpg", self.folder / "4.jpg"],
+        )
+
+    def test_rescan(self):
+        # left by a write that was killed part way through
+        with mock.patch("os.replace", side_effect=KeyboardInterrupt), mock.patch(
+            "pathlib.Path.unlink"
+        ):
+            with self.assertRaises(KeyboardInterrupt):
+                with utils.atomic_write(self.folder / "1.jpg") as fh:
+                    fh.write(b"partial")
+        self.assertEqual(len(list(self.folder.glob(".*.tmp"))), 1)
+        call_command("rescan_find_photos", "--dry-run", stdout=io.StringIO())
+        self.assertEqual(self.photo_names(), ["2.cr3", "1.jpg", "4.jpg"])
+        call_command("rescan_find_photos", stdout=io.StringIO())
+        self.assertEqual(self.photo_names(), ["2.cr3", "1.jpg", "3.jpg"])
+        added = FindPhoto.objects.get(photo__endswith="/3.jpg")
+        self.assertIsNone(added.user)
+        self.assertEqual(added.find_number, 1)
+
+
+@override_settings(THUMBNAIL_SIZES=[100, 400])
+class FindPhotoPreviewTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir.name, MEDIA_URL="/media/"
+        )
+        self.settings_override.enable()
+        self.find = ObjectFind.objects.create(
+            utm_hemisphere="N",
+            utm_zone=38,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+            context_number=1,
+            find_number=1,
+        )
+        self.find.absolute_findphoto_folder.mkdir(parents=True)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def jpeg(self, size):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 100, 50)).save(buffer, format="JPEG")
+        return buffer.getvalue()
+
+    def raw_file(self, name, *parts):
+        path = self.find.absolute_findphoto_folder / name
+        path.write_bytes(b"".join(parts))
+        return f"{self.find.findphoto_folder}/{name}"
+
+    def test_largest_embedded_jpeg(self):
+        preview = self.jpeg((800, 600))
+        data = b"".join(
+            [b"ftypcrx \xff\xd8\xff\x00", self.jpeg((160, 120)), b"\xff\xd8\xff\xe1", preview, b"\x00" * 64]
+        )
+        self.assertEqual(previews.embedded_jpeg(data), preview)
+        self.assertIsNone(previews.embedded_jpeg(b"ftypheic \xff\xd8\xff\xe0\x00"))
+
+    def test_create_previews(self):
+        name = self.raw_file("2.cr3", b"ftypcrx ", self.jpeg((160, 120)), self.jpeg((1200, 800)))
+        (fp,) = FindPhoto.objects.bulk_create([FindPhoto(photo=name, **self.find.hzencf_dict())])
+        (listed,) = self.find.list_photo_previews()
+        self.assertEqual(listed["thumbnail_url"], "")
+        self.assertEqual(listed["previews"], {})
+        self.assertEqual(tasks.fp_previews(fp.id), name)
+        fp.refresh_from_db()
+        self.assertEqual(fp.preview_sizes, thumbnails.thumbnail_sizes())
+        derived = self.find.absolute_findphoto_folder / "derived"
+        with Image.open(derived / "tn400_2.cr3.jpg") as img:
+            self.assertEqual((img.format, img.size), ("JPEG", (400, 267)))
+        with Image.open(derived / "tn100_2.cr3.webp") as img:
+            self.assertEqual((img.format, img.size), ("WEBP", (100, 67)))
+        # the previews aren't listed or numbered as photos
+        self.assertEqual(PhotoNumber.objects.next_filename(self.find.findphoto_folder, "cr3"), "3.cr3")
+        # listing reads the recorded sizes, not the files
+        with mock.patch("os.stat", side_effect=AssertionError):
+            (listed,) = self.find.list_photo_previews()
+        folder_url = f"/media/{self.find.findphoto_folder}"
+        self.assertEqual(listed["photo_url"], f"{folder_url}/2.cr3")
+        self.assertEqual(listed["thumbnail_url"], f"{folder_url}/derived/tn100_2.cr3.jpg")
+        self.assertEqual(
+            listed["previews"]["400"],
+            {
+                "jpg": f"{folder_url}/derived/tn400_2.cr3.jpg",
+                "webp": f"{folder_url}/derived/tn400_2.cr3.webp",
+            },
+        )
+        FindPhoto.objects.get(photo=name).delete()
+        self.assertEqual(list(derived.iterdir()), [])
+
+    def test_queued_on_commit(self):
+        name = self.raw_file("1.cr3", b"ftypcrx ", self.jpeg((600, 400)))
+        with mock.patch.object(tasks.fp_previews, "delay", side_effect=tasks.fp_previews):
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                fp = FindPhoto.objects.create(photo=name, **self.find.hzencf_dict())
+                self.assertFalse(previews.previews_complete(fp))
+        self.assertEqual(len(callbacks), 1)
+        fp.refresh_from_db()
+        self.assertTrue(previews.previews_complete(fp))
+        with mock.patch.object(previews, "create_previews") as create:
+            tasks.fp_previews(fp.id)
+        create.assert_not_called()
+
+    def test_replace(self):
+        name = self.raw_file("1.cr3", b"ftypcrx ", self.jpeg((600, 400)))
+        (fp,) = FindPhoto.objects.bulk_create([FindPhoto(photo=name, **self.find.hzencf_dict())])
+        tasks.fp_previews(fp.id)
+        client = Client()
+        client.force_login(User.objects.create_user(username="test", password="top_secret"))
+        # the audit entries name a user that is rolled back with the test
+        self.addCleanup(audit._queue.clear)
+        url = reverse("api:objectfind_photo_replace", args=[self.find.id])
+
+        def put(filename, photo):
+            data = {"filename": filename, "photo": photo}
+            return client.put(url, encode_multipart(BOUNDARY, data), content_type=MULTIPART_CONTENT)
+
+        new_photo = b"ftypcrx " + self.jpeg((300, 200))
+        with mock.patch.object(tasks.fp_previews, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True):
+                response = put("1.cr3", SimpleUploadedFile("new.cr3", new_photo))
+        self.assertEqual(response.status_code, 200)
+        path = self.find.absolute_findphoto_folder / "1.cr3"
+        self.assertEqual(path.read_bytes(), new_photo)
+        self.assertEqual(path.stat().st_mode & 0o777, 0o644)
+        # no temp file is left behind
+        self.assertEqual(sorted(os.listdir(path.parent)), ["1.cr3", "derived"])
+        self.assertEqual(os.listdir(path.parent / "derived"), [])
+        fp.refresh_from_db()
+        self.assertFalse(previews.previews_complete(fp))
+        delay.assert_called_once_with(fp.id)
+        self.assertEqual(put("../1.cr3", SimpleUploadedFile("x.cr3", b"x")).status_code, 400)
+        self.assertEqual(put("2.cr3", SimpleUploadedFile("x.cr3", b"x")).status_code, 404)
+
+    def test_no_decoder(self):
+        name = self.raw_file("3.cr3", b"ftypcrx no preview")
+        with mock.patch.dict("sys.modules", {"rawpy": None}):
+            with self.assertRaises(previews.NoDecoder):
+                previews.create_previews(name)
+            (fp,) = FindPhoto.objects.bulk_create([FindPhoto(photo=name, **self.find.hzencf_dict())])
+            with self.assertLogs("main.tasks", "WARNING") as logs:
+                self.assertIsNone(tasks.fp_previews(fp.id))
+        self.assertIn(f"No decoder for {name}", logs.output[0])
+
+
+@override_settings(PHOTO_UPLOAD_CHUNK_SIZE=256, PHOTO_UPLOAD_DIR="")
+class PhotoUploadTest(ArchaeologyTablesMixin, TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir.name, MEDIA_URL="/media/"
+        )
+        self.settings_override.enable()
+        self.find = ObjectFind.objects.create(
+            utm_hemisphere="N",
+            utm_zone=38,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+            context_number=1,
+            find_number=1,
+        )
+        self.user = User.objects.create_user(username="test", password="top_secret")
+        self.client = Client()
+        self.client.force_login(self.user)
+        # the audit entries name a user that is rolled back with the test
+        self.addCleanup(audit._queue.clear)
+        buffer = io.BytesIO()
+        Image.new("RGB", (64, 48), (200, 100, 50)).save(buffer, format="JPEG")
+        self.photo = buffer.getvalue()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def start(self, **data):
+        data = {
+            "kind": "find",
+            "target_id": str(self.find.id),
+            "filename": "IMG_0001.JPG",
+            "size": len(self.photo),
+            **data,
+        }
+        return self.client.post(reverse("api:photoupload_start"), data)
+
+    def put_chunk(self, upload_id, number, data):
+        url = reverse("api:photoupload_chunk", args=[upload_id, number])
+        return self.client.put(url, data, content_type="application/octet-stream")
+
+    def finish(self, upload_id):
+        return self.client.post(reverse("api:photoupload_finish", args=[upload_id]))
+
+    def test_resume(self):
+        response = self.start()
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.json()["id"]
+        self.assertEqual(response.json()["next_chunk"], 0)
+        chunks = [self.photo[i : i + 256] for i in range(0, len(self.photo), 256)]
+        self.assertEqual(self.put_chunk(upload_id, 0, chunks[0]).json()["received"], 256)
+        # a dropped chunk is thrown away, and the client asks where to carry on
+        response = self.put_chunk(upload_id, 1, chunks[1][:100])
+        self.assertEqual(response.status_code, 409)
+        part = uploads.part_path(PhotoUpload.objects.get(id=upload_id))
+        self.assertEqual(part.stat().st_size, 256)
+        self.assertEqual(self.put_chunk(upload_id, 2, chunks[2]).status_code, 409)
+        self.assertEqual(self.put_chunk(upload_id, 0, chunks[0]).status_code, 200)
+        self.assertEqual(self.finish(upload_id).status_code, 409)
+        detail = self.client.get(reverse("api:photoupload_detail", args=[upload_id])).json()
+        self.assertEqual(detail["next_chunk"], 1)
+        for number, chunk in enumerate(chunks[1:], start=1):
+            self.assertEqual(self.put_chunk(upload_id, number, chunk).status_code, 200)
+
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 201)
+        fp = FindPhoto.objects.get(id=response.json()["id"])
+        self.assertEqual(fp.photo.name, f"{self.find.findphoto_folder}/1.jpg")
+        self.assertEqual(fp.user, self.user)
+        self.assertEqual(pathlib.Path(fp.photo.path).read_bytes(), self.photo)
+        # moved into place rather than copied
+        self.assertFalse(part.exists())
+        # a retried finish doesn't make another photo
+        self.assertEqual(self.finish(upload_id).json(), response.json())
+        self.assertEqual(FindPhoto.objects.count(), 1)
+
+    def test_bag_photo(self):
+        sc = self.find.spatial_context
+        upload_id = self.start(kind="bag", target_id=str(sc.id), source="D").json()["id"]
+        self.put_chunk(upload_id, 0, self.photo[:256])
+        self.put_chunk(upload_id, 1, self.photo[256:512])
+        self.put_chunk(upload_id, 2, self.photo[512:])
+        response = self.finish(upload_id)
+        self.assertEqual(response.status_code, 201)
+        bp = BagPhoto.objects.get(id=response.json()["id"])
+        self.assertEqual(bp.source, "D")
+        self.assertTrue(bp.photo.name.startswith("N/38/478130/4419430/1/finds/bags/drying/1."))
+        self.assertEqual(pathlib.Path(bp.photo.path).read_bytes(), self.photo)
+
+    def test_validation_and_ownership(self):
+        self.assertIn("filename", self.start(filename="notes.txt").json())
+        self.assertIn("target_id", self.start(target_id=str(uuid.uuid4())).json())
+        upload_id = self.start().json()["id"]
+        other = Client()
+        other.force_login(User.objects.create_user(username="other", password="top_secret"))
+        url = reverse("api:photoupload_detail", args=[upload_id])
+        self.assertEqual(other.get(url).status_code, 404)
+        self.assertEqual(self.client.delete(url).status_code, 204)
+        self.assertFalse(PhotoUpload.objects.exists())
+
+    def test_purge(self):
+        upload_id = self.start().json()["id"]
+        upload = PhotoUpload.objects.get(id=upload_id)
+        call_command("purge_photo_uploads", stdout=io.StringIO())
+        self.assertTrue(uploads.part_path(upload).exists())
+        PhotoUpload.objects.filter(id=upload_id).update(
+            created=upload.created - datetime.timedelta(hours=49)
+        )
+        call_command("purge_photo_uploads", stdout=io.StringIO())
+        self.assertFalse(PhotoUpload.objects.exists())
+        self.assertFalse(uploads.part_path(upload).exists())
+
+
+@override_settings(THUMBNAIL_SIZES=[100, 400, 1600])
+class ThumbnailTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmpdir.name, MEDIA_URL="/media/"
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmpdir.cleanup()
+
+    def jpeg(self, size, **save_args):
+        buffer = io.BytesIO()
+        Image.new("RGB", size, (200, 100, 50)).save(buffer, format="JPEG", **save_args)
+        buffer.seek(0)
+        return buffer
+
+    def sizes(self, rendered):
+        return {size: Image.open(io.BytesIO(data)).size for size, data in rendered.items()}
+
+    def test_sizes_from_one_draft_decode(self):
+        with mock.patch.object(
+            JpegImageFile, "draft", autospec=True, side_effect=JpegImageFile.draft
+        ) as draft:
+            rendered = thumbnails.render_thumbnails(self.jpeg((3000, 2000)), [100, 400, 1600])
+        draft.assert_called_once()
+        self.assertEqual(
+            self.sizes(rendered),
+            {1600: (1600, 1067), 400: (400, 267), 100: (100, 67)},
+        )
+
+    def test_orientation_and_mode(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotated 90 degrees
+        rendered = thumbnails.render_thumbnails(self.jpeg((300, 200), exif=exif), [100])
+        self.assertEqual(self.sizes(rendered), {100: (67, 100)})
+        png = io.BytesIO()
+        Image.new("RGBA", (50, 40)).save(png, format="PNG")
+        png.seek(0)
+        # smaller than the thumbnail, and RGBA can't be saved as a JPEG
+        self.assertEqual(self.sizes(thumbnails.render_thumbnails(png, [100])), {100: (50, 40)})
+
+    def test_create_thumbnails(self):
+        photo_name = "N/38/478130/4419430/1/documentation/12.jpg"
+        photo_path = pathlib.Path(self.tmpdir.name) / photo_name
+        photo_path.parent.mkdir(parents=True)
+        photo_path.write_bytes(self.jpeg((3000, 2000)).getvalue())
+        # bulk_create skips the thumbnail signals
+        (cp,) = ContextPhoto.objects.bulk_create(
+            [
+                ContextPhoto(
+                    utm_hemisphere="N",
+                    utm_zone=38,
+                    area_utm_easting_meters=478130,
+                    area_utm_northing_meters=4419430,
+                    context_number=1,
+                    photo=photo_name,
+                )
+            ]
+        )
+        self.assertEqual(ContextPhotoField(read_only=True).to_representation(cp)["thumbnail_urls"], {})
+        thumbnails.create_thumbnails(cp)
+        folder = photo_path.parent
+        self.assertEqual(Image.open(folder / "tn_12.jpg").size, (100, 67))
+        self.assertEqual(Image.open(folder / "tn400_12.jpg").size, (400, 267))
+        self.assertEqual(Image.open(folder / "tn1600_12.jpg").size, (1600, 1067))
+        # making them again keeps the names
+        thumbnails.create_thumbnails(cp)
+        self.assertEqual(cp.thumbnail.name, "N/38/478130/4419430/1/documentation/tn_12.jpg")
+        urls = ContextPhotoField(read_only=True).to_representation(ContextPhoto.objects.get(id=cp.id))
+        self.assertEqual(
+            urls["thumbnail_urls"],
+            {
+                "100": "/media/N/38/478130/4419430/1/documentation/tn_12.jpg",
+                "400": "/media/N/38/478130/4419430/1/documentation/tn400_12.jpg",
+                "1600": "/media/N/38/478130/4419430/1/documentation/tn1600_12.jpg",
+            },
+        )
+
+    def context_photo(self, **kwargs):
+        return ContextPhoto(
+            utm_hemisphere="N",
+            utm_zone=38,
+            area_utm_easting_meters=478130,
+            area_utm_northing_meters=4419430,
+            context_number=1,
+            photo="N/38/478130/4419430/1/documentation/12.jpg",
+            **kwargs,
+        )
+
+    def test_dispatched_on_commit(self):
+        cp = self.context_photo()
+        with mock.patch.object(tasks.cp_thumbnail, "delay") as delay:
+            with self.captureOnCommitCallbacks(execute=True) as callbacks:
+                cp.save()
+                delay.assert_not_called()
+        self.assertEqual(len(callbacks), 1)
+        delay.assert_called_once_with(cp.id)
+        # a thumbnail made from the current photo isn't remade
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.context_photo(thumbnail="N/38/478130/4419430/1/documentation/tn_12.jpg").save()
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.context_photo(thumbnail="N/38/478130/4419430/1/documentation/tn_123.jpg").save()
+        self.assertEqual(len(callbacks), 1)
+
+    def test_task_retries_missing_and_skips_complete(self):
+        with mock.patch.object(tasks.cp_thumbnail, "retry", side_effect=Retry) as retry:
+            with self.assertRaises(Retry):
+                tasks.cp_thumbnail(uuid.uuid4())
+        self.assertIsInstance(retry.call_args.kwargs["exc"], ContextPhoto.DoesNotExist)
+        photo_name = "N/38/478130/4419430/1/documentation/12.jpg"
+        photo_path = pathlib.Path(self.tmpdir.name) / photo_name
+        photo_path.parent.mkdir(parents=True)
+        photo_path.write_bytes(self.jpeg((300, 200)).getvalue())
+        (cp,) = ContextPhoto.objects.bulk_create([self.context_photo()])
+        self.assertEqual(tasks.cp_thumbnail(cp.id), "N/38/478130/4419430/1/documentation/tn_12.jpg")
+        with mock.patch.object(thumbnails, "create_thumbnails") as create:
+            tasks.cp_thumbnail(cp.id)
+        create.assert_not_called()
+
+
+class StreamingModelZipTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.folder = pathlib.Path(self.tmpdir.name)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def make_model(self, stem, obj_size):
+        obj_path = self.folder / f"{stem}.obj"
+        with obj_path.open("wb") as fh:
+            remaining = obj_size
+            while remaining > 0:
+                block = os.urandom(min(remaining, 1024 * 1024))
+                fh.write(block)
+                remaining -= len(block)
+        (self.folder / f"{stem}.mtl").write_text("newmtl material0\n")
+        (self.folder / f"{stem}.jpg").write_bytes(os.urandom(1024))
+        return obj_path
+
+    def peak_memory(self, obj_path):
+        tracemalloc.start()
+        try:
+            for _ in model3d.iter_model_zip(obj_path):
+                pass
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return peak
+
+    def test_streamed_zip_contents(self):
+        obj_path = self.make_model("context1", 256 * 1024)
+        data = b"".join(model3d.iter_model_zip(obj_path))
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.assertIsNone(zf.testzip())
+            self.assertEqual(
+                sorted(zf.namelist()),
+                ["context1.jpg", "context1.mtl", "context1.obj"],
+            )
+            self.assertEqual(zf.read("context1.obj"), obj_path.read_bytes())
+
+    def test_compresslevel_applied(self):
+        obj_path = self.folder / "context1.obj"
+        obj_path.write_bytes(b"v 1.0 2.0 3.0\n" * 20000)
+        (self.folder / "context1.jpg").write_bytes(os.urandom(1024))
+        sizes = {}
+        for level in (0, 9):
+            with override_settings(MODEL_ZIP_COMPRESSLEVEL=level):
+                data = b"".join(model3d.iter_model_zip(obj_path))
+            with zipfile.ZipFile(io.BytesIO(data)) as zf:
+                sizes[level] = zf.getinfo("context1.obj").compress_size
+                self.assertEqual(zf.getinfo("context1.jpg").compress_type, zipfile.ZIP_STORED)
+                self.assertEqual(zf.read("context1.obj"), obj_path.read_bytes())
+        # level 0 deflates without compressing
+        self.assertGreaterEqual(sizes[0], obj_path.stat().st_size)
+        self.assertLess(sizes[9], obj_path.stat().st_size // 50)
+
+    def test_peak_memory_flat(self):
+        small = self.peak_memory(self.make_model("small", 1024 * 1024))
+        large = self.peak_memory(self.make_model("large", 16 * 1024 * 1024))
+        self.assertLess(large, 2 * small)
+        self.assertLess(large, 2 * 1024 * 1024)
+
+
+class ModelManifestTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        media_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.folder = model3d.model_obj_folder("N", 38, 478130, 4419430, 1)
+        self.folder.mkdir(parents=True)
+        self.obj_path = self.folder / "context1.obj"
+        self.obj_path.write_text("v 0 0 0\nv 2 4 6\n")
+        (self.folder / "context1.mtl").write_text("newmtl material0\n")
+        (self.folder / "context1.jpg").write_bytes(b"jpg")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_manifest_cached(self):
+        manifest = model3d.get_model_manifest(self.folder)
+        self.assertEqual(manifest["obj_filename"], "context1.obj")
+        self.assertEqual(manifest["zip_filename"], "context1.zip")
+        self.assertEqual(manifest["center"], [1.0, 2.0, 3.0])
+        with mock.patch.object(model3d, "obj_bbox_center") as bbox:
+            self.assertEqual(model3d.get_model_manifest(self.folder), manifest)
+            bbox.assert_not_called()
+
+    def test_manifest_invalidated(self):
+        model3d.get_model_manifest(self.folder)
+        self.obj_path.write_text("v 0 0 0\nv 20 40 60\n")
+        manifest = model3d.get_model_manifest(self.folder)
+        self.assertEqual(manifest["center"], [10.0, 20.0, 30.0])
+
+
+class AreaModelIndexTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        media_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.area = model3d.area_folder("N", 38, 478130, 4419430)
+        self.add_model(1, "v 0 0 0\nv 2 4 6\n")
+        (self.area / "2").mkdir()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def add_model(self, context_number, obj_text):
+        folder = model3d.model_obj_folder("N", 38, 478130, 4419430, context_number)
+        folder.mkdir(parents=True, exist_ok=True)
+        (folder / f"context{context_number}.obj").write_text(obj_text)
+
+    def test_index(self):
+        index = model3d.get_area_model_index(self.area)
+        self.assertEqual(list(index), [1, 2])
+        self.assertEqual(index[1]["center"], [1.0, 2.0, 3.0])
+        self.assertIsNone(index[2])
+        with mock.patch.object(model3d, "get_model_manifest") as get_manifest:
+            self.assertEqual(model3d.get_area_model_index(self.area), index)
+            get_manifest.assert_not_called()
+
+    def test_index_invalidated(self):
+        model3d.get_area_model_index(self.area)
+        self.add_model(2, "v 0 0 0\nv 4 4 4\n")
+        self.add_model(3, "v 0 0 0\nv 6 6 6\n")
+        index = model3d.get_area_model_index(self.area)
+        self.assertEqual(index[2]["center"], [2.0, 2.0, 2.0])
+        self.assertEqual(index[3]["center"], [3.0, 3.0, 3.0])
+
+    def test_missing_area(self):
+        missing = model3d.area_folder("S", 1, 1, 1)
+        self.assertEqual(model3d.get_area_model_index(missing), {})
+
+    def test_cold_cache_read(self):
+        with mock.patch.object(model3d, "build_model_manifest") as build:
+            self.assertEqual(model3d.read_area_model_index(self.area), ({2: None}, [1]))
+            self.assertEqual(model3d.read_area_model_index(self.area), ({2: None}, [1]))
+            build.assert_not_called()
+        model3d.get_area_model_index(self.area)
+        index, pending = model3d.read_area_model_index(self.area)
+        self.assertEqual(index[1]["center"], [1.0, 2.0, 3.0])
+        self.assertEqual(pending, [])
+
+
+class SiteOriginTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        media_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.site = ("N", 38, 478130, 4419430)
+        model3d.clear_site_origin_cache()
+        self.addCleanup(model3d.clear_site_origin_cache)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_migrated_origin(self):
+        self.assertEqual(
+            model3d.get_site_origin(*self.site), [129.4, -1066.24, 429.592]
+        )
+        self.assertEqual(model3d.get_site_origin("N", 38, 1, 1), "NA")
+
+    def test_origin_cached(self):
+        model3d.get_site_origin(*self.site)
+        with self.assertNumQueries(0):
+            model3d.get_site_origin(*self.site)
+            model3d.get_site_origin("N", 38, 1, 1)
+        SiteOrigin.objects.create(
+            utm_hemisphere="N",
+            utm_zone=38,
+            area_utm_easting_meters=1,
+            area_utm_northing_meters=1,
+            origin_x=1,
+            origin_y=2,
+            origin_z=3,
+        )
+        self.assertEqual(model3d.get_site_origin("N", 38, 1, 1), [1, 2, 3])
+
+    def test_compute_site_origin(self):
+        site = ("N", 38, 1, 1)
+        self.assertIsNone(model3d.compute_site_origin(*site))
+        for context_number, obj_text in ((1, "v 0 0 0\nv 2 2 2\n"), (2, "v 4 6 8\n")):
+            folder = model3d.model_obj_folder(*site, context_number)
+            folder.mkdir(parents=True)
+            (folder / "context.obj").write_text(obj_text)
+        self.assertEqual(model3d.compute_site_origin(*site), [2.0, 3.0, 4.0])
+        self.assertEqual(model3d.get_site_origin(*site), [2.0, 3.0, 4.0])
+
+    def test_manual_origin_kept(self):
+        folder = model3d.model_obj_folder(*self.site, 1)
+        folder.mkdir(parents=True)
+        (folder / "context.obj").write_text("v 0 0 0\n")
+        self.assertEqual(
+            model3d.compute_site_origin(*self.site), [129.4, -1066.24, 429.592]
+        )
+
+
+class ModelLodTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        media_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.folder = model3d.model_obj_folder("N", 38, 478130, 4419430, 1)
+        self.folder.mkdir(parents=True)
+        # a textured 40x40 grid of quads
+        n = 40
+        lines = ["mtllib context1.mtl", "usemtl material0"]
+        lines += [f"v {i % n} {i // n} 0" for i in range(n * n)]
+        lines += [f"vt {i % n / n} {i // n / n}" for i in range(n * n)]
+        for row in range(n - 1):
+            for col in range(n - 1):
+                a = row * n + col + 1
+                quad = (a, a + 1, a + n + 1, a + n)
+                lines.append("f " + " ".join(f"{v}/{v}" for v in quad))
+        (self.folder / "context1.obj").write_text("\n".join(lines) + "\n")
+        (self.folder / "context1.mtl").write_text("newmtl material0\n")
+        (self.folder / "context1.jpg").write_bytes(b"jpg")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_read_obj(self):
+        full = mesh.read_obj(self.folder / "context1.obj")
+        self.assertEqual(full.vertices.shape, (1600, 3))
+        self.assertEqual(full.faces.shape, (2 * 39 * 39, 3))
+        self.assertTrue(full.has_texcoords)
+        self.assertEqual(full.materials, ["material0"])
+
+    def test_decimate(self):
+        full = mesh.read_obj(self.folder / "context1.obj")
+        target = len(full.faces) // 4
+        simplified = mesh.decimate(full, target)
+        self.assertLessEqual(len(simplified.faces), target)
+        self.assertGreater(len(simplified.faces), 0)
+        self.assertTrue(simplified.has_texcoords)
+        self.assertLess(simplified.faces.max(), len(simplified.vertices))
+
+    def test_build_model_lods(self):
+        manifest = model3d.get_model_manifest(self.folder)
+        self.assertEqual(model3d.available_lods(self.folder, manifest), [100])
+        self.assertIsNone(model3d.model_lod_files(self.folder, manifest, 10))
+        self.assertTrue(model3d.lods_pending(self.folder, manifest))
+
+        model3d.build_model_lods(self.folder)
+        self.assertEqual(model3d.available_lods(self.folder, manifest), [10, 25, 100])
+        self.assertFalse(model3d.lods_pending(self.folder, manifest))
+        files = model3d.model_lod_files(self.folder, manifest, 10)
+        self.assertEqual(files[0], model3d.model_lod_obj(self.folder, manifest, 10))
+        self.assertEqual(
+            sorted(f.name for f in files), ["context1.jpg", "context1.mtl", "context1.obj"]
+        )
+        lod = mesh.read_obj(files[0])
+        self.assertLess(len(lod.faces), 2 * 39 * 39 // 10 + 1)
+        self.assertEqual(lod.mtllibs, ["mtllib context1.mtl"])
+        self.assertEqual(model3d.model_lod_zip_name(manifest, 10), "context1_lod10.zip")
+
+    def test_build_lock(self):
+        lock = self.folder / "build.lock"
+        with model3d._build_lock(lock) as locked:
+            self.assertTrue(locked)
+            with model3d._build_lock(lock) as again:
+                self.assertFalse(again)
+        self.assertFalse(lock.exists())
+
+        # a timed out lock is taken over once, by renaming a new lock over it
+        lock.write_text("crashed")
+        stale = time.time() - model3d.BUILD_LOCK_TIMEOUT - 1
+        os.utime(lock, (stale, stale))
+        with model3d._build_lock(lock) as locked:
+            self.assertTrue(locked)
+            token = lock.read_text()
+            self.assertNotEqual(token, "crashed")
+            with model3d._build_lock(lock) as again:
+                self.assertFalse(again)
+            # the timed out build finishing doesn't remove the new lock
+            model3d._release_lock(lock, "crashed")
+            self.assertEqual(lock.read_text(), token)
+        self.assertFalse(lock.exists())
+
+    def test_build_model_glb(self):
+        (self.folder / "context1.mtl").write_text("newmtl material0\nmap_Kd context1.jpg\n")
+        manifest = model3d.get_model_manifest(self.folder)
+        self.assertEqual(model3d.available_formats(self.folder, manifest), ["zip"])
+        self.assertTrue(model3d.glb_pending(self.folder, manifest))
+
+        artifact = model3d.build_model_glb(self.folder)
+        self.assertEqual(model3d.available_formats(self.folder, manifest), ["zip", "glb"])
+        data = artifact.read_bytes()
+        magic, version, length = struct.unpack("<4sII", data[:12])
+        self.assertEqual((magic, version, length), (b"glTF", 2, len(data)))
+        json_length, _ = struct.unpack("<II", data[12:20])
+        gltf = json.loads(data[20 : 20 + json_length])
+        self.assertEqual(gltf["nodes"][0]["translation"], [19.5, 19.5, 0.0])
+        position = gltf["accessors"][0]
+        self.assertEqual(position["min"], [-19.5, -19.5, 0.0])
+        self.assertEqual(position["count"], 1600)
+        self.assertEqual(gltf["images"][0]["mimeType"], "image/jpeg")
+        self.assertIn("baseColorTexture", gltf["materials"][0]["pbrMetallicRoughness"])
+        self.assertEqual(model3d.model_glb_name(manifest), "context1.glb")
+
+        # LOD GLBs are converted from the generated LOD meshes
+        self.assertIsNone(model3d.build_model_glb(self.folder, 10))
+        model3d.build_model_lods(self.folder)
+        self.assertTrue(model3d.build_model_glb(self.folder, 10).exists())
+
+
+class ModelTaskDispatchTest(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        media_override = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media_override.enable()
+        self.addCleanup(media_override.disable)
+        self.addCleanup(self.tmpdir.cleanup)
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.site = ("N", 38, 478130, 4419430)
+        folder = model3d.model_obj_folder(*self.site, 1)
+        folder.mkdir(parents=True)
+        (folder / "context1.obj").write_text("v 0 0 0\nv 2 4 6\nf 1 2 1\n")
+        (folder / "context1.mtl").write_text("newmtl material0\n")
+        self.client = Client()
+        self.client.force_login(User.objects.create_user(username="test", password="top_secret"))
+
+    def test_download_queues_prebuild_once(self):
+        url = reverse("api:model_download", args=[*self.site, 1])
+        with mock.patch.object(tasks.prebuild_model_zip, "delay") as delay:
+            for _ in range(3):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                b"".join(response.streaming_content)
+        delay.assert_called_once_with(*self.site, 1)
+
+    def test_info_queues_lods_and_glb_once(self):
+        url = reverse("api:model_info", args=[*self.site, 1])
+        with mock.patch.object(tasks.generate_model_lods, "delay") as lods, mock.patch.object(
+            tasks.convert_model_glb, "delay", side_effect=ConnectionRefusedError
+        ) as glb:
+            with self.assertLogs("main.views", "WARNING"):
+                self.assertEqual(self.client.get(url).status_code, 200)
+            self.client.get(url)
+            self.client.get(f"{url}?lod=10")
+        lods.assert_called_once_with(*self.site, 1)
+        # a failed attempt is tried again; the LOD 10 GLB waits for its mesh
+        self.assertEqual(
+            glb.call_args_list, [mock.call(*self.site, 1, 100), mock.call(*self.site, 1, 100)]
+        )
+
+    def test_download_without_broker(self):
+        url = reverse("api:model_download", args=[*self.site, 1])
+        with mock.patch.object(
+            tasks.prebuild_model_zip, "delay", side_effect=ConnectionRefusedError
+        ) as delay:
+            with self.assertLogs("main.views", "WARNING"):
+                response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            b"".join(response.streaming_content)
+            # tried again by the next request
+            with self.assertLogs("main.views", "WARNING"):
+                self.client.get(url)
+        self.assertEqual(delay.call_count, 2)
+
+    def test_area_info_queues_index_once(self):
+        url = reverse("api:model_area_info", args=self.site)
+        with mock.patch.object(model3d, "build_model_manifest") as build, mock.patch.object(
+            tasks.index_area_models, "delay"
+        ) as delay:
+            for _ in range(2):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()["models"], [])
+                self.assertEqual(response.json()["pending"], [1])
+            build.assert_not_called()
+        delay.assert_called_once_with(*self.site)
+        tasks.index_area_models(*self.site)
+        response = self.client.get(url)
+        self.assertEqual(response.json()["models"][0]["context_number"], 1)
+        self.assertEqual(response.json()["pending"], [])
+
+    def test_origin_queues_compute_once(self):
+        site = ("N", 38, 1, 1)
+        url = reverse("api:model_origin", args=site)
+        model3d.clear_site_origin_cache()
+        with mock.patch.object(
+            tasks.compute_site_origin, "delay", side_effect=[ConnectionRefusedError, None]
+        ) as delay:
+            with self.assertLogs("main.views", "WARNING"):
+                self.assertEqual(self.client.get(url).json(), {"origin": "NA"})
+            for _ in range(2):
+                self.assertEqual(self.client.get(url).json(), {"origin": "NA"})
+        self.assertEqual(delay.call_args_list, [mock.call(*site), mock.call(*site)])
+
+
+class ObjBBoxTest(SimpleTestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.obj_path = pathlib.Path(self.tmpdir.name) / "model.obj"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def assert_matches_lines(self, content):
+        self.obj_path.write_bytes(content)
+        expected = model3d.obj_bbox_center_lines(self.obj_path)
+        for chunk_size in (7, 64, model3d.OBJ_READ_CHUNK_SIZE):
+            bounds = model3d.obj_vertex_bounds(self.obj_path, chunk_size=chunk_size)
+            self.assertEqual(model3d._bbox_center(bounds, 4), expected)
+        self.assertEqual(model3d.obj_bbox_center(self.obj_path), expected)
+        return expected
+
+    def test_plain_vertices(self):
+        center = self.assert_matches_lines(
+            b"# mesh\nv 1 2 3\nv -3 4.5 1e1\nvt 0.5 0.5\nvn 0 0 1\nf 1 2 1\n"
+        )
+        self.assertEqual(center, [-1.0, 3.25, 6.5])
+
+    def test_irregular_vertices(self):
+        self.assert_matches_lines(
+            b"v 1 2 3 0.5 0.5 0.5\r\nv 4 5\r\nv 7\t8  9\r\n v 100 100 100\r\n"
+            b"v 1_0 2 3\nv 0x10 1 1\nv bad 1 1\nv 2 3 4 w"
+        )
+
+    def test_no_vertices(self):
+        self.assertIsNone(self.assert_matches_lines(b"vt 0 0\nf 1 2 3\n"))
+
+
+class ByteRangeTest(SimpleTestCase):
+    def test_parse_byte_range(self):
+        self.assertEqual(utils.parse_byte_range("bytes=0-99", 1000), (0, 99))
+        self.assertEqual(utils.parse_byte_range("bytes=900-", 1000), (900, 999))
+        self.assertEqual(utils.parse_byte_range("bytes=-100", 1000), (900, 999))
+        self.assertEqual(utils.parse_byte_range("bytes=990-2000", 1000), (990, 999))
+
+    def test_ignored_ranges(self):
+        for header in ["bytes=5-3", "bytes=0-1,5-6", "items=0-1", "bytes=a-b", "bytes=-"]:
+            self.assertIsNone(utils.parse_byte_range(header, 1000), header)
 
-        
-        
+    def test_unsatisfiable_range(self):
+        with self.assertRaises(utils.RangeNotSatisfiable):
+            utils.parse_byte_range("bytes=1000-", 1000)
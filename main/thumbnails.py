@@ -0,0 +1,133 @@
+"""
+Thumbnails of context and bag photos.
+
+Each photo gets a JPEG thumbnail for every size in ``THUMBNAIL_SIZES`` (the
+longest side, in pixels), all made from a single decode of the original. The
+smallest is stored in the photo's ``thumbnail`` field as ``tn_<photo name>``,
+as it always has been. The others are written next to the photo with
+predictable names, e.g. ``tn400_12.jpg`` and ``tn1600_12.jpg`` for ``12.jpg``,
+so their URLs can be listed without looking at the disk.
+"""
+
+import io
+import pathlib
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from main.utils import atomic_write
+
+JPEG_QUALITY = 95
+
+
+def thumbnail_sizes():
+    """The configured sizes, smallest first."""
+    return sorted(set(settings.THUMBNAIL_SIZES))
+
+
+def variant_name(photo_name, size):
+    """Storage name of a photo's thumbnail of ``size``, other than the smallest."""
+    path = pathlib.PurePosixPath(photo_name)
+    return str(path.with_name(f"tn{size}_{path.stem}.jpg"))
+
+
+def downscale(img, sizes):
+    """Yield each size of an open image, largest first, from a single decode.
+
+    JPEGs are downscaled by the decoder itself (by 1/2, 1/4 or 1/8, to no less
+    than the largest size), so a 24MP original is never decoded at full size.
+    Each smaller size is then made from the one before it. Images are turned
+    upright from their EXIF orientation, and are never enlarged.
+
+    Args:
+        img (PIL.Image.Image): an image that hasn't been loaded yet
+        sizes (list): the longest side of each thumbnail, in pixels
+
+    Yields:
+        tuple: the size and the image for it, which is reused for the next size
+    """
+    largest = max(sizes)
+    img.draft("RGB", (largest, largest))
+    img = ImageOps.exif_transpose(img)
+    if img.mode not in ("RGB", "L"):
+        img = img.convert("RGB")
+    for size in sorted(sizes, reverse=True):
+        img.thumbnail((size, size), resample=Image.LANCZOS, reducing_gap=3.0)
+        yield size, img
+
+
+def render_thumbnails(source, sizes):
+    """Decode an image once and make a JPEG thumbnail of each size.
+
+    Args:
+        source (pathlib.Path or file): the original image
+        sizes (list): the longest side of each thumbnail, in pixels
+
+    Returns:
+        dict: JPEG bytes for each size
+    """
+    thumbnails = {}
+    with Image.open(source) as img:
+        for size, thumbnail in downscale(img, sizes):
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format="JPEG", quality=JPEG_QUALITY)
+            thumbnails[size] = buffer.getvalue()
+    return thumbnails
+
+
+def create_thumbnails(photo_obj):
+    """Make every thumbnail size of a ContextPhoto or BagPhoto.
+
+    The ``thumbnail`` field is saved last, so a photo that has a thumbnail has
+    all of its sizes.
+
+    Returns:
+        str: the name of the smallest thumbnail
+    """
+    photo_path = pathlib.Path(photo_obj.photo.path)
+    sizes = thumbnail_sizes()
+    thumbnails = render_thumbnails(photo_path, sizes)
+    for size in sizes[1:]:
+        variant = pathlib.Path(settings.MEDIA_ROOT) / variant_name(photo_obj.photo.name, size)
+        with atomic_write(variant) as fh:
+            fh.write(thumbnails[size])
+    if photo_obj.thumbnail:
+        # remade thumbnails keep the same name instead of getting a suffix
+        photo_obj.thumbnail.delete(save=False)
+    photo_obj.thumbnail.save(f"tn_{photo_path.name}", ContentFile(thumbnails[sizes[0]]))
+    return photo_obj.thumbnail.name
+
+
+def thumbnail_matches(photo_obj):
+    """Whether the photo's thumbnail field was made from its current photo.
+
+    Only the names are compared, so no files are opened.
+    """
+    if not photo_obj.thumbnail:
+        return False
+    photo_stem = pathlib.PurePosixPath(photo_obj.photo.name).stem
+    tn_stem = pathlib.PurePosixPath(photo_obj.thumbnail.name).stem
+    # the storage may have added a suffix to make the name unique
+    return tn_stem == f"tn_{photo_stem}" or tn_stem.startswith(f"tn_{photo_stem}_")
+
+
+def thumbnails_complete(photo_obj):
+    """Whether every thumbnail size of the photo's current photo exists."""
+    media_root = pathlib.Path(settings.MEDIA_ROOT)
+    return thumbnail_matches(photo_obj) and all(
+        (media_root / variant_name(photo_obj.photo.name, size)).exists()
+        for size in thumbnail_sizes()[1:]
+    )
+
+
+def thumbnail_urls(photo_obj):
+    """URLs of a photo's thumbnails keyed by size, or ``{}`` until they are made."""
+    if not photo_obj.thumbnail:
+        return {}
+    sizes = thumbnail_sizes()
+    storage = photo_obj.photo.storage
+    urls = {sizes[0]: photo_obj.thumbnail.url}
+    for size in sizes[1:]:
+        urls[size] = storage.url(variant_name(photo_obj.photo.name, size))
+    return urls
@@ -0,0 +1,110 @@
+"""
+Resumable photo uploads.
+
+Instead of one multipart PUT, a photo can be sent as numbered chunks of
+``chunk_size`` bytes, in order, each in its own short request. They are
+written straight into a part file in ``PHOTO_UPLOAD_DIR``, reading each
+request body in small pieces, so a dropped connection only loses the chunk in
+flight: the client asks how much was received and carries on from there. The
+finished part file is moved, not copied, into place by the photo's FileField.
+"""
+
+import pathlib
+
+from django.conf import settings
+from django.core.files import File
+
+from main.models import PhotoUpload
+
+READ_SIZE = 64 * 1024
+
+
+class ChunkError(Exception):
+    pass
+
+
+class AssembledFile(File):
+    """A finished part file, which the storage moves into place instead of copying."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def upload_dir():
+    return pathlib.Path(settings.PHOTO_UPLOAD_DIR or pathlib.Path(settings.MEDIA_ROOT) / ".uploads")
+
+
+def part_path(upload):
+    return upload_dir() / f"{upload.id}.part"
+
+
+def start(upload):
+    """Create the empty part file of a new upload."""
+    path = part_path(upload)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.touch()
+
+
+def next_chunk(upload):
+    return upload.received // upload.chunk_size
+
+
+def write_chunk(upload, number, stream):
+    """Write chunk ``number`` of an upload from a request body.
+
+    A chunk that was already received is ignored, so a chunk whose response
+    was lost can be sent again.
+
+    Args:
+        upload (PhotoUpload): the upload
+        number (int): the chunk number, from 0
+        stream (file): the request body, or None if it is empty
+
+    Returns:
+        int: the bytes received, including this chunk
+
+    Raises:
+        ChunkError: the chunk isn't the next one, or isn't the whole chunk
+    """
+    offset = number * upload.chunk_size
+    if offset < upload.received:
+        return upload.received
+    if offset > upload.received or offset >= upload.size:
+        raise ChunkError(f"Expected chunk {next_chunk(upload)}, not chunk {number}")
+    expected = min(upload.chunk_size, upload.size - offset)
+    written = 0
+    with open(part_path(upload), "r+b") as fh:
+        fh.seek(offset)
+        try:
+            # read one byte past the chunk to tell if it is too long
+            while stream is not None and written <= expected:
+                data = stream.read(min(READ_SIZE, expected + 1 - written))
+                if not data:
+                    break
+                fh.write(data)
+                written += len(data)
+        finally:
+            if written != expected:
+                # the next attempt at this chunk starts from a clean end
+                fh.truncate(offset)
+    if written != expected:
+        raise ChunkError(f"Chunk {number} should be {expected} bytes, not {written}")
+    # a resent chunk may have been written by a concurrent request as well
+    PhotoUpload.objects.filter(id=upload.id, received=offset).update(received=offset + expected)
+    upload.received = offset + expected
+    return upload.received
+
+
+def finish(upload):
+    """The complete part file of an upload, to be saved to a photo's FileField.
+
+    Raises:
+        ChunkError: chunks are missing
+    """
+    if upload.received != upload.size:
+        raise ChunkError(f"Received {upload.received} of {upload.size} bytes")
+    return AssembledFile(open(part_path(upload), "rb"), name=upload.filename)
+
+
+def discard(upload):
+    part_path(upload).unlink(missing_ok=True)
@@ -1,6 +1,9 @@
+import contextlib
 import math
+import os
 import pathlib
 import requests
+import tempfile
 import numpy as np
 
 from django.conf import settings
@@ -26,14 +29,90 @@ def get_test_header():
 PHOTO_EXTENSIONS = {".jpg", ".jpeg", ".gif", ".png", ".heic", ".cr3", ".raw"}
 
 
-def get_next_photo_number(folder: pathlib.Path) -> str:
+def largest_photo_number(folder: pathlib.Path, extension: str = "") -> int:
+    """Largest numbered photo in ``folder``, e.g. 12 for ``12.jpg``, or 0.
+
+    With an ``extension`` (e.g. "jpg") only files with exactly that extension
+    count, otherwise any photo extension does. This reads the whole folder;
+    uploads get their numbers from ``PhotoNumber`` instead.
+    """
     largest = 0
+    if not folder.is_dir():
+        return largest
     for p in folder.iterdir():
-        if p.is_file() and p.stem.isdigit() and (p.suffix.lower() in PHOTO_EXTENSIONS):
-            num = int(p.stem)
-            if num > largest:
-                largest = num
-    return f"{largest + 1}"
+        if extension:
+            matches = p.suffix == f".{extension}"
+        else:
+            matches = p.suffix.lower() in PHOTO_EXTENSIONS
+        if matches and p.stem.isdigit() and p.is_file():
+            largest = max(largest, int(p.stem))
+    return largest
+
+
+@contextlib.contextmanager
+def atomic_write(path: pathlib.Path, mode="wb"):
+    """Open a temp file next to ``path`` and move it into place on success.
+
+    Readers either see the previous file or the complete new one. The temp
+    file is a dotfile, so folder scans can skip one left by a killed process.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode) as fh:
+            yield fh
+        if settings.FILE_UPLOAD_PERMISSIONS is not None:
+            # mkstemp makes the file readable by its owner only
+            os.chmod(tmp_name, settings.FILE_UPLOAD_PERMISSIONS)
+        os.replace(tmp_name, path)
+    except BaseException:
+        pathlib.Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_byte_range(header: str, size: int):
+    """Parse a single-range ``Range: bytes=...`` header for a file of ``size`` bytes.
+
+    Returns the inclusive ``(start, end)`` of the range, or ``None`` if the
+    header is malformed or asks for several ranges, in which case it should be
+    ignored and the whole file sent. Raises ``RangeNotSatisfiable`` if the
+    range starts past the end of the file.
+    """
+    unit, _, spec = header.partition("=")
+    first, sep, last = spec.strip().partition("-")
+    if unit.strip().lower() != "bytes" or not sep or "," in spec:
+        return None
+    if not (first.isdigit() or first == "") or not (last.isdigit() or last == ""):
+        return None
+    if first == "":
+        if last == "":
+            return None
+        if int(last) == 0:
+            raise RangeNotSatisfiable(header)
+        return max(size - int(last), 0), size - 1
+    start = int(first)
+    end = int(last) if last else size - 1
+    if last and end < start:
+        return None
+    if start >= size:
+        raise RangeNotSatisfiable(header)
+    return start, min(end, size - 1)
+
+
+def iter_file_range(path: pathlib.Path, start: int, length: int, chunk_size=64 * 1024):
+    """Yield ``length`` bytes of the file starting at ``start``."""
+    with path.open("rb") as fh:
+        fh.seek(start)
+        while length > 0:
+            data = fh.read(min(chunk_size, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
 
 
 # Convert between UTM (Universal Transverse Mercator) coordinates and Latitude/Longitude
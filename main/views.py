@@ -1,8 +1,12 @@
 from django.conf import settings
-from django.http import Http404, HttpResponse
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
 
 from rest_framework import status
 from rest_framework.decorators import api_view
@@ -25,11 +29,15 @@ from main.models import (
     ContextPhoto,
     AreaType,
     ContextType,
-    ActionLog,
     BagPhoto,
     MaterialCategory,
+    NumberCounter,
+    PhotoUpload,
     SurveyPath,
     SurveyPoint,
+    area_hierarchy,
+    composite_key,
+    CONTEXT_KEY_FIELDS,
 )
 
 from main.serializers import (
@@ -44,16 +52,55 @@ from main.serializers import (
     ObjectFindSerializer,
     ContextFindListSerializer,
     MCSerializer,
+    PhotoUploadSerializer,
     SurveyPathSerializer,
     SurveyPathListSerializer,
 )
 
+import main.audit as audit
 import main.model3d as model3d
+import main.previews as previews
+from main.pagination import KeysetPagination
+import main.uploads as uploads
+import main.utils as utils
+from main.tasks import (
+    compute_site_origin,
+    convert_model_glb,
+    fp_previews,
+    generate_model_lods,
+    index_area_models,
+    prebuild_model_zip,
+)
 
+import functools
 import logging
+import pathlib
 
 logger = logging.getLogger(__name__)
 
+
+def enqueue_once(task, key, *args):
+    """Queue a background task from a request, at most once per ``key``.
+
+    Requests that find the same artifact missing before a worker has made it
+    queue the task once every ``TASK_ENQUEUE_DEDUPE_SECONDS``. If the broker
+    can't be reached the request carries on without the task.
+
+    Returns:
+        bool: whether the task was queued
+    """
+    cache_key = f"enqueued:{task.name}:{key}"
+    if not cache.add(cache_key, True, settings.TASK_ENQUEUE_DEDUPE_SECONDS):
+        return False
+    try:
+        task.delay(*args)
+    except Exception:
+        cache.delete(cache_key)
+        logger.warning("Could not queue %s for %s", task.name, key, exc_info=True)
+        return False
+    return True
+
+
 FILTER_VARS = [
     "utm_hemisphere",
     "utm_zone",
@@ -61,13 +108,17 @@ FILTER_VARS = [
     "area_utm_northing_meters",
 ]
 
+# Most numbers a client can reserve in one request for offline creation.
+MAX_RESERVED_NUMBERS = 1000
+# Most finds that can be created in one bulk request.
+MAX_BULK_FINDS = 1000
+
 
 # api views
 class SpatialAreaList(ListAPIView):
     serializer_class = SpatialAreaSerializer
     model = SpatialArea
-    # paginate_by = 100
-    pagination_class = None
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         qs = SpatialArea.objects.all()
@@ -80,6 +131,19 @@ class SpatialAreaList(ListAPIView):
         return qs
 
 
+@api_view(["GET"])
+def area_tree(request):
+    """All areas as a ``{hemisphere: {zone: {easting: [northings]}}}`` tree."""
+    tree, version = area_hierarchy()
+    etag = f'"{version}"'
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return response
+    response = Response(tree)
+    response["ETag"] = etag
+    return response
+
+
 class SpatialAreaDetail(APIView):
     def get_object(self, area_id):
         try:
@@ -91,7 +155,7 @@ class SpatialAreaDetail(APIView):
     def get(self, request, area_id, format=None):
         sa = self.get_object(area_id)
         serializer = SpatialAreaSerializer(sa)
-        _ = ActionLog.objects.create(
+        audit.log_action(
             user=self.request.user,
             model_name=SpatialArea._meta.verbose_name,
             action="R",
@@ -102,7 +166,7 @@ class SpatialAreaDetail(APIView):
 
 class SpatialContextList(ListCreateAPIView):
     serializer_class = SpatialContextSerializer
-    pagination_class = None
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         qs = SpatialContext.objects.all()
@@ -118,7 +182,7 @@ class SpatialContextList(ListCreateAPIView):
         serializer = SpatialContextEditSerializer(data=request.data)
         if serializer.is_valid():
             serializer.save()
-            _ = ActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 model_name=SpatialContext._meta.verbose_name,
                 action="C",
@@ -137,7 +201,7 @@ class SpatialContextDetail(APIView):
 
     def get(self, request, context_id, format=None):
         sc = self.get_object(context_id)
-        _ = ActionLog.objects.create(
+        audit.log_action(
             user=request.user,
             model_name=SpatialContext._meta.verbose_name,
             action="R",
@@ -149,7 +213,7 @@ class SpatialContextDetail(APIView):
     def put(self, request, context_id, format=None):
         sc = self.get_object(context_id)
         logger.info(f"Updating context {context_id}")
-        _ = ActionLog.objects.create(
+        audit.log_action(
             user=request.user,
             model_name=SpatialContext._meta.verbose_name,
             action="U",
@@ -178,24 +242,28 @@ class ContextPhotoUpload(APIView):
     def put(self, request, context_id, format=None):
         logger.info("In context photo put upload")
         # return Response(f"ok", status=status.HTTP_201_CREATED)
+        logger.info(request.FILES["photo"])
+        return self.create_photo(request.user, context_id, request.FILES["photo"], request.data)
+
+    @staticmethod
+    def create_photo(user, context_id, photo, data):
         sc = SpatialContext.objects.get(id=context_id)
 
         logger.info(f"sc = {sc}")
-        logger.info(request.FILES["photo"])
         op = ContextPhoto(
-            user=request.user,
+            user=user,
             utm_hemisphere=sc.utm_hemisphere,
             utm_zone=sc.utm_zone,
             area_utm_easting_meters=sc.area_utm_easting_meters,
             area_utm_northing_meters=sc.area_utm_northing_meters,
             context_number=sc.context_number,
-            photo=request.FILES["photo"],
+            photo=photo,
         )
 
         op.save()
         logger.info(op)
-        _ = ActionLog.objects.create(
-            user=self.request.user,
+        audit.log_action(
+            user=user,
             model_name=ContextPhoto._meta.verbose_name,
             action="C",
             object_id=op.id,
@@ -207,20 +275,24 @@ class ContextPhotoUpload(APIView):
 
 class BagPhotoUpload(APIView):
     def put(self, request, context_id, format=None):
+        return self.create_photo(request.user, context_id, request.FILES["photo"], request.data)
+
+    @staticmethod
+    def create_photo(user, context_id, photo, data):
         sc = SpatialContext.objects.get(id=context_id)
         bp = BagPhoto(
-            user=request.user,
+            user=user,
             utm_hemisphere=sc.utm_hemisphere,
             utm_zone=sc.utm_zone,
             area_utm_easting_meters=sc.area_utm_easting_meters,
             area_utm_northing_meters=sc.area_utm_northing_meters,
             context_number=sc.context_number,
-            source=request.data["source"],
-            photo=request.FILES["photo"],
+            source=data["source"],
+            photo=photo,
         )
         bp.save()
-        _ = ActionLog.objects.create(
-            user=request.user,
+        audit.log_action(
+            user=user,
             model_name=BagPhoto._meta.verbose_name,
             action="C",
             object_id=bp.id,
@@ -231,6 +303,7 @@ class BagPhotoUpload(APIView):
 
 class ObjectFindList(ListCreateAPIView):
     serializer_class = ObjectFindSerializer
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         qs = ObjectFind.objects.all()
@@ -245,7 +318,7 @@ class ObjectFindList(ListCreateAPIView):
         logger.info(f"ObjectFindList post {request.data}")
         if serializer.is_valid():
             serializer.save()
-            _ = ActionLog.objects.create(
+            audit.log_action(
                 user=request.user,
                 model_name=ObjectFind._meta.verbose_name,
                 action="C",
@@ -255,6 +328,84 @@ class ObjectFindList(ListCreateAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(["POST"])
+def bulk_create_finds(request):
+    """Create a list of finds in one request, e.g. when syncing a day's work.
+
+    Each item is validated on its own. The valid ones are created together and
+    the response lists a result per item, in the order they were sent. A
+    find_number already used in its context gets a 409, and one repeated
+    earlier in the request a 400.
+    """
+    items = request.data
+    if not isinstance(items, list):
+        raise ParseError("Expected a list of finds")
+    if len(items) > MAX_BULK_FINDS:
+        raise ParseError(f"At most {MAX_BULK_FINDS} finds can be created at once")
+
+    results = []
+    for item in items:
+        serializer = ObjectFindSerializer(data=item)
+        if serializer.is_valid():
+            results.append(ObjectFind(**serializer.validated_data))
+        else:
+            results.append((status.HTTP_400_BAD_REQUEST, serializer.errors))
+
+    existing = ObjectFind.objects.existing_numbers(
+        [result for result in results if isinstance(result, ObjectFind)]
+    )
+    seen = set()
+    finds = []
+    for i, find in enumerate(results):
+        if not isinstance(find, ObjectFind):
+            # already failed validation
+            continue
+        number = (composite_key(find, CONTEXT_KEY_FIELDS), find.find_number)
+        if find.find_number and number in existing:
+            results[i] = (
+                status.HTTP_409_CONFLICT,
+                {"find_number": ["A find with this number already exists in the context."]},
+            )
+        elif find.find_number and number in seen:
+            results[i] = (
+                status.HTTP_400_BAD_REQUEST,
+                {"find_number": ["This find number is repeated in the request."]},
+            )
+        else:
+            seen.add(number)
+            finds.append(find)
+    try:
+        ObjectFind.objects.create_many(finds)
+    except IntegrityError:
+        # a find number taken by another request since the check above
+        return Response(
+            {"detail": "A find number was taken while creating the finds; try again."},
+            status=status.HTTP_409_CONFLICT,
+        )
+    for find in finds:
+        audit.log_action(
+            user=request.user,
+            model_name=ObjectFind._meta.verbose_name,
+            action="C",
+            object_id=find.id,
+        )
+    logger.info(f"Bulk created {len(finds)} of {len(items)} finds")
+
+    data = [
+        {"status": status.HTTP_201_CREATED, "data": ObjectFindSerializer(result).data}
+        if isinstance(result, ObjectFind)
+        else {"status": result[0], "errors": result[1]}
+        for result in results
+    ]
+    if len(finds) == len(items):
+        response_status = status.HTTP_201_CREATED
+    elif finds:
+        response_status = status.HTTP_207_MULTI_STATUS
+    else:
+        response_status = status.HTTP_400_BAD_REQUEST
+    return Response({"results": data}, status=response_status)
+
+
 @api_view(["GET"])
 def find_list_by_context(
     request,
@@ -278,6 +429,62 @@ def find_list_by_context(
     return Response({"find_numbers": find_numbers})
 
 
+def _reserve_count(request):
+    try:
+        count = int(request.data.get("count", 1))
+    except (TypeError, ValueError):
+        raise ParseError("count must be an integer")
+    if not 1 <= count <= MAX_RESERVED_NUMBERS:
+        raise ParseError(f"count must be between 1 and {MAX_RESERVED_NUMBERS}")
+    return count
+
+
+@api_view(["POST"])
+def reserve_find_numbers(
+    request,
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+    context_number,
+):
+    numbers = NumberCounter.objects.allocate(
+        ObjectFind,
+        "find_number",
+        {
+            "utm_hemisphere": utm_hemisphere,
+            "utm_zone": utm_zone,
+            "area_utm_easting_meters": area_utm_easting_meters,
+            "area_utm_northing_meters": area_utm_northing_meters,
+            "context_number": context_number,
+        },
+        count=_reserve_count(request),
+    )
+    return Response({"find_numbers": list(numbers)}, status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+def reserve_context_numbers(
+    request,
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+):
+    numbers = NumberCounter.objects.allocate(
+        SpatialContext,
+        "context_number",
+        {
+            "utm_hemisphere": utm_hemisphere,
+            "utm_zone": utm_zone,
+            "area_utm_easting_meters": area_utm_easting_meters,
+            "area_utm_northing_meters": area_utm_northing_meters,
+        },
+        count=_reserve_count(request),
+    )
+    return Response({"context_numbers": list(numbers)}, status=status.HTTP_201_CREATED)
+
+
 @api_view(["GET"])
 def context_list_numbers(
     request,
@@ -315,10 +522,33 @@ def model_info(
         area_utm_northing_meters,
         context_number,
     )
-    obj_path = model3d.select_obj_file(folder)
-    if obj_path is None:
+    lod = _model_lod(request)
+    manifest = model3d.get_model_manifest(folder)
+    if manifest is None:
         raise Http404("No 3D model found for this context")
 
+    fingerprint = model3d.model_fingerprint(manifest)
+    if model3d.lods_pending(folder, manifest):
+        enqueue_once(
+            generate_model_lods,
+            fingerprint,
+            utm_hemisphere,
+            utm_zone,
+            area_utm_easting_meters,
+            area_utm_northing_meters,
+            context_number,
+        )
+    if model3d.glb_pending(folder, manifest, lod):
+        enqueue_once(
+            convert_model_glb,
+            f"{fingerprint}:{lod}",
+            utm_hemisphere,
+            utm_zone,
+            area_utm_easting_meters,
+            area_utm_northing_meters,
+            context_number,
+            lod,
+        )
     download_url = reverse(
         "api:model_download",
         args=[
@@ -336,14 +566,41 @@ def model_info(
                 f"{area_utm_easting_meters}-"
                 f"{area_utm_northing_meters}-{context_number}"
             ),
-            "obj_filename": obj_path.name,
-            "zip_filename": model3d.model_zip_name(obj_path),
-            "center": model3d.obj_bbox_center(obj_path),
-            "download_url": download_url,
+            "obj_filename": manifest["obj_filename"],
+            "zip_filename": model3d.model_lod_zip_name(manifest, lod),
+            "center": manifest["center"],
+            "lod": lod,
+            "lods": model3d.available_lods(folder, manifest),
+            "formats": model3d.available_formats(folder, manifest, lod),
+            "download_url": (
+                download_url if lod == model3d.FULL_LOD else f"{download_url}?lod={lod}"
+            ),
         }
     )
 
 
+def _model_lod(request):
+    """Read the ``lod`` query parameter, defaulting to the full model."""
+    lod = request.GET.get("lod", str(model3d.FULL_LOD))
+    choices = [*model3d.MODEL_LODS, model3d.FULL_LOD]
+    if lod not in [str(choice) for choice in choices]:
+        raise ParseError(
+            f"lod must be one of {', '.join(str(choice) for choice in choices)}"
+        )
+    return int(lod)
+
+
+def _model_format(request):
+    """Read the ``file_format`` query parameter, defaulting to a zip.
+
+    DRF reserves ``format`` for choosing a renderer.
+    """
+    file_format = request.GET.get("file_format", "zip")
+    if file_format not in model3d.MODEL_FORMATS:
+        raise ParseError(f"file_format must be one of {', '.join(model3d.MODEL_FORMATS)}")
+    return file_format
+
+
 @api_view(["GET"])
 def model_download(
     request,
@@ -360,16 +617,224 @@ def model_download(
         area_utm_northing_meters,
         context_number,
     )
-    obj_path = model3d.select_obj_file(folder)
-    if obj_path is None:
+    lod = _model_lod(request)
+    file_format = _model_format(request)
+    manifest = model3d.get_model_manifest(folder)
+    if manifest is None:
         raise Http404("No 3D model found for this context")
+    if file_format == "glb":
+        artifact = model3d.model_glb_artifact(folder, manifest, lod)
+        if not artifact.exists():
+            if model3d.glb_pending(folder, manifest, lod):
+                enqueue_once(
+                    convert_model_glb,
+                    f"{model3d.model_fingerprint(manifest)}:{lod}",
+                    utm_hemisphere,
+                    utm_zone,
+                    area_utm_easting_meters,
+                    area_utm_northing_meters,
+                    context_number,
+                    lod,
+                )
+            raise Http404("The GLB for this model has not been generated yet")
+        return _model_glb_download(request, manifest, artifact, lod)
+    if lod != model3d.FULL_LOD:
+        return _model_lod_download(request, folder, manifest, lod)
+
+    zip_filename = manifest["zip_filename"]
+    artifact = model3d.model_zip_artifact(folder, manifest)
+    prebuilt = artifact.exists()
+    # The prebuilt zip always has the same bytes for a given fingerprint, so
+    # it gets a strong ETag that clients can resume against with If-Range.
+    # A zip built on the fly is laid out differently, so its ETag is weak.
+    fingerprint = model3d.model_fingerprint(manifest)
+    etag = f'"{fingerprint}"' if prebuilt else f'W/"{fingerprint}"'
+    last_modified = max(entry["mtime_ns"] for entry in manifest["files"]) // 10**9
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
 
-    zip_bytes, zip_filename = model3d.build_model_zip(obj_path)
-    response = HttpResponse(zip_bytes, content_type="application/zip")
+    if prebuilt:
+        response = _cached_file_response(
+            request, artifact, etag, last_modified, "application/zip"
+        )
+    else:
+        # serve this request on the fly and have a worker prebuild the zip
+        enqueue_once(
+            prebuild_model_zip,
+            fingerprint,
+            utm_hemisphere,
+            utm_zone,
+            area_utm_easting_meters,
+            area_utm_northing_meters,
+            context_number,
+        )
+        response = StreamingHttpResponse(
+            model3d.iter_model_zip(folder / manifest["obj_filename"]),
+            content_type="application/zip",
+        )
+        response["Accept-Ranges"] = "none"
+    response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def _model_lod_download(request, folder, manifest, lod):
+    """Stream the zip of a decimated LOD with the original material and texture."""
+    files = model3d.model_lod_files(folder, manifest, lod)
+    if files is None:
+        raise Http404(f"The {lod}% level of detail has not been generated yet")
+    etag = f'W/"{model3d.model_fingerprint(manifest)}-{lod}"'
+    last_modified = max(entry["mtime_ns"] for entry in manifest["files"]) // 10**9
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
+
+    zip_filename = model3d.model_lod_zip_name(manifest, lod)
+    response = StreamingHttpResponse(
+        model3d.iter_zip_files(files), content_type="application/zip"
+    )
+    response["Accept-Ranges"] = "none"
     response["Content-Disposition"] = f'attachment; filename="{zip_filename}"'
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def _model_glb_download(request, manifest, artifact, lod):
+    """Send a cached GLB conversion of the model or one of its LODs."""
+    etag = f'"{artifact.stem}"'
+    last_modified = max(entry["mtime_ns"] for entry in manifest["files"]) // 10**9
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is not None:
+        return response
+
+    response = _cached_file_response(
+        request, artifact, etag, last_modified, "model/gltf-binary"
+    )
+    glb_filename = model3d.model_glb_name(manifest, lod)
+    response["Content-Disposition"] = f'attachment; filename="{glb_filename}"'
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def _cached_file_response(request, path, etag, last_modified, content_type):
+    """Send a file from the model cache, through nginx if it is configured to."""
+    if settings.MODEL_ZIP_X_ACCEL_REDIRECT:
+        # let nginx send the file from its /media/ location, ranges included
+        media_path = path.relative_to(settings.MEDIA_ROOT).as_posix()
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = f"{settings.MEDIA_URL}{media_path}"
+        return response
+    return _file_range_response(request, path, etag, last_modified, content_type)
+
+
+def _file_range_response(request, path, etag, last_modified, content_type):
+    """Send a file, or the single byte range asked for in the Range header.
+
+    The range is ignored (and the whole file sent) if an If-Range header
+    does not match the current ETag or Last-Modified date.
+    """
+    size = path.stat().st_size
+    range_header = request.META.get("HTTP_RANGE")
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if if_range and if_range not in (etag, http_date(last_modified)):
+        range_header = None
+
+    byte_range = None
+    if range_header:
+        try:
+            byte_range = utils.parse_byte_range(range_header, size)
+        except utils.RangeNotSatisfiable:
+            response = HttpResponse(
+                status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(path.open("rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            utils.iter_file_range(path, start, end - start + 1),
+            status=status.HTTP_206_PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response["Content-Length"] = end - start + 1
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    response["Accept-Ranges"] = "bytes"
     return response
 
 
+@api_view(["GET"])
+def model_area_info(
+    request,
+    utm_hemisphere,
+    utm_zone,
+    area_utm_easting_meters,
+    area_utm_northing_meters,
+):
+    folder = model3d.area_folder(
+        utm_hemisphere,
+        utm_zone,
+        area_utm_easting_meters,
+        area_utm_northing_meters,
+    )
+    index, pending = model3d.read_area_model_index(folder)
+    if pending:
+        enqueue_once(
+            index_area_models,
+            f"{utm_hemisphere}-{utm_zone}-{area_utm_easting_meters}-{area_utm_northing_meters}",
+            utm_hemisphere,
+            utm_zone,
+            area_utm_easting_meters,
+            area_utm_northing_meters,
+        )
+    models = []
+    for context_number, manifest in index.items():
+        if manifest is None:
+            continue
+        model_folder = folder / str(context_number) / model3d.MODEL_SUBFOLDER
+        models.append(
+            {
+                "context_number": context_number,
+                "obj_filename": manifest["obj_filename"],
+                "zip_filename": manifest["zip_filename"],
+                "center": manifest["center"],
+                "lods": model3d.available_lods(model_folder, manifest),
+                "download_url": reverse(
+                    "api:model_download",
+                    args=[
+                        utm_hemisphere,
+                        utm_zone,
+                        area_utm_easting_meters,
+                        area_utm_northing_meters,
+                        context_number,
+                    ],
+                ),
+            }
+        )
+    return Response(
+        {
+            "area": (
+                f"{utm_hemisphere}-{utm_zone}-"
+                f"{area_utm_easting_meters}-{area_utm_northing_meters}"
+            ),
+            "models": models,
+            "pending": pending,
+        }
+    )
+
+
 @api_view(["GET"])
 def model_origin(
     request,
@@ -379,8 +844,20 @@ def model_origin(
     area_utm_northing_meters,
 ):
     origin = model3d.get_site_origin(
-        area_utm_easting_meters, area_utm_northing_meters
+        utm_hemisphere,
+        utm_zone,
+        area_utm_easting_meters,
+        area_utm_northing_meters,
     )
+    if origin == "NA":
+        enqueue_once(
+            compute_site_origin,
+            f"{utm_hemisphere}-{utm_zone}-{area_utm_easting_meters}-{area_utm_northing_meters}",
+            utm_hemisphere,
+            utm_zone,
+            area_utm_easting_meters,
+            area_utm_northing_meters,
+        )
     return Response({"origin": origin})
 
 
@@ -406,6 +883,7 @@ def find_detail_hzencf(
         serializer = ObjectFindSerializer(obj)
         d = serializer.data.copy()
         d["findphoto_set"] = obj.list_file_urls_from_photo_folder()
+        d["findphoto_previews"] = obj.list_photo_previews()
         return Response(d)
     except ObjectFind.DoesNotExist:
         raise Http404
@@ -420,7 +898,7 @@ class ObjectFindDetail(APIView):
 
     def get(self, request, find_id, format=None):
         obj = self.get_object(find_id)
-        _ = ActionLog.objects.create(
+        audit.log_action(
             user=request.user,
             model_name=ObjectFind._meta.verbose_name,
             action="R",
@@ -429,11 +907,12 @@ class ObjectFindDetail(APIView):
         serializer = ObjectFindSerializer(obj)
         d = serializer.data.copy()
         d["findphoto_set"] = obj.list_file_urls_from_photo_folder()
+        d["findphoto_previews"] = obj.list_photo_previews()
         return Response(d)
 
     def put(self, request, find_id, format=None):
         obj = self.get_object(find_id)
-        _ = ActionLog.objects.create(
+        audit.log_action(
             user=request.user,
             model_name=ObjectFind._meta.verbose_name,
             action="U",
@@ -448,20 +927,24 @@ class ObjectFindDetail(APIView):
 
 class FindPhotoUpload(APIView):
     def put(self, request, find_id, format=None):
+        return self.create_photo(request.user, find_id, request.FILES["photo"], request.data)
+
+    @staticmethod
+    def create_photo(user, find_id, photo, data):
         obj = ObjectFind.objects.get(id=find_id)
         fp = FindPhoto(
-            user=request.user,
+            user=user,
             utm_hemisphere=obj.utm_hemisphere,
             utm_zone=obj.utm_zone,
             area_utm_easting_meters=obj.area_utm_easting_meters,
             area_utm_northing_meters=obj.area_utm_northing_meters,
             context_number=obj.context_number,
             find_number=obj.find_number,
-            photo=request.FILES["photo"],
+            photo=photo,
         )
         fp.save()
-        _ = ActionLog.objects.create(
-            user=request.user,
+        audit.log_action(
+            user=user,
             model_name=FindPhoto._meta.verbose_name,
             action="C",
             object_id=fp.id,
@@ -478,6 +961,82 @@ class FindPhotoUpload(APIView):
         return Response(photo_urls, status=status.HTTP_200_OK)
 
 
+PHOTO_UPLOAD_VIEWS = {
+    "context": ContextPhotoUpload,
+    "bag": BagPhotoUpload,
+    "find": FindPhotoUpload,
+}
+
+
+class PhotoUploadStart(APIView):
+    def post(self, request, format=None):
+        serializer = PhotoUploadSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        upload = serializer.save(
+            user=request.user, chunk_size=settings.PHOTO_UPLOAD_CHUNK_SIZE
+        )
+        uploads.start(upload)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+def get_photo_upload(request, upload_id, lock=False):
+    """The user's own upload, or a 404."""
+    qs = PhotoUpload.objects.filter(user=request.user)
+    if lock:
+        qs = qs.select_for_update()
+    try:
+        return qs.get(id=upload_id)
+    except PhotoUpload.DoesNotExist:
+        raise Http404
+
+
+def photo_upload_conflict(upload, error):
+    data = PhotoUploadSerializer(upload).data
+    return Response({"error": str(error), **data}, status=status.HTTP_409_CONFLICT)
+
+
+class PhotoUploadDetail(APIView):
+    def get(self, request, upload_id, format=None):
+        upload = get_photo_upload(request, upload_id)
+        return Response(PhotoUploadSerializer(upload).data)
+
+    def delete(self, request, upload_id, format=None):
+        upload = get_photo_upload(request, upload_id)
+        uploads.discard(upload)
+        upload.delete()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class PhotoUploadChunk(APIView):
+    def put(self, request, upload_id, number, format=None):
+        upload = get_photo_upload(request, upload_id)
+        try:
+            uploads.write_chunk(upload, number, request.stream)
+        except uploads.ChunkError as e:
+            return photo_upload_conflict(upload, e)
+        return Response(PhotoUploadSerializer(upload).data)
+
+
+class PhotoUploadFinish(APIView):
+    def post(self, request, upload_id, format=None):
+        # finishing twice, e.g. after a lost response, gives the same result
+        upload = get_photo_upload(request, upload_id, lock=True)
+        if upload.result is not None:
+            return Response(upload.result, status=status.HTTP_201_CREATED)
+        try:
+            photo = uploads.finish(upload)
+        except uploads.ChunkError as e:
+            return photo_upload_conflict(upload, e)
+        with photo:
+            response = PHOTO_UPLOAD_VIEWS[upload.kind].create_photo(
+                request.user, upload.target_id, photo, {"source": upload.source}
+            )
+        upload.result = response.data
+        upload.save(update_fields=["result"])
+        return response
+
+
 class FindPhotoReplace(APIView):
     def put(self, request, find_id, format=None):
         obj = ObjectFind.objects.get(id=find_id)
@@ -487,15 +1046,28 @@ class FindPhotoReplace(APIView):
             return Response(
                 {"error": " No filename provided"}, status=status.HTTP_400_BAD_REQUEST
             )
+        if pathlib.PurePath(filename).name != filename:
+            return Response(
+                {"error": f"{filename} is not a file name"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
         filepath = obj.absolute_findphoto_folder / filename
-        if not filepath.exists():
+        if not filepath.is_file():
             upload_url = reverse("api:objectfind_photo", args=[find_id])
             msg = f"{filename} not found in {obj.findphoto_folder} use PUT to {upload_url} to upload a new photo."
             return Response({"error": msg}, status=status.HTTP_404_NOT_FOUND)
-        print(request.FILES["photo"])
-        filepath.write_bytes(request.FILES["photo"].read())
-
-        _ = ActionLog.objects.create(
+        # readers see the old photo until the new one is complete
+        with utils.atomic_write(filepath) as fh:
+            for chunk in request.FILES["photo"].chunks():
+                fh.write(chunk)
+        name = f"{obj.findphoto_folder}/{filename}"
+        previews.delete_previews(name)
+        photos = obj.findphoto_set().filter(photo=name)
+        photos.update(preview_sizes=[])
+        for fp in photos:
+            transaction.on_commit(functools.partial(fp_previews.delay, fp.id))
+
+        audit.log_action(
             user=request.user,
             model_name=ObjectFind._meta.verbose_name,
             action="U",
@@ -548,38 +1120,25 @@ class SurveyPathDetail(RetrieveUpdateAPIView):
 
 @login_required
 def hemisphere_select(request):
-    hemispheres = (
-        SpatialArea.objects.order_by("utm_hemisphere")
-        .distinct("utm_hemisphere")
-        .values_list("utm_hemisphere", flat=True)
-    )
-    context = {"hemispheres": hemispheres}
+    tree, _ = area_hierarchy()
+    context = {"hemispheres": list(tree)}
     return render(request, template_name="main/hemisphere_select.html", context=context)
 
 
 @login_required
 def zone_select(request, hemisphere):
-    zones = (
-        SpatialArea.objects.filter(utm_hemisphere=hemisphere)
-        .order_by("utm_zone")
-        .distinct("utm_zone")
-        .values_list("utm_zone", flat=True)
-    )
+    tree, _ = area_hierarchy()
     context = {
         "hemisphere": hemisphere,
-        "zones": zones,
+        "zones": list(tree.get(hemisphere, {})),
     }
     return render(request, template_name="main/zone_select.html", context=context)
 
 
 @login_required
 def easting_select(request, hemisphere, zone):
-    eastings = (
-        SpatialArea.objects.filter(utm_hemisphere=hemisphere, utm_zone=zone)
-        .order_by("area_utm_easting_meters")
-        .distinct("area_utm_easting_meters")
-        .values_list("area_utm_easting_meters", flat=True)
-    )
+    tree, _ = area_hierarchy()
+    eastings = list(tree.get(hemisphere, {}).get(zone, {}))
     context = {"hemisphere": hemisphere, "zone": zone, "eastings": eastings}
 
     return render(request, template_name="main/easting_select.html", context=context)
@@ -587,19 +1146,12 @@ def easting_select(request, hemisphere, zone):
 
 @login_required
 def northing_select(request, hemisphere, zone, easting):
-    northings = (
-        SpatialArea.objects.filter(
-            utm_hemisphere=hemisphere, utm_zone=zone, area_utm_easting_meters=easting
-        )
-        .order_by("area_utm_northing_meters")
-        .distinct("area_utm_northing_meters")
-        .values_list("area_utm_northing_meters", flat=True)
-    )
+    tree, _ = area_hierarchy()
     context = {
         "hemisphere": hemisphere,
         "zone": zone,
         "easting": easting,
-        "northings": northings,
+        "northings": tree.get(hemisphere, {}).get(zone, {}).get(easting, []),
     }
     return render(request, template_name="main/northing_select.html", context=context)
 